@@ -1,8 +1,11 @@
 import jwt
+import hashlib
+import time
 from datetime import datetime, timedelta
 import os
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from cache import TTLCache
 from database import db
 
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-here-change-in-production")
@@ -11,6 +14,15 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours instead of 30 minutes
 
 security = HTTPBearer(auto_error=False)  # Don't automatically error on missing token
 
+# Verified user records ({id, name, email}) keyed by user id
+user_cache = TTLCache(
+    maxsize=int(os.environ.get("AUTH_USER_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("AUTH_USER_CACHE_TTL", "300"))
+)
+# Decoded token subjects keyed by SHA-256 of the raw token; each entry
+# expires together with the token's own exp claim
+token_cache = TTLCache(maxsize=int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "8192")))
+
 def create_access_token(data: dict):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -24,28 +36,51 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
         raise HTTPException(status_code=401, detail="Authorization header missing")
     
+    token = credentials.credentials
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    user_id = token_cache.get(token_hash)
+    if user_id is not None:
+        return user_id
+    
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token payload")
-        return user_id
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.PyJWTError as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        token_cache.set(token_hash, user_id, ttl=ttl)
+    return user_id
+
+def get_user(user_id: int):
+    """Return the {id, name, email} record for a user, served from cache when warm"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    with db.connection() as conn:
+        row = conn.execute("SELECT id, name, email FROM users WHERE id = ?", (user_id,)).fetchone()
+    
+    if not row:
+        return None
+    user = {"id": row[0], "name": row[1], "email": row[2]}
+    user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id: int):
+    """Forget a user's cached record and tokens (after deletion or a password reset)"""
+    user_cache.invalidate(user_id)
+    token_cache.invalidate_where(lambda token_hash, cached_user_id: cached_user_id == user_id)
 
 def get_current_user(user_id: int = Depends(verify_token)):
     """Get current user from token"""
     # Verify user still exists in database
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if not user:
+    if not get_user(user_id):
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user_id
\ No newline at end of file
+    return user_id
@@ -0,0 +1,59 @@
+"""Shared setup for the benchmark scripts.
+
+Importing this module puts backend/ on sys.path and points the module-level
+db singleton and the retrieval index at a scratch directory, so a benchmark
+never touches backend/jarvis.db. Import it before any backend module.
+"""
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCRATCH_DIR = Path(tempfile.mkdtemp(prefix="jarvis-bench-"))
+atexit.register(shutil.rmtree, SCRATCH_DIR, True)
+
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ["JARVIS_DB_PATH"] = str(SCRATCH_DIR / "jarvis.db")
+os.environ["RAG_INDEX_DIR"] = str(SCRATCH_DIR / "retrieval_index")
+
+
+def fresh_database(name: str = "bench.db"):
+    """A new, fully migrated Database in the scratch directory"""
+    from database import Database
+    return Database(str(SCRATCH_DIR / name))
+
+
+def per_call(func, repeat: int) -> float:
+    """Mean wall time of func() in seconds over repeat calls"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def percentile(samples, pct: float) -> float:
+    """The pct-th percentile of samples (nearest rank)"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def median(samples) -> float:
+    return statistics.median(samples)
+
+
+def fmt_time(seconds: float) -> str:
+    """Format a duration in the most readable unit"""
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def report(label: str, value: str):
+    print(f"  {label + ':':<34} {value}")
@@ -0,0 +1,94 @@
+"""Measure event-loop stalls with blocking vs AsyncDatabase list handlers.
+
+Usage: python benchmarks/bench_async_db.py [--rows 200000] [--users 50] [--requests 200]
+
+Fires --requests concurrent "list every task" handlers (the unpaginated
+listing the API served before keyset pagination) at a tasks table with
+--rows rows, once with sqlite3 called directly on the event loop and once
+through AsyncDatabase. A ticker coroutine that wakes every 5ms records
+the longest gap between wake-ups, i.e. the worst time the loop could not
+serve anything else.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import _common
+from _common import fmt_time, report
+
+from database import AsyncDatabase
+
+LIST_TASKS = "SELECT * FROM tasks WHERE user_id = ? ORDER BY created_at DESC"
+
+
+def seed(database, rows: int, users: int):
+    with database.connection() as conn:
+        user_ids = [
+            conn.execute(
+                "INSERT INTO users (name, email, password_hash) VALUES (?, ?, 'x')", (f"U{i}", f"u{i}@example.com")
+            ).lastrowid
+            for i in range(users)
+        ]
+        conn.executemany(
+            "INSERT INTO tasks (user_id, title, description, created_at) "
+            "VALUES (?, ?, ?, datetime('now', ?))",
+            (
+                (random.choice(user_ids), f"Task {i}", "x" * 200, f"-{i} seconds")
+                for i in range(rows)
+            )
+        )
+    return user_ids
+
+
+async def load(handler, user_ids, requests: int):
+    longest_stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal longest_stall
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            longest_stall = max(longest_stall, now - last - 0.005)
+            last = now
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(user_ids[i % len(user_ids)]) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticking
+    return requests / elapsed, longest_stall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    database = _common.fresh_database()
+    user_ids = seed(database, args.rows, args.users)
+    adb = AsyncDatabase(database)
+
+    async def blocking_handler(user_id):
+        with database.connection() as conn:
+            return conn.execute(LIST_TASKS, (user_id,)).fetchall()
+
+    async def async_handler(user_id):
+        return await adb.fetchall(LIST_TASKS, (user_id,))
+
+    print(f"{args.requests} concurrent list queries, {args.rows} tasks over {args.users} users")
+    for label, handler in (("blocking handlers", blocking_handler), ("AsyncDatabase", async_handler)):
+        throughput, stall = asyncio.run(load(handler, user_ids, args.requests))
+        report(label, f"{throughput:.0f} req/s, worst loop stall {fmt_time(stall)}")
+    adb.shutdown()
+    database.close_all()
+
+
+if __name__ == "__main__":
+    main()
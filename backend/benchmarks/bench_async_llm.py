@@ -0,0 +1,62 @@
+"""Concurrent chats through AsyncOpenAIService under the per-key limit.
+
+Usage: python benchmarks/bench_async_llm.py [--chats 300] [--limit 100] [--latency 0.5]
+
+Starts --chats generate_response calls for one API key at once against a
+fake client whose completions take --latency seconds. With a per-key
+limit of --limit they should finish in about ceil(chats / limit) *
+latency, with never more than --limit calls in flight. It then starts an
+email draft, cancels it mid-flight (as a client disconnect does) and checks
+that the upstream call was cancelled too.
+"""
+import argparse
+import asyncio
+import time
+
+from _common import fmt_time, report
+from fake_llm import FakeLLM, configured_user, install
+
+from database import adb, db
+from openai_service import AsyncOpenAIService
+
+
+async def concurrent_chats(service: AsyncOpenAIService, user_id: int, chats: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(service.generate_response(user_id, f"Question {i}") for i in range(chats)))
+    return time.perf_counter() - started
+
+
+async def cancel_draft(service: AsyncOpenAIService, llm: FakeLLM, user_id: int) -> bool:
+    task = asyncio.create_task(service.draft_email(user_id, "ana@example.com", "Ship on Friday", "follow_up"))
+    while not llm.in_flight:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return llm.in_flight == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    llm = FakeLLM(first_token=args.latency)
+    service = AsyncOpenAIService(max_concurrency_per_key=args.limit)
+    install(llm, service)
+    user_id = configured_user(db, llm_cache_enabled=False)
+
+    elapsed = asyncio.run(concurrent_chats(service, user_id, args.chats))
+    print(f"{args.chats} concurrent chats, {fmt_time(args.latency)} completions, per-key limit {args.limit}")
+    report("wall time", fmt_time(elapsed))
+    report("peak calls in flight", str(llm.max_in_flight))
+    report("draft cancel aborts upstream call", str(asyncio.run(cancel_draft(service, llm, user_id))))
+    adb.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Bulk task creation: batched inserts and one digest email per assignee.
+
+Usage: python benchmarks/bench_bulk_tasks.py [--tasks 1000] [--assignees 100] [--draft-latency 0.05]
+
+Inserts --tasks tasks with one commit per row (one POST /api/tasks per
+task) and with the single executemany POST /api/tasks/bulk uses. Then
+drafts the assignment emails through AsyncOpenAIService.draft_email
+against a fake LLM that answers in --draft-latency seconds: one digest
+per assignee under BULK_DRAFT_CONCURRENCY, as the bulk endpoint does.
+The old one-draft-per-task sequential cost is extrapolated from a
+sample of sequential calls. The digest text mirrors task_email_context
+in server.py, which cannot be imported without FastAPI.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import _common
+from _common import fmt_time, report
+from fake_llm import FakeLLM, configured_user, install
+
+from database import db
+from openai_service import async_openai_service
+
+INSERT_TASK = """
+    INSERT INTO tasks (user_id, title, description, assignee, assignee_email, priority, due_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+BULK_DRAFT_CONCURRENCY = int(os.environ.get("BULK_DRAFT_CONCURRENCY", "8"))
+
+
+def task_rows(user_id: int, tasks: int, assignees: int):
+    return [
+        (user_id, f"Action item {i}", f"Follow up on point {i} from the planning meeting", f"Person {i % assignees}",
+         f"person{i % assignees}@example.com", "medium", None)
+        for i in range(tasks)
+    ]
+
+
+def email_context(rows) -> str:
+    details = [f"Task: {row[1]}\nDescription: {row[2]}\nPriority: {row[5]}" for row in rows]
+    if len(details) == 1:
+        return details[0]
+    return f"Digest of {len(details)} tasks assigned in one batch:\n\n" + "\n\n".join(details)
+
+
+def time_inserts(tasks: int, assignees: int):
+    per_row_db = _common.fresh_database("per_row.db")
+    user_id = per_row_db.create_user("Bench", "bench@example.com", "secret")
+    rows = task_rows(user_id, tasks, assignees)
+    started = time.perf_counter()
+    for row in rows:
+        with per_row_db.connection() as conn:
+            conn.execute(INSERT_TASK, row)
+    per_row = time.perf_counter() - started
+
+    bulk_db = _common.fresh_database("bulk.db")
+    user_id = bulk_db.create_user("Bench", "bench@example.com", "secret")
+    rows = task_rows(user_id, tasks, assignees)
+    started = time.perf_counter()
+    with bulk_db.connection() as conn:
+        conn.executemany(INSERT_TASK, rows)
+    bulk = time.perf_counter() - started
+    per_row_db.close_all()
+    bulk_db.close_all()
+    return per_row, bulk
+
+
+async def draft_sequential(user_id: int, rows) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        await async_openai_service.draft_email(user_id, row[4], email_context([row]), "task_assignment")
+    return (time.perf_counter() - started) / len(rows)
+
+
+async def draft_digests(user_id: int, rows) -> float:
+    by_assignee = {}
+    for row in rows:
+        by_assignee.setdefault(row[4], []).append(row)
+    limiter = asyncio.Semaphore(BULK_DRAFT_CONCURRENCY)
+
+    async def draft(recipient, assigned):
+        async with limiter:
+            return await async_openai_service.draft_email(user_id, recipient, email_context(assigned), "task_assignment")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(draft(recipient, assigned) for recipient, assigned in by_assignee.items()))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--assignees", type=int, default=100)
+    parser.add_argument("--draft-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    per_row, bulk = time_inserts(args.tasks, args.assignees)
+    print(f"{args.tasks} tasks across {args.assignees} assignees")
+    report("insert, one commit per row", f"{fmt_time(per_row)} (~{args.tasks / per_row / 1000:.1f}k tasks/s)")
+    report("insert, executemany", f"{fmt_time(bulk)} (~{args.tasks / bulk / 1000:.1f}k tasks/s)")
+
+    llm = FakeLLM(first_token=args.draft_latency)
+    install(llm, async_openai_service)
+    user_id = configured_user(db, llm_cache_enabled=False)
+    rows = task_rows(user_id, args.tasks, args.assignees)
+
+    per_draft = asyncio.run(draft_sequential(user_id, rows[:20]))
+    report("one draft per task, sequential", f"{fmt_time(per_draft * args.tasks)}, {args.tasks} calls (extrapolated)")
+    llm.reset()
+    elapsed = asyncio.run(draft_digests(user_id, rows))
+    report(f"digest per assignee, concurrency {BULK_DRAFT_CONCURRENCY}", f"{fmt_time(elapsed)}, {llm.calls} calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Classification throughput of the local command router.
+
+Usage: python benchmarks/bench_command_router.py [--seconds 2]
+
+Classifies three message sets in a loop for --seconds each: a 16-phrase
+mix of commands, typos, questions and negated commands; long
+conversational messages, which the length check sends to the LLM
+without touching the trie; and typo'd commands that need the fuzzy pass.
+"""
+import argparse
+import time
+
+from _common import report
+
+from command_router import command_router
+
+MIX = (
+    "start meeting",
+    "please end meeting",
+    "show tasks",
+    "show my todos",
+    "complete task 12",
+    "create task",
+    "system check",
+    "jarvis create todo",
+    "show taks",
+    "strat meeting",
+    "sytem check",
+    "Can you show tasks for the marketing team?",
+    "What should I focus on today?",
+    "Please do not complete task 5 yet",
+    "Draft a short note thanking the team for the launch",
+    "who created you",
+)
+LONG_MESSAGES = (
+    "I had a long call with the supplier and we need to rethink the delivery schedule for the next quarter",
+    "Could you summarize what we agreed in yesterday's planning session and who owns the follow-ups from it",
+    "Remind me why we decided to postpone the migration and what the risks were if we had gone ahead",
+)
+TYPOS = ("show taks", "strat meeting", "sytem chek", "shwo todos", "end meeeting", "creat todo")
+
+
+def throughput(messages, seconds: float):
+    classified, local, deadline = 0, 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for message in messages:
+            if command_router.classify(message):
+                local += 1
+        classified += len(messages)
+    return classified / seconds, local / classified
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    for label, messages in (
+        ("16-phrase mix", MIX), ("long conversational messages", LONG_MESSAGES), ("typo'd commands", TYPOS)
+    ):
+        rate, local = throughput(messages, args.seconds)
+        report(label, f"{rate / 1000:.1f}k classifications/s, {local:.0%} answered locally")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Prompt size and context-building cost as a chat conversation grows.
+
+Usage: python benchmarks/bench_conversation.py [--turns 10,100,1000,10000] [--repeat 200]
+
+Fills conversations with alternating 25- and 60-word turns, then times
+ConversationMemory.open (the per-message context build) and counts the
+prompt tokens it produces against the tokens of the full transcript a
+client used to resend. Finally runs the summary job once, with a fake
+LLM, on the 100-turn conversation and reports the prompt size after it.
+"""
+import argparse
+import json
+import random
+import time
+
+from _common import fmt_time, median, report
+from fake_llm import FakeLLM, configured_user, install
+
+from conversation import conversation_memory, turn_tokens
+from database import db
+from openai_service import build_chat_messages, openai_service
+
+MESSAGE = "What did we decide about the launch date?"
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    vocabulary = ("launch", "budget", "team", "review", "customer", "plan", "date", "risk", "design", "ship")
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def conversation_with(user_id: int, turns: int) -> int:
+    rng = random.Random(turns)
+    with db.connection() as conn:
+        conversation_id = conversation_memory.open(conn, user_id, None, "Planning")["id"]
+        for _ in range(turns // 2):
+            conversation_memory.record(conn, conversation_id, sentence(rng, 25), sentence(rng, 60))
+    return conversation_id
+
+
+def prompt_tokens(history) -> int:
+    return sum(turn_tokens(message["content"]) for message in build_chat_messages(MESSAGE, "", history))
+
+
+def measure(user_id: int, conversation_id: int, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with db.connection() as conn:
+            conversation = conversation_memory.open(conn, user_id, conversation_id, MESSAGE)
+        samples.append(time.perf_counter() - started)
+    return median(samples), prompt_tokens(conversation["history"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", default="10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    install(FakeLLM(reply_tokens=300), openai_service)
+    user_id = configured_user(db)
+
+    print(f"{'turns':>7}  {'build context p50':>17}  {'prompt tokens':>13}  {'full transcript tokens':>22}")
+    conversations = {}
+    for turns in (int(n) for n in args.turns.split(",")):
+        conversation_id = conversations[turns] = conversation_with(user_id, turns)
+        p50, tokens = measure(user_id, conversation_id, args.repeat)
+        with db.connection() as conn:
+            transcript = conn.execute(
+                "SELECT SUM(token_count) FROM conversation_turns WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+        print(f"{turns:>7}  {fmt_time(p50):>17}  {tokens:>13}  {transcript:>22}")
+
+    body = json.dumps({"message": MESSAGE, "context": "", "conversation_id": max(conversations.values())})
+    report("request body at every length", f"{len(body)} bytes")
+    if 100 in conversations:
+        conversation_memory.summarize_job({"id": 0, "user_id": user_id, "payload": {"conversation_id": conversations[100]}})
+        report("100 turns, after the summary job", f"{measure(user_id, conversations[100], 1)[1]} prompt tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cost of GET /api/dashboard: the old four queries versus the read model.
+
+Usage: python benchmarks/bench_dashboard.py [--tasks 2000] [--todos 1000] [--meetings 300] [--emails 500]
+
+Seeds one user on a scratch database, then times the four queries the
+endpoint used to run, one load of the single-statement read model, the
+version lookup every request now starts with, and the two paths that
+follow it when nothing changed: a cached snapshot and an If-None-Match
+that answers 304.
+"""
+import argparse
+
+import _common
+from _common import fmt_time, per_call, report
+
+from dashboard import DashboardReadModel
+
+OLD_QUERIES = (
+    """SELECT id, title, attendees, notes, mom, status, created_at, ended_at
+       FROM meetings WHERE user_id = ? ORDER BY created_at DESC LIMIT 5""",
+    """SELECT id, title, description, assignee, assignee_email, priority, status, created_at, due_date, last_followup
+       FROM tasks WHERE user_id = ? AND status != 'completed' ORDER BY created_at DESC""",
+    """SELECT id, title, description, status, created_at, completed_at
+       FROM todos WHERE user_id = ? AND status != 'completed' ORDER BY created_at DESC""",
+    """SELECT id, recipient, subject, body, sent_at, email_type
+       FROM emails WHERE user_id = ? ORDER BY sent_at DESC LIMIT 5""",
+)
+
+
+def seed(database, tasks: int, todos: int, meetings: int, emails: int) -> int:
+    user_id = database.create_user("Bench", "bench@example.com", "secret")
+    description = "Details of the action item. " * 8
+    with database.connection() as conn:
+        conn.executemany(
+            "INSERT INTO tasks (user_id, title, description, priority, created_at) "
+            "VALUES (?, ?, ?, 'medium', datetime('now', ?))",
+            [(user_id, f"Task {i}", description, f"-{i} minutes") for i in range(tasks)]
+        )
+        conn.executemany(
+            "INSERT INTO todos (user_id, title, description, created_at) VALUES (?, ?, ?, datetime('now', ?))",
+            [(user_id, f"Todo {i}", description, f"-{i} minutes") for i in range(todos)]
+        )
+        conn.executemany(
+            "INSERT INTO meetings (user_id, title, attendees, status, created_at) "
+            "VALUES (?, ?, 'Ana, Ben', 'completed', datetime('now', ?))",
+            [(user_id, f"Meeting {i}", f"-{i} hours") for i in range(meetings)]
+        )
+        conn.executemany(
+            "INSERT INTO emails (user_id, recipient, subject, body, sent_at) "
+            "VALUES (?, 'ana@example.com', ?, ?, datetime('now', ?))",
+            [(user_id, f"Email {i}", description, f"-{i} minutes") for i in range(emails)]
+        )
+    return user_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--todos", type=int, default=1000)
+    parser.add_argument("--meetings", type=int, default=300)
+    parser.add_argument("--emails", type=int, default=500)
+    args = parser.parse_args()
+
+    database = _common.fresh_database()
+    user_id = seed(database, args.tasks, args.todos, args.meetings, args.emails)
+    dashboard = DashboardReadModel(database)
+
+    def old_queries():
+        with database.connection() as conn:
+            for sql in OLD_QUERIES:
+                conn.execute(sql, (user_id,)).fetchall()
+
+    def load():
+        with database.connection() as conn:
+            dashboard.load(conn, user_id)
+
+    version, _ = dashboard.snapshot(user_id)
+    etag = dashboard.etag(user_id, version)
+
+    def cached_snapshot():
+        assert dashboard.cached(user_id, dashboard.version(user_id)) is not None
+
+    def not_modified():
+        assert dashboard.etag(user_id, dashboard.version(user_id)) == etag
+
+    print(f"{args.tasks} open tasks, {args.todos} todos, {args.meetings} meetings, {args.emails} emails")
+    report("old four queries", fmt_time(per_call(old_queries, 50)))
+    report("read model load", fmt_time(per_call(load, 200)))
+    report("version lookup", fmt_time(per_call(lambda: dashboard.version(user_id), 5000)))
+    report("version lookup + cached snapshot", fmt_time(per_call(cached_snapshot, 5000)))
+    report("If-None-Match -> 304", fmt_time(per_call(not_modified, 5000)))
+    database.close_all()
+
+
+if __name__ == "__main__":
+    main()
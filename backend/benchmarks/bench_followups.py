@@ -0,0 +1,119 @@
+"""Cost of the follow-up scheduler against polling the tasks table.
+
+Usage: python benchmarks/bench_followups.py [--tasks 200000] [--users 5] [--assignees 200]
+
+Seeds --tasks tasks across --users users with SMTP configured, half of
+them completed. Open tasks are due evenly over the next 70 days (the first
+day already overdue), so with the default 24h lead about 3% are due now.
+Measures the startup heap load, an idle tick, the full-table query a
+poller would run each tick instead, a sync with nothing new, and the ticks
+that remind every due task. Finally checks that a task completed after
+startup is not reminded and that a task created after startup is picked
+up by the next sync.
+"""
+import argparse
+import random
+import time
+
+from _common import fmt_time, per_call, report
+
+from database import db
+from followups import FollowUpScheduler
+
+POLL_QUERY = """
+    SELECT id, user_id, title, priority, assignee, assignee_email, due_date
+    FROM tasks
+    WHERE status != 'completed' AND assignee_email IS NOT NULL AND due_date IS NOT NULL
+      AND CAST(strftime('%s', due_date) AS INTEGER) <= :due_before
+      AND (last_followup IS NULL OR CAST(strftime('%s', last_followup) AS INTEGER) <= :followed_up_before)
+"""
+
+
+def seed(tasks: int, users: int, assignees: int, now: float, rng: random.Random) -> list:
+    user_ids = []
+    for u in range(users):
+        user_id = db.create_user(f"User {u}", f"u{u}@example.com", "secret")
+        db.update_user_config(user_id, {
+            "smtp_host": "smtp.example.com", "smtp_port": 587, "smtp_user": f"u{u}@example.com", "smtp_pass": "secret"
+        })
+        user_ids.append(user_id)
+
+    rows = []
+    for i in range(tasks):
+        assignee = rng.randrange(assignees)
+        rows.append((
+            rng.choice(user_ids), f"Task {i}", rng.choice(("low", "medium", "high")),
+            "completed" if i % 2 else "pending", f"Assignee {assignee}", f"a{assignee}@example.com",
+            int(now + rng.uniform(-86400, 69 * 86400))
+        ))
+    with db.connection() as conn:
+        conn.executemany("""
+            INSERT INTO tasks (user_id, title, priority, status, assignee, assignee_email, due_date)
+            VALUES (?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+        """, rows)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--assignees", type=int, default=200)
+    args = parser.parse_args()
+
+    now = time.time()
+    user_ids = seed(args.tasks, args.users, args.assignees, now, random.Random(24))
+    scheduler = FollowUpScheduler(db)
+    print(f"{args.tasks} tasks, {args.tasks - args.tasks // 2} open, {args.users} users")
+
+    started = time.perf_counter()
+    tracked = scheduler.sync()
+    report("startup heap load", f"{fmt_time(time.perf_counter() - started)} ({tracked} tasks)")
+    report("idle tick", fmt_time(per_call(lambda: scheduler.run_once(now - 2 * 86400), 100_000)))
+
+    params = {"due_before": now + scheduler.lead, "followed_up_before": now - scheduler.interval}
+
+    def poll():
+        with db.connection() as conn:
+            conn.execute(POLL_QUERY, params).fetchall()
+    report("polling the full table instead", f"{fmt_time(per_call(poll, 20))} per tick")
+    report("sync with nothing new", fmt_time(per_call(scheduler.sync, 1000)))
+
+    with db.connection() as conn:
+        due = [row[0] for row in conn.execute(POLL_QUERY, params)]
+        completed = due[:100]
+        conn.executemany("UPDATE tasks SET status = 'completed' WHERE id = ?", [(task_id,) for task_id in completed])
+
+    ticks, reminded = 0, 0
+    started = time.perf_counter()
+    while True:
+        followed_up = scheduler.run_once(now)
+        if not followed_up:
+            break
+        ticks += 1
+        reminded += followed_up
+    elapsed = time.perf_counter() - started
+    with db.connection() as conn:
+        digests = conn.execute("SELECT COUNT(*) FROM outbox WHERE email_type = 'task_followup'").fetchone()[0]
+        reminded_completed = conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE id IN (SELECT value FROM json_each(?)) AND last_followup IS NOT NULL",
+            (str(completed),)
+        ).fetchone()[0]
+    report(f"{reminded} due tasks", f"{ticks} ticks of up to {scheduler.batch_size}, {fmt_time(elapsed)} total "
+                                    f"({fmt_time(elapsed / max(reminded, 1))} per task), {digests} digests queued")
+    report("completed after startup, reminded", reminded_completed)
+
+    with db.connection() as conn:
+        task_id = conn.execute("""
+            INSERT INTO tasks (user_id, title, status, assignee, assignee_email, due_date)
+            VALUES (?, 'Late arrival', 'pending', 'Ana', 'ana@example.com', datetime(?, 'unixepoch'))
+        """, (user_ids[0], int(now))).lastrowid
+    scheduler.sync()
+    scheduler.run_once(now)
+    with db.connection() as conn:
+        picked_up = conn.execute("SELECT last_followup IS NOT NULL FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+    report("created after startup, reminded", bool(picked_up))
+
+
+if __name__ == "__main__":
+    main()
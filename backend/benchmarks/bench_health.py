@@ -0,0 +1,128 @@
+"""Latency of /api/system/status with cached, concurrent health probes.
+
+Usage: python benchmarks/bench_health.py [--latency 0.3] [--callers 10]
+
+The OpenAI models list and the SMTP login are stubbed to take --latency
+seconds each. Measures a cold cache hit by --callers concurrent callers
+(they should share one probe of each service), a warm cached call, a
+stale entry (answered from the cache while a background probe refreshes
+it), and an SMTP server that never answers, which should be cut off at
+the probe timeout. The old inline path, a completion followed by an SMTP
+login, is shown for comparison.
+"""
+import argparse
+import asyncio
+import time
+
+from _common import fmt_time, report
+
+import health
+from health import HealthProber
+from openai_service import ClientRegistry, async_openai_service
+
+
+class ProbeStubs:
+    """Slow stand-ins for the OpenAI models endpoint and the SMTP login"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.smtp_latency = latency
+        self.openai_probes = 0
+        self.smtp_probes = 0
+
+    def client(self, api_key):
+        stubs = self
+
+        class Models:
+            async def list(self):
+                stubs.openai_probes += 1
+                await asyncio.sleep(stubs.latency)
+                return []
+
+        class Client:
+            models = Models()
+
+            def with_options(self, **_):
+                return self
+
+        return Client()
+
+    def connect_smtp(self, config, timeout=30.0):
+        self.smtp_probes += 1
+        time.sleep(self.smtp_latency)
+
+        class Session:
+            def quit(self):
+                pass
+
+        return Session()
+
+
+def config_for(user_id: int) -> dict:
+    return {
+        "openai_key": f"sk-{user_id}", "smtp_host": "smtp.example.com", "smtp_port": 587,
+        "smtp_user": f"user{user_id}@example.com", "smtp_pass": "secret"
+    }
+
+
+async def measure(prober: HealthProber, stubs: ProbeStubs, callers: int):
+    results = {}
+
+    started = time.perf_counter()
+    await stubs.client(None).models.list()
+    await asyncio.get_running_loop().run_in_executor(None, stubs.connect_smtp, None)
+    results["old inline path, per caller"] = fmt_time(time.perf_counter() - started)
+
+    stubs.openai_probes = stubs.smtp_probes = 0
+    config = config_for(1)
+    started = time.perf_counter()
+    await asyncio.gather(*(prober.status(1, config) for _ in range(callers)))
+    results[f"cold, {callers} concurrent callers"] = (
+        f"{fmt_time(time.perf_counter() - started)}, {stubs.openai_probes} OpenAI + {stubs.smtp_probes} SMTP probe(s)"
+    )
+
+    repeat = 10_000
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await prober.status(1, config)
+    results["warm"] = f"{fmt_time((time.perf_counter() - started) / repeat)} per call"
+
+    prober.cache.get((1, health.config_hash(config)))["checked_at"] -= prober.refresh_after + 1
+    started = time.perf_counter()
+    await prober.status(1, config)
+    stale = time.perf_counter() - started
+    await asyncio.gather(*prober._inflight.values())
+    refreshed = time.time() - prober.cache.get((1, health.config_hash(config)))["checked_at"] < 1
+    results["stale"] = f"{fmt_time(stale)}, refreshed in the background: {refreshed}"
+    return results
+
+
+async def hung_smtp(stubs: ProbeStubs, timeout: float):
+    prober = HealthProber(timeout=timeout)
+    stubs.smtp_latency = timeout + 2
+    started = time.perf_counter()
+    status = await prober.status(2, config_for(2))
+    prober.shutdown()
+    return f"answered after {fmt_time(time.perf_counter() - started)}: {status['smtp']['error']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--callers", type=int, default=10)
+    args = parser.parse_args()
+
+    stubs = ProbeStubs(args.latency)
+    health.OPENAI_AVAILABLE = True
+    health.connect_smtp = stubs.connect_smtp
+    async_openai_service.clients = ClientRegistry(stubs.client, closer=lambda client: None)
+    prober = HealthProber()
+
+    print(f"OpenAI and SMTP probes stubbed at {fmt_time(args.latency)} each")
+    for label, value in asyncio.run(measure(prober, stubs, args.callers)).items():
+        report(label, value)
+    report("hung SMTP server, 1s timeout", asyncio.run(hung_smtp(stubs, 1.0)))
+    prober.shutdown()
+
+
+if __name__ == "__main__":
+    main()
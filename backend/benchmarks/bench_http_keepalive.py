@@ -0,0 +1,105 @@
+"""Compare a new HTTPS connection per LLM call with a kept-alive one.
+
+Usage: python benchmarks/bench_http_keepalive.py [--calls 300]
+
+Serves a canned /v1/chat/completions response from a loopback HTTPS
+server (self-signed certificate made with the openssl CLI) and posts to
+it --calls times, first opening a connection per call, then reusing one.
+The stdlib client stands in for httpx, so this measures what the
+ClientRegistry saves on connection and TLS setup alone; over a real WAN
+link each fresh connection also pays TCP and TLS round trips.
+"""
+import argparse
+import http.client
+import json
+import ssl
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import _common
+from _common import fmt_time, report
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hello"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}
+}).encode()
+REQUEST = json.dumps({"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Hi"}]})
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40ms to every kept-alive response
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    cert, key = _common.SCRATCH_DIR / "cert.pem", _common.SCRATCH_DIR / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def post(conn):
+    conn.request("POST", "/v1/chat/completions", REQUEST, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    server = start_server()
+    port = server.server_address[1]
+    client_context = ssl.create_default_context()
+    client_context.check_hostname = False
+    client_context.verify_mode = ssl.CERT_NONE
+
+    def new_connection():
+        return http.client.HTTPSConnection("127.0.0.1", port, context=client_context)
+
+    def fresh():
+        conn = new_connection()
+        post(conn)
+        conn.close()
+
+    kept_alive = new_connection()
+    post(kept_alive)
+
+    print(f"Loopback HTTPS mock of /v1/chat/completions, {args.calls} calls each")
+    for label, call in (("new connection per call", fresh), ("kept-alive connection", lambda: post(kept_alive))):
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            call()
+        report(label, fmt_time((time.perf_counter() - start) / args.calls))
+    kept_alive.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
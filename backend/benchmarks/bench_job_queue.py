@@ -0,0 +1,52 @@
+"""Latency from enqueueing a job to its completion callback.
+
+Usage: python benchmarks/bench_job_queue.py [--jobs 500] [--workers 1]
+
+Enqueues --jobs no-op jobs one at a time on a scratch database, the way
+end_meeting does: the job is inserted inside the request's transaction,
+a completion listener is subscribed, and workers are woken after the
+commit. Reports the median and p95 time from the commit to the callback.
+"""
+import argparse
+import threading
+import time
+
+import _common
+from _common import fmt_time, median, percentile, report
+
+from jobs import JobQueue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    database = _common.fresh_database()
+    user_id = database.create_user("Bench", "bench@example.com", "secret")
+    queue = JobQueue(database, workers=args.workers)
+    queue.register("bench", lambda job: {"ok": True})
+    queue.start()
+
+    latencies = []
+    for i in range(args.jobs):
+        done = threading.Event()
+        with database.connection():
+            job_id = queue.enqueue(user_id, "bench", {"n": i})
+            queue.subscribe(job_id, lambda job: done.set())
+        committed = time.perf_counter()
+        queue.wake()
+        if not done.wait(5):
+            raise RuntimeError(f"Job {job_id} did not complete")
+        latencies.append(time.perf_counter() - committed)
+    queue.stop()
+
+    print(f"{args.jobs} jobs, {args.workers} worker(s)")
+    report("enqueue to callback, median", fmt_time(median(latencies)))
+    report("enqueue to callback, p95", fmt_time(percentile(latencies, 95)))
+    database.close_all()
+
+
+if __name__ == "__main__":
+    main()
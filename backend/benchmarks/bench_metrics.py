@@ -0,0 +1,86 @@
+"""Overhead of the metrics middleware and the instrumented SQLite connection.
+
+Usage: python benchmarks/bench_metrics.py [--requests 100000] [--queries 200000]
+
+Drives a dummy ASGI app that answers every request with an empty 200,
+directly and through MetricsMiddleware (with and without the
+Server-Timing header), and times a primary-key lookup plus fetchone on an
+in-memory SQLite table through a plain connection and through
+InstrumentedConnection inside a request's timing context.
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+
+from _common import fmt_time, report
+
+from metrics import InstrumentedConnection, MetricsMiddleware, RequestTiming, current_request
+
+
+class Route:
+    path = "/api/tasks/{task_id}"
+
+
+SCOPE = {"type": "http", "method": "GET", "path": "/api/tasks/1", "route": Route()}
+START = {"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]}
+BODY = {"type": "http.response.body", "body": b"{}"}
+
+
+async def app(scope, receive, send):
+    await send(START)
+    await send(BODY)
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def per_request(handler, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await handler(SCOPE, receive, send)
+    return (time.perf_counter() - started) / repeat
+
+
+def per_query(conn, repeat: int) -> float:
+    started = time.perf_counter()
+    for i in range(repeat):
+        conn.execute("SELECT id, title, status FROM tasks WHERE id = ?", (i % 1000 + 1,)).fetchone()
+    return (time.perf_counter() - started) / repeat
+
+
+def connect(factory=sqlite3.Connection):
+    conn = sqlite3.connect(":memory:", factory=factory)
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT, status TEXT)")
+    conn.executemany("INSERT INTO tasks (title, status) VALUES (?, 'pending')", [(f"Task {i}",) for i in range(1000)])
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for label, handler in (
+        ("bare ASGI app", app),
+        ("with MetricsMiddleware", MetricsMiddleware(app)),
+        ("with Server-Timing", MetricsMiddleware(app, server_timing=True)),
+    ):
+        report(label, f"{fmt_time(asyncio.run(per_request(handler, args.requests)))} per request")
+
+    report("point query, plain connection", fmt_time(per_query(connect(), args.queries)))
+    token = current_request.set(RequestTiming())
+    try:
+        report("point query, instrumented", fmt_time(per_query(connect(InstrumentedConnection), args.queries)))
+    finally:
+        current_request.reset(token)
+
+
+if __name__ == "__main__":
+    main()
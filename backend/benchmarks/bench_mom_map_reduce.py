@@ -0,0 +1,82 @@
+"""End-of-meeting MoM generation for a transcript larger than the context window.
+
+Usage: python benchmarks/bench_mom_map_reduce.py [--tokens 50000] [--context-limit 16000]
+
+Builds a synthetic transcript of about --tokens tokens and generates its
+minutes through OpenAIService.generate_mom, with a fake LLM that sleeps
+2us per prompt token plus 0.5ms per output token and rejects prompts
+over --context-limit. Runs the single-prompt path, map-reduce with one
+and four map workers, and a warm run after ~700 tokens of notes are
+appended, where the cached chunk summaries are reused.
+"""
+import argparse
+import random
+import time
+
+from _common import fmt_time, report
+from fake_llm import ContextLengthExceeded, FakeLLM, configured_user, install
+
+import openai_service
+from database import db
+from openai_service import build_mom_prompt, openai_service as service
+from summarizer import MeetingSummarizer, estimate_tokens
+
+SPEAKERS = ("Ana", "Ben", "Chen", "Dara", "Eli")
+WORDS = (
+    "budget", "launch", "customer", "roadmap", "hiring", "migration", "deadline", "review", "risk", "vendor",
+    "metrics", "design", "support", "pricing", "security", "release", "feedback", "contract", "onboarding", "api"
+)
+
+
+def transcript(tokens: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    lines, size, minute = [], 0, 0
+    while size < tokens:
+        minute += 1
+        line = f"[{minute // 60:02d}:{minute % 60:02d}] {rng.choice(SPEAKERS)}: " + " ".join(
+            rng.choice(WORDS) for _ in range(rng.randint(8, 30))
+        ) + "."
+        lines.append(line)
+        size += estimate_tokens(line) + 1
+    return "\n".join(lines)
+
+
+def run(llm: FakeLLM, user_id: int, title: str, notes: str):
+    llm.reset()
+    started = time.perf_counter()
+    service.generate_mom(user_id, title, "Ana, Ben, Chen, Dara, Eli", notes, raise_errors=True)
+    return f"{fmt_time(time.perf_counter() - started)}, {llm.calls} calls ({llm.prompt_tokens / 1000:.1f}k prompt tokens)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=50_000)
+    parser.add_argument("--context-limit", type=int, default=16_000)
+    args = parser.parse_args()
+
+    llm = FakeLLM(per_prompt_token=2e-6, per_token=0.5e-3, context_limit=args.context_limit)
+    install(llm, service)
+    user_id = configured_user(db)
+    notes = transcript(args.tokens)
+    print(f"Synthetic transcript of {estimate_tokens(notes) / 1000:.1f}k tokens, "
+          f"context limit {args.context_limit / 1000:.0f}k")
+
+    single = MeetingSummarizer(build_mom_prompt)
+    try:
+        llm.complete(**single.mom_request("Planning", "Ana, Ben", notes))
+        report("single prompt", "fit in the context window")
+    except ContextLengthExceeded:
+        report("single prompt", "context_length_exceeded")
+
+    # Each cold run gets its own title, so it cannot reuse the other run's cached summaries
+    for concurrency in (1, 4):
+        openai_service.mom_summarizer = MeetingSummarizer(build_mom_prompt, max_concurrency=concurrency)
+        report(f"map-reduce, concurrency {concurrency}", run(llm, user_id, f"Planning {concurrency}", notes))
+
+    appended = notes + "\n" + transcript(700, seed=8)
+    report("~700 more tokens appended, warm", run(llm, user_id, "Planning 4", appended))
+    openai_service.mom_summarizer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
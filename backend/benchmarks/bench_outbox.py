@@ -0,0 +1,139 @@
+"""Outbox delivery over a pooled SMTP session versus a connection per message.
+
+Usage: python benchmarks/bench_outbox.py [--messages 200]
+
+Runs a minimal SMTP server on loopback that accepts every recipient
+except reject@example.com (550). STARTTLS and login are patched out of
+connect_smtp because the stand-in does not speak them; real servers add
+those round trips to every new connection, which widens the gap.
+
+The old path opened a session, sent one message, quit and logged the
+email on a fresh SQLite connection. The outbox path enqueues rows and
+lets EmailService drain them in batches over one pooled session.
+"""
+import argparse
+import smtplib
+import socketserver
+import sqlite3
+import threading
+import time
+
+from _common import fmt_time, report
+
+import email_service as email_module
+from database import db
+from email_service import EmailService
+
+REJECTED = "reject@example.com"
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of RFC 5321 for smtplib's sendmail, noop and quit"""
+    # Multi-line replies go out in several writes; without this, delayed ACKs
+    # stall every new session by ~40ms and dominate the per-message path
+    disable_nagle_algorithm = True
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost bench SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif verb in ("HELO", "MAIL", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                self.reply("550 No such user" if REJECTED in command else "250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def connect_without_tls(config: dict, timeout: float = 30.0) -> smtplib.SMTP:
+    return smtplib.SMTP(config['smtp_host'], config['smtp_port'], timeout=timeout)
+
+
+def send_per_connection(service: EmailService, config: dict, user_id: int, recipient: str, subject: str, body: str):
+    """The pre-outbox send_email: one session and one SQLite connection per message"""
+    server = connect_without_tls(config)
+    server.sendmail(config['smtp_user'], recipient, service.build_message(config['smtp_user'], recipient, subject, body))
+    server.quit()
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("""
+        INSERT INTO emails (user_id, recipient, subject, body, email_type, related_id)
+        VALUES (?, ?, ?, ?, 'general', NULL)
+    """, (user_id, recipient, subject, body))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    server = SMTPServer(("127.0.0.1", 0), SMTPHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    email_module.connect_smtp = connect_without_tls
+
+    user_id = db.create_user("Bench", "bench@example.com", "secret")
+    db.update_user_config(user_id, {
+        "smtp_host": "127.0.0.1", "smtp_port": server.server_address[1],
+        "smtp_user": "bench@example.com", "smtp_pass": "secret"
+    })
+    config = db.get_user_config(user_id)
+    service = EmailService(db, batch_size=50)
+    body = "Hello,\n\nThis is a benchmark message.\n" * 5
+    print(f"{args.messages} messages to a loopback SMTP stand-in")
+
+    started = time.perf_counter()
+    for i in range(args.messages):
+        send_per_connection(service, config, user_id, f"user{i}@example.com", f"Old path {i}", body)
+    report("connect-per-message (old path)", f"{args.messages / (time.perf_counter() - started):.0f} msg/s")
+
+    started = time.perf_counter()
+    outbox_ids = [
+        service.queue_email(user_id, f"user{i}@example.com", f"Outbox {i}", body) for i in range(args.messages)
+    ]
+    enqueue = (time.perf_counter() - started) / args.messages
+    rejected = service.queue_email(user_id, REJECTED, "Rejected", body)
+    started = time.perf_counter()
+    while service.run_once():
+        pass
+    drained = (args.messages + 1) / (time.perf_counter() - started)
+    report("outbox enqueue", f"{fmt_time(enqueue)}/msg")
+    report("outbox drain", f"{drained:.0f} msg/s, {service.sessions.stats()['opened']} session(s) opened")
+
+    with db.connection() as conn:
+        sent = conn.execute(
+            "SELECT COUNT(*) FROM outbox WHERE id IN (SELECT value FROM json_each(?)) AND status = 'sent'",
+            (str(outbox_ids),)
+        ).fetchone()[0]
+        logged = conn.execute("SELECT COUNT(*) FROM emails WHERE subject LIKE 'Outbox %'").fetchone()[0]
+    report("sent rows / emails log rows", f"{sent} / {logged}")
+    report("550 recipient", service.get_outbox_entry(rejected, user_id)["status"])
+    service.sessions.close_all()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
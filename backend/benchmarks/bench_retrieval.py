@@ -0,0 +1,113 @@
+"""Indexing and query cost of the hashed TF-IDF retrieval index.
+
+Usage: python benchmarks/bench_retrieval.py [--chunks 100000] [--backlog 20000] [--queries 200]
+
+Loads --chunks tasks for one user (the triggers copy them into
+retrieval_chunks) from a synthetic 20k-word vocabulary and measures:
+- the initial embedding and the size of the vector file;
+- query latency, against a full matrix-vector product over all chunks;
+- re-embedding one edited chunk, a chit-chat query and a deleted email;
+- a chat arriving with --backlog new chunks pending, which embeds at most
+  request_refresh_limit of them inline and queues the rest, compared with
+  embedding the whole backlog inline;
+- the one-off cost of starting a brand-new vector file for the user.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import _common
+from _common import fmt_time, median, percentile, report
+
+from database import db
+from retrieval import REFRESH_JOB, RetrievalIndex
+
+
+def vocabulary(size: int, rng: random.Random):
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def add_tasks(user_id: int, count: int, words, rng: random.Random):
+    with db.connection() as conn:
+        conn.executemany(
+            "INSERT INTO tasks (user_id, title, description) VALUES (?, ?, ?)",
+            [(user_id, " ".join(rng.choices(words, k=5)), " ".join(rng.choices(words, k=rng.randint(30, 80))))
+             for _ in range(count)]
+        )
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--backlog", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(23)
+    words = vocabulary(20_000, rng)
+    user_id = db.create_user("Bench", "bench@example.com", "secret")
+    index = RetrievalIndex(db, str(_common.SCRATCH_DIR / "index"))
+    add_tasks(user_id, args.chunks, words, rng)
+
+    print(f"{args.chunks} chunks for one user, synthetic 20k-word vocabulary")
+    elapsed, _ = timed(lambda: index.refresh(user_id))
+    size = index._vectors(user_id).vector_path.stat().st_size
+    report("initial embedding", f"{fmt_time(elapsed)} ({args.chunks / elapsed / 1000:.1f}k chunks/s), "
+                                f"{size / 2**20:.0f}MB file")
+
+    queries = [" ".join(rng.choices(words, k=rng.randint(2, 4))) for _ in range(args.queries)]
+    samples = [timed(lambda: index.search(user_id, query))[0] for query in queries]
+    report("query p50 / p95", f"{fmt_time(median(samples))} / {fmt_time(percentile(samples, 95))}")
+
+    vectors = index._vectors(user_id)
+    full_query = np.random.default_rng(1).random(index.dim, dtype=np.float32)
+    matvec = [timed(lambda: vectors.vectors[:vectors.count] @ full_query)[0] for _ in range(20)]
+    report(f"full {vectors.count} x {index.dim} matvec instead", f"{fmt_time(median(matvec))} per query")
+
+    with db.connection() as conn:
+        task_id = conn.execute("SELECT MAX(id) FROM tasks WHERE user_id = ?", (user_id,)).fetchone()[0]
+        conn.execute("UPDATE tasks SET description = 'quarterly vendor escalation' WHERE id = ?", (task_id,))
+    elapsed, _ = timed(lambda: index.refresh(user_id))
+    report("incremental update of one chunk", fmt_time(elapsed))
+    report("chit-chat query", f"{len(index.search(user_id, 'hi there, thanks a lot!'))} results")
+
+    with db.connection() as conn:
+        email_id = conn.execute(
+            "INSERT INTO emails (user_id, recipient, subject, body) VALUES (?, 'a@example.com', 'Zorblat renewal', "
+            "'The zorblat contract renews in March')", (user_id,)
+        ).lastrowid
+    found = [hit["id"] for hit in index.search(user_id, "zorblat contract") if hit["kind"] == "email"]
+    with db.connection() as conn:
+        conn.execute("DELETE FROM emails WHERE id = ?", (email_id,))
+    gone = email_id not in [hit["id"] for hit in index.search(user_id, "zorblat contract") if hit["kind"] == "email"]
+    report("deleted email", f"found before: {email_id in found}, gone after: {gone}")
+
+    add_tasks(user_id, args.backlog, words, rng)
+    elapsed, _ = timed(lambda: index.search(user_id, queries[0]))
+    with db.connection() as conn:
+        queued = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE kind = ? AND user_id = ? AND status = 'queued'", (REFRESH_JOB, user_id)
+        ).fetchone()[0]
+    report(f"chat with a {args.backlog} backlog", f"{fmt_time(elapsed)}, refresh job queued: {bool(queued)}")
+    elapsed, _ = timed(lambda: index.refresh(user_id))
+    report("whole backlog inline instead", fmt_time(elapsed))
+
+    fresh = RetrievalIndex(db, str(_common.SCRATCH_DIR / "new_index"))
+    elapsed, _ = timed(lambda: fresh._vectors(user_id))
+    report("new vector file (one-off UPDATE)", fmt_time(elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""End-of-meeting MoM cost with and without a rolling summary.
+
+Usage: python benchmarks/bench_rolling_summary.py [--notes 200,2000,8000] [--every 100]
+
+For each meeting size, one meeting ends with only its raw notes (the
+map-reduce path) and another has had update_rolling_summary_job fold its
+notes every --every notes, as the debounced job would during the
+meeting. Only generate_mom_job, the work left when the meeting ends, is
+timed. The fake LLM sleeps 2us per prompt token plus 0.5ms per output
+token.
+"""
+import argparse
+import random
+import time
+
+from _common import fmt_time, report
+from fake_llm import FakeLLM, configured_user, install
+
+from database import db
+from meeting_jobs import generate_mom_job, update_rolling_summary_job
+from openai_service import mom_summarizer, openai_service
+
+WORDS = (
+    "budget", "launch", "customer", "roadmap", "hiring", "migration", "deadline", "review", "risk", "vendor",
+    "metrics", "design", "support", "pricing", "security", "release", "feedback", "contract", "onboarding", "api"
+)
+
+
+def note(rng: random.Random) -> str:
+    return f"{rng.choice(('Ana', 'Ben', 'Chen'))}: " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 35)))
+
+
+def meeting_with_notes(user_id: int, title: str, count: int, fold_every: int = None) -> int:
+    rng = random.Random(count)
+    with db.connection() as conn:
+        meeting_id = conn.execute(
+            "INSERT INTO meetings (user_id, title, attendees) VALUES (?, ?, 'Ana, Ben, Chen')", (user_id, title)
+        ).lastrowid
+    for i in range(1, count + 1):
+        db.add_meeting_note(user_id, meeting_id, note(rng))
+        if fold_every and i % fold_every == 0:
+            update_rolling_summary_job({"id": 0, "user_id": user_id, "payload": {"meeting_id": meeting_id}})
+    with db.connection() as conn:
+        conn.execute("UPDATE meetings SET status = 'completed' WHERE id = ?", (meeting_id,))
+    return meeting_id
+
+
+def end_meeting(llm: FakeLLM, user_id: int, meeting_id: int) -> str:
+    llm.reset()
+    started = time.perf_counter()
+    generate_mom_job({"id": 0, "user_id": user_id, "payload": {"meeting_id": meeting_id}})
+    elapsed = time.perf_counter() - started
+    return f"{fmt_time(elapsed)}, {llm.calls:>3} calls, {llm.prompt_tokens / 1000:5.1f}k prompt tokens"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", default="200,2000,8000")
+    parser.add_argument("--every", type=int, default=100)
+    args = parser.parse_args()
+
+    llm = FakeLLM(per_prompt_token=2e-6, per_token=0.5e-3)
+    install(llm, openai_service)
+    user_id = configured_user(db)
+
+    print(f"End-of-meeting cost, rolling updates every {args.every} notes")
+    for count in (int(n) for n in args.notes.split(",")):
+        full = meeting_with_notes(user_id, f"Full {count}", count)
+        rolling = meeting_with_notes(user_id, f"Rolling {count}", count, args.every)
+        report(f"{count} notes, full notes", end_meeting(llm, user_id, full))
+        report(f"{count} notes, rolling summary", end_meeting(llm, user_id, rolling))
+    mom_summarizer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Full-text search latency over a large synthetic corpus.
+
+Usage: python benchmarks/bench_search.py [--scale 1.0] [--users 100] [--repeat 20]
+
+At --scale 1.0 the corpus is 1.01M rows across --users users: 600k tasks,
+200k sent emails, 190k meeting notes and 10k meetings, loaded through the
+normal tables so the search_index triggers do the indexing. Text is drawn
+from a 5000-word synthetic vocabulary; "budget" and "review" are each
+mixed into ~20% of rows, and "zyxquor" into 13 rows of the measured user.
+Reports the load rate, the database size and p50 latencies for the first
+page of 20 results for one user, plus an unranked LIKE scan of tasks.
+"""
+import argparse
+import os
+import random
+import time
+
+import _common
+from _common import fmt_time, median, report
+
+from search import search
+
+COMMON = ("budget", "review")
+RARE = "zyxquor"
+RARE_HITS = 13
+
+
+def vocabulary(size: int, rng: random.Random):
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+class TextGenerator:
+    def __init__(self, seed: int = 21):
+        self.rng = random.Random(seed)
+        self.words = vocabulary(5000, self.rng)
+
+    def text(self, low: int, high: int) -> str:
+        words = self.rng.choices(self.words, k=self.rng.randint(low, high))
+        for term in COMMON:
+            if self.rng.random() < 0.2:
+                words.insert(self.rng.randrange(len(words) + 1), term)
+        return " ".join(words)
+
+
+def load(database, scale: float, users: int):
+    gen = TextGenerator()
+    tasks, emails, notes, meetings = (int(n * scale / users) for n in (600_000, 200_000, 190_000, 10_000))
+    meetings = max(meetings, 1)
+    for u in range(users):
+        with database.connection() as conn:
+            user_id = conn.execute(
+                "INSERT INTO users (name, email, password_hash) VALUES (?, ?, 'x')", (f"User {u}", f"u{u}@example.com")
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO tasks (user_id, title, description) VALUES (?, ?, ?)",
+                [(user_id, gen.text(3, 8), gen.text(10, 40)) for _ in range(tasks)]
+            )
+            conn.executemany(
+                "INSERT INTO emails (user_id, recipient, subject, body) VALUES (?, 'a@example.com', ?, ?)",
+                [(user_id, gen.text(3, 8), gen.text(30, 80)) for _ in range(emails)]
+            )
+            meeting_ids = []
+            for _ in range(meetings):
+                meeting_ids.append(conn.execute(
+                    "INSERT INTO meetings (user_id, title, mom) VALUES (?, ?, ?)",
+                    (user_id, gen.text(3, 6), gen.text(40, 120))
+                ).lastrowid)
+            per_meeting = notes // meetings
+            conn.executemany(
+                "INSERT INTO meeting_notes (meeting_id, seq, note) VALUES (?, ?, ?)",
+                [(meeting_id, seq, gen.text(8, 30)) for meeting_id in meeting_ids for seq in range(1, per_meeting + 1)]
+            )
+            if u == 0:
+                measured = user_id
+                rare_ids = [row[0] for row in conn.execute(
+                    "SELECT id FROM tasks WHERE user_id = ? ORDER BY id LIMIT ?", (user_id, RARE_HITS)
+                )]
+                conn.executemany(
+                    "UPDATE tasks SET description = description || ' ' || ? WHERE id = ?",
+                    [(RARE, task_id) for task_id in rare_ids]
+                )
+    return measured, users * (tasks + emails + meetings + per_meeting * meetings)
+
+
+def p50(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database = _common.fresh_database()
+    started = time.perf_counter()
+    user_id, rows = load(database, args.scale, args.users)
+    elapsed = time.perf_counter() - started
+    with database.connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size = os.path.getsize(database.db_path)
+
+    print(f"{rows} rows across {args.users} users")
+    report("load with triggers", f"{fmt_time(elapsed)} ({rows / elapsed / 1000:.1f}k rows/s), {size / 2**20:.0f}MB")
+
+    with database.connection() as conn:
+        def first_page(query):
+            return lambda: search(conn, user_id, query, None, 0, 20)
+
+        def hits(query):
+            match_count = conn.execute(
+                "SELECT COUNT(*) FROM search_index WHERE search_index MATCH ?",
+                (f"scope: u{user_id} AND {{title body}}: ({' AND '.join(query.split())})",)
+            ).fetchone()[0]
+            return f"{match_count} hits"
+
+        for label, query in (
+            ("rare term", RARE), ("no hits", "qqqqzz"), ("very common term", COMMON[0]), ("two common terms", " ".join(COMMON))
+        ):
+            report(label, f"p50 {fmt_time(p50(first_page(query), args.repeat))} ({hits(query)})")
+
+        def like_tasks():
+            conn.execute(
+                "SELECT id, title FROM tasks WHERE user_id = ? AND (title LIKE ? OR description LIKE ?) LIMIT 20",
+                (user_id, f"%{RARE}%", f"%{RARE}%")
+            ).fetchall()
+        report("LIKE on tasks alone, rare term", f"p50 {fmt_time(p50(like_tasks, args.repeat))}, unranked")
+    database.close_all()
+
+
+if __name__ == "__main__":
+    main()
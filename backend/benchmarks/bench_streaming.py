@@ -0,0 +1,82 @@
+"""Time to first byte for /api/chat versus /api/chat/stream.
+
+Usage: python benchmarks/bench_streaming.py [--first-token 0.3] [--tokens 150] [--per-token 0.02]
+
+Runs both chat paths against a fake LLM that takes --first-token seconds
+to produce its first token and --per-token seconds for each of the
+following --tokens. /api/chat can only answer once generate_response has
+the whole reply; the streaming path sends its "command" event as soon as
+the conversation is loaded and then one "token" event per delta. The
+event generator below mirrors the one in server.py, since FastAPI and
+uvicorn are not needed to measure where the first byte becomes available.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from _common import fmt_time, report
+from fake_llm import FakeLLM, configured_user, install
+
+from command_router import command_router
+from conversation import conversation_memory
+from database import adb, db
+from openai_service import async_openai_service
+
+MESSAGE = "Can you help me plan the quarterly review agenda?"
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(user_id: int):
+    conversation = await adb.run(conversation_memory.open, user_id, None, MESSAGE)
+    match = command_router.classify(MESSAGE)
+    yield sse_event("command", {
+        "command_detected": match.command if match else None,
+        "action_required": match.action if match else None,
+        "conversation_id": conversation["id"]
+    })
+    async for delta in async_openai_service.stream_response(user_id, MESSAGE, "", conversation["history"]):
+        yield sse_event("token", {"text": delta})
+    yield sse_event("done", {})
+
+
+async def measure(user_id: int):
+    started = time.perf_counter()
+    await async_openai_service.generate_response(user_id, MESSAGE)
+    blocking_first_byte = time.perf_counter() - started
+
+    started = time.perf_counter()
+    arrivals = []
+    async for event in event_stream(user_id):
+        arrivals.append((event.split("\n", 1)[0], time.perf_counter() - started))
+    first_token = next(elapsed for event, elapsed in arrivals if event == "event: token")
+    return blocking_first_byte, arrivals[0][1], first_token, arrivals[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--tokens", type=int, default=150)
+    parser.add_argument("--per-token", type=float, default=0.02)
+    args = parser.parse_args()
+
+    llm = FakeLLM(first_token=args.first_token, per_token=args.per_token, reply_tokens=args.tokens)
+    install(llm, async_openai_service)
+    # Every run must reach the fake LLM rather than the response cache
+    user_id = configured_user(db, llm_cache_enabled=False)
+
+    blocking, command, first_token, done = asyncio.run(measure(user_id))
+    print(f"Fake LLM: {fmt_time(args.first_token)} to the first token, then {args.tokens} tokens "
+          f"at {fmt_time(args.per_token)} each")
+    report("/api/chat (generate_response)", f"first byte after {fmt_time(blocking)}")
+    report("/api/chat/stream command event", fmt_time(command))
+    report("/api/chat/stream first token", fmt_time(first_token))
+    report("/api/chat/stream done", fmt_time(done))
+    adb.shutdown()
+
+
+if __name__ == "__main__":
+    main()
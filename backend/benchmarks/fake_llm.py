@@ -0,0 +1,150 @@
+"""A scripted stand-in for the OpenAI chat completions API.
+
+FakeLLM answers each request with max_tokens words (capped by reply_tokens)
+after sleeping first_token + per_prompt_token * prompt tokens + per_token *
+reply tokens. Streams yield one word per per_token after the first token.
+Prompt tokens are estimated like the summarizer does (len / 4), and a
+request over context_limit fails the way the real API does.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from summarizer import estimate_tokens
+
+
+class ContextLengthExceeded(Exception):
+    pass
+
+
+class FakeLLM:
+    def __init__(self, first_token: float = 0.0, per_token: float = 0.0, per_prompt_token: float = 0.0,
+                 reply_tokens: int = None, context_limit: int = None):
+        self.first_token = first_token
+        self.per_token = per_token
+        self.per_prompt_token = per_prompt_token
+        self.reply_tokens = reply_tokens
+        self.context_limit = context_limit
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.prompt_tokens = self.max_in_flight = 0
+
+    def _start(self, messages, max_tokens):
+        prompt = sum(estimate_tokens(str(m["content"])) for m in messages)
+        if self.context_limit and prompt + (max_tokens or 0) > self.context_limit:
+            raise ContextLengthExceeded(
+                f"context_length_exceeded: {prompt} prompt + {max_tokens} completion > {self.context_limit}"
+            )
+        reply = max_tokens or 100
+        if self.reply_tokens:
+            reply = min(reply, self.reply_tokens)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return prompt, reply
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _latency(self, prompt: int, reply: int) -> float:
+        return self.first_token + self.per_prompt_token * prompt + self.per_token * reply
+
+    @staticmethod
+    def _text(reply: int) -> str:
+        # Distinct per call, so the response cache never serves a reply by accident
+        return f"{uuid.uuid4().hex[:3]} " + " ".join(f"w{i}" for i in range(reply - 1))
+
+    @staticmethod
+    def _response(content: str, prompt: int, reply: int):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt, completion_tokens=reply, total_tokens=prompt + reply)
+        )
+
+    def complete(self, messages, max_tokens: int = None, **_) -> str:
+        """Blocking completion returning the reply text"""
+        prompt, reply = self._start(messages, max_tokens)
+        try:
+            time.sleep(self._latency(prompt, reply))
+            return self._text(reply)
+        finally:
+            self._finish()
+
+    async def acomplete(self, messages, max_tokens: int = None, **_) -> str:
+        """Awaitable completion returning the reply text"""
+        prompt, reply = self._start(messages, max_tokens)
+        try:
+            await asyncio.sleep(self._latency(prompt, reply))
+            return self._text(reply)
+        finally:
+            self._finish()
+
+    async def _create(self, messages, max_tokens: int = None, stream: bool = False, **_):
+        if stream:
+            return self._stream(messages, max_tokens)
+        prompt, reply = self._start(messages, max_tokens)
+        try:
+            await asyncio.sleep(self._latency(prompt, reply))
+            return self._response(self._text(reply), prompt, reply)
+        finally:
+            self._finish()
+
+    async def _stream(self, messages, max_tokens):
+        prompt, reply = self._start(messages, max_tokens)
+        try:
+            await asyncio.sleep(self.first_token + self.per_prompt_token * prompt)
+            for i, word in enumerate(self._text(reply).split(" ")):
+                if i:
+                    await asyncio.sleep(self.per_token)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+        finally:
+            self._finish()
+
+    def _create_sync(self, messages, max_tokens: int = None, **_):
+        prompt, reply = self._start(messages, max_tokens)
+        try:
+            time.sleep(self._latency(prompt, reply))
+            return self._response(self._text(reply), prompt, reply)
+        finally:
+            self._finish()
+
+    def async_client(self):
+        """An object shaped like AsyncOpenAI for the parts the services use"""
+        async def close():
+            pass
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create)), close=close)
+
+    def sync_client(self):
+        """An object shaped like OpenAI for the parts the services use"""
+        return SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=self._create_sync)), close=lambda: None
+        )
+
+
+def install(llm: FakeLLM, *services):
+    """Route the given OpenAIService / AsyncOpenAIService instances to llm"""
+    import openai_service
+    openai_service.OPENAI_AVAILABLE = True
+    for service in services:
+        if isinstance(service, openai_service.AsyncOpenAIService):
+            service.clients = openai_service.ClientRegistry(lambda key: llm.async_client(), closer=lambda c: None)
+        else:
+            service.clients = openai_service.ClientRegistry(lambda key: llm.sync_client(), closer=lambda c: None)
+
+
+def configured_user(database, email: str = "bench@example.com", **config) -> int:
+    """A user whose system_config carries an OpenAI key (plus any other settings)"""
+    user_id = database.create_user("Bench", email, "secret")
+    database.update_user_config(user_id, {"openai_key": "sk-bench", **config})
+    return user_id
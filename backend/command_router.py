@@ -0,0 +1,233 @@
+"""Local intent matching for Jarvis commands.
+
+The command list is read from the "Commands you understand" section of the
+Jarvis system prompt, so the router and the LLM always agree on what the
+commands are. Only short messages that start with a command phrase count:
+the phrase is matched against a keyword trie and then fuzzily, for typos.
+Questions, negations and commands embedded in a sentence ("please do not
+complete task 5 yet") fall through to the LLM. A match is answered locally
+from templates and the user's own data, and a state-changing command only
+runs on an exact match; a fuzzy one gets a confirmation prompt instead.
+
+Messages left to the LLM still get a hint(): the command phrase found
+anywhere in them, as the chat endpoint always reported it, so the frontend
+can walk the user through the command's format. A hint never runs anything.
+"""
+import re
+from difflib import SequenceMatcher
+from typing import List, NamedTuple, Optional, Tuple
+
+from database import adb
+from dashboard import dashboard
+from openai_service import JARVIS_SYSTEM_PROMPT
+
+COMMAND_LINE = re.compile(r'^\s*-\s*"([^"]+)"\s*-\s*(.+)$')
+PLACEHOLDER = re.compile(r"\[(\w+)\]")
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Filler words skipped when matching ("send email to [name]", "show all my tasks")
+CONNECTIVES = {"to", "a", "an", "the", "my", "me", "all"}
+# Allowed before or after a command ("jarvis, show tasks please")
+POLITE_WORDS = {"please", "jarvis", "hey", "ok", "okay", "now"}
+# A message starting with one of these asks about a command rather than giving it
+QUESTION_WORDS = {
+    "what", "why", "how", "when", "where", "who", "which", "can", "could", "would", "should",
+    "do", "does", "did", "is", "are", "will", "shall"
+}
+# Anywhere in the message, these turn a command into something else ("don't" is "don", "t")
+NEGATIONS = {"not", "no", "never", "dont", "don", "didn", "doesn", "won", "cannot", "cant"}
+
+# Longer messages are conversation, not commands
+MAX_COMMAND_TOKENS = 8
+# Words allowed after a command whose parameter is a name ("send email to jane doe")
+MAX_ARGUMENT_TOKENS = 3
+FUZZY_THRESHOLD = 0.85
+
+# Commands that change the user's data; only an exact match runs them
+STATE_CHANGING = {"complete_task"}
+
+_END = object()
+
+# What the frontend should do next, for commands that need follow-up input
+ACTIONS = {
+    "start_meeting": "collect_meeting_details",
+    "end_meeting": "generate_mom",
+    "create_task": "collect_task_details",
+    "create_todo": "collect_todo_details",
+    "send_email": "collect_email_details",
+    "system_check": "run_system_check",
+}
+
+# Checked in order anywhere in a message for hint(): "start meeting" -> start_meeting
+HINT_PHRASES = tuple((command.replace("_", " "), command) for command in ACTIONS)
+
+TEMPLATES = {
+    "start_meeting": "> Starting a new meeting. Add notes as you go and say \"end meeting\" when you are done.",
+    "end_meeting": "> Ending the current meeting and generating the Minutes of Meeting...",
+    "create_task": "> Let's create a task. I need a title, a description and the assignee's email.",
+    "create_todo": "> Let's create a to-do. I need a title and an optional description.",
+    "send_email": "> Who should the email go to, and what should it say?",
+    "system_check": "> Running system check...",
+}
+
+LIST_LIMIT = 10
+
+
+class CommandSpec(NamedTuple):
+    command: str
+    keywords: Tuple[str, ...]
+    param: Optional[str]
+    description: str
+
+
+class CommandMatch(NamedTuple):
+    command: str
+    action: Optional[str]
+    confidence: float
+    argument: Optional[str]
+
+
+def parse_commands(prompt: str) -> List[CommandSpec]:
+    """Extract the command list from the Jarvis system prompt"""
+    specs = []
+    in_section = False
+    for line in prompt.splitlines():
+        if line.strip().startswith("Commands you understand"):
+            in_section = True
+            continue
+        if not in_section:
+            continue
+        
+        match = COMMAND_LINE.match(line)
+        if not match:
+            if specs:
+                break
+            continue
+        
+        phrase, description = match.groups()
+        param = PLACEHOLDER.search(phrase)
+        words = TOKEN.findall(PLACEHOLDER.sub("", phrase).lower())
+        keywords = tuple(word for word in words if word not in CONNECTIVES)
+        specs.append(CommandSpec("_".join(keywords), keywords, param.group(1) if param else None, description))
+    return specs
+
+
+class CommandRouter:
+    """Classify chat messages into Jarvis commands without calling the LLM"""
+    def __init__(self, specs: List[CommandSpec], fuzzy_threshold: float = FUZZY_THRESHOLD):
+        self.specs = specs
+        self.fuzzy_threshold = fuzzy_threshold
+        self._trie = {}
+        for spec in specs:
+            node = self._trie
+            for word in spec.keywords:
+                node = node.setdefault(word, {})
+            node[_END] = spec
+        self._phrases = [(spec, " ".join(spec.keywords)) for spec in specs]
+    
+    def classify(self, message: str) -> Optional[CommandMatch]:
+        """Return the command a message gives, or None if the LLM should handle it"""
+        if message.rstrip().endswith("?"):
+            return None
+        tokens = TOKEN.findall(message.lower())
+        while tokens and tokens[0] in POLITE_WORDS:
+            tokens.pop(0)
+        while tokens and tokens[-1] in POLITE_WORDS:
+            tokens.pop()
+        if not tokens or len(tokens) > MAX_COMMAND_TOKENS or tokens[0] in QUESTION_WORDS:
+            return None
+        if any(token in NEGATIONS for token in tokens):
+            return None
+        words = [token for token in tokens if token not in CONNECTIVES]
+        
+        # Exact keyword match at the start of the message; the longest wins
+        node, found = self._trie, None
+        for end, word in enumerate(words, 1):
+            node = node.get(word)
+            if node is None:
+                break
+            if _END in node:
+                found = (node[_END], end)
+        if found:
+            spec, end = found
+            return self._match(spec, 1.0, words[end:])
+        
+        # Fuzzy match of the leading words for typos ("show taks", "strat meeting")
+        best = None
+        for spec, phrase in self._phrases:
+            width = len(spec.keywords)
+            matcher = SequenceMatcher(None, " ".join(words[:width]), phrase)
+            if matcher.real_quick_ratio() < self.fuzzy_threshold or matcher.quick_ratio() < self.fuzzy_threshold:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= self.fuzzy_threshold and (best is None or ratio > best[1]):
+                best = (spec, ratio, words[width:])
+        
+        if best:
+            return self._match(*best)
+        return None
+    
+    def hint(self, message: str) -> Optional[CommandMatch]:
+        """The follow-up command a message mentions, for a reply the LLM gives; never executed"""
+        lowered = message.lower()
+        for phrase, command in HINT_PHRASES:
+            if phrase in lowered:
+                return CommandMatch(command, ACTIONS[command], 0.0, None)
+        return None
+    
+    def _match(self, spec: CommandSpec, confidence: float, rest: List[str]) -> Optional[CommandMatch]:
+        """Build the match, or None if the words after the command are not its argument"""
+        argument = None
+        if spec.param == "id":
+            if len(rest) > 1 or (rest and not rest[0].isdigit()):
+                return None
+            argument = rest[0] if rest else None
+        elif spec.param:
+            if len(rest) > MAX_ARGUMENT_TOKENS:
+                return None
+            argument = " ".join(rest) or None
+        elif rest:
+            return None
+        return CommandMatch(spec.command, ACTIONS.get(spec.command), confidence, argument)
+
+
+async def respond(match: CommandMatch, user_id: int) -> str:
+    """Answer a recognized command locally from templates and the user's data"""
+    if match.command in STATE_CHANGING and match.confidence < 1.0:
+        phrase = " ".join(filter(None, (match.command.replace("_", " "), match.argument)))
+        return f"> Did you mean \"{phrase}\"? Send exactly that to confirm."
+    
+    if match.command == "show_tasks":
+        rows = await adb.fetchall("""
+            SELECT id, title, priority, status FROM tasks
+            WHERE user_id = ? AND status != 'completed' ORDER BY created_at DESC LIMIT ?
+        """, (user_id, LIST_LIMIT))
+        if not rows:
+            return "> No open tasks."
+        lines = [f"> #{task_id} [{priority}] {title} ({status})" for task_id, title, priority, status in rows]
+        return "> Open tasks:\n" + "\n".join(lines)
+    
+    if match.command == "show_todos":
+        rows = await adb.fetchall("""
+            SELECT id, title FROM todos
+            WHERE user_id = ? AND status != 'completed' ORDER BY created_at DESC LIMIT ?
+        """, (user_id, LIST_LIMIT))
+        if not rows:
+            return "> No pending to-dos."
+        return "> Pending to-dos:\n" + "\n".join(f"> #{todo_id} {title}" for todo_id, title in rows)
+    
+    if match.command == "complete_task":
+        if not match.argument:
+            return "> Which task? Use \"complete task [id]\", e.g. \"complete task 12\"."
+        updated = await adb.execute("""
+            UPDATE tasks SET status = 'completed' WHERE id = ? AND user_id = ?
+        """, (int(match.argument), user_id))
+        if not updated:
+            return f"> Task #{match.argument} not found."
+        dashboard.bump(user_id)
+        return f"> Task #{match.argument} marked as completed."
+    
+    return TEMPLATES.get(match.command, f"> Command recognized: {match.command}")
+
+
+command_router = CommandRouter(parse_commands(JARVIS_SYSTEM_PROMPT))
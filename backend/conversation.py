@@ -0,0 +1,167 @@
+"""Server-side chat history with token-budgeted prompt context.
+
+Each turn is stored with its token estimate, so building a prompt never
+re-tokenizes the transcript. A prompt gets the conversation's running
+summary plus as many of the newest turns as fit in the history budget;
+turns that fall out of the window are folded into the summary by a
+background job. The client only sends the new message and the conversation
+id, and the prompt stays the same size however long the conversation runs.
+"""
+import logging
+import os
+
+from database import db
+from jobs import job_queue
+from openai_service import openai_service
+from summarizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_SUMMARY_JOB = "summarize_conversation"
+
+# Chat messages carry a few tokens of framing on top of their content
+MESSAGE_OVERHEAD_TOKENS = 4
+SPEAKERS = {"user": "User", "assistant": "Jarvis"}
+
+
+def turn_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationMemory:
+    def __init__(self, database, history_tokens: int = 1500, max_turns: int = 40,
+                 summary_batch: int = 200, summary_debounce: float = 10.0):
+        self.db = database
+        self.history_tokens = history_tokens
+        self.max_turns = max_turns
+        self.summary_batch = summary_batch
+        self.summary_debounce = summary_debounce
+
+    def window(self, conn, conversation_id: int, summary: str, summary_seq: int):
+        """The newest unsummarized turns that fit the budget, oldest first.
+
+        Also returns the id of the newest turn left out (None if all fit);
+        it and every unsummarized turn before it are due to be folded into
+        the summary. Only max_turns + 1 rows are read, whatever the length
+        of the conversation.
+        """
+        rows = conn.execute("""
+            SELECT id, role, content, token_count FROM conversation_turns
+            WHERE conversation_id = ? AND id > ?
+            ORDER BY id DESC LIMIT ?
+        """, (conversation_id, summary_seq, self.max_turns + 1)).fetchall()
+
+        budget = self.history_tokens - (turn_tokens(summary) if summary else 0)
+        turns, used = [], 0
+        for row in rows[:self.max_turns]:
+            if used + row[3] > budget:
+                break
+            turns.append(row)
+            used += row[3]
+        cutoff = rows[len(turns)][0] if len(turns) < len(rows) else None
+        turns.reverse()
+        return turns, cutoff
+
+    def open(self, conn, user_id: int, conversation_id: int, message: str):
+        """Load (or, without an id, start) a conversation and its prompt history.
+
+        Returns None if the conversation does not belong to the user.
+        """
+        if conversation_id is None:
+            cursor = conn.execute(
+                "INSERT INTO conversations (user_id, title) VALUES (?, ?)", (user_id, message[:80])
+            )
+            return {"id": cursor.lastrowid, "history": [], "overflow": False}
+
+        conversation = conn.execute(
+            "SELECT summary, summary_seq FROM conversations WHERE id = ? AND user_id = ?",
+            (conversation_id, user_id)
+        ).fetchone()
+        if not conversation:
+            return None
+
+        summary, summary_seq = conversation
+        turns, cutoff = self.window(conn, conversation_id, summary, summary_seq)
+        history = [{"role": role, "content": content} for _, role, content, _ in turns]
+        if summary:
+            history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        return {"id": conversation_id, "history": history, "overflow": cutoff is not None}
+
+    def record(self, conn, conversation_id: int, message: str, reply: str):
+        """Store a user message and Jarvis's reply"""
+        conn.executemany("""
+            INSERT INTO conversation_turns (conversation_id, role, content, token_count)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (conversation_id, "user", message, turn_tokens(message)),
+            (conversation_id, "assistant", reply, turn_tokens(reply))
+        ])
+        conn.execute(
+            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (conversation_id,)
+        )
+
+    def schedule_summary(self, user_id: int, conversation_id: int) -> int:
+        """Queue a debounced job folding the turns that left the window into the summary"""
+        return job_queue.enqueue(
+            user_id, CONVERSATION_SUMMARY_JOB, {"conversation_id": conversation_id},
+            delay=self.summary_debounce, max_attempts=3,
+            dedupe_key=f"{CONVERSATION_SUMMARY_JOB}:{conversation_id}"
+        )
+
+    def summarize_job(self, job: dict) -> dict:
+        """Fold unsummarized turns older than the current window into the summary"""
+        user_id = job["user_id"]
+        conversation_id = job["payload"]["conversation_id"]
+
+        with self.db.connection() as conn:
+            conversation = conn.execute(
+                "SELECT summary, summary_seq FROM conversations WHERE id = ? AND user_id = ?",
+                (conversation_id, user_id)
+            ).fetchone()
+            if not conversation:
+                return {"conversation_id": conversation_id}
+
+            summary, summary_seq = conversation
+            # Turns still in the window stay verbatim; fold the ones before it
+            _, cutoff = self.window(conn, conversation_id, summary, summary_seq)
+            if cutoff is None:
+                return {"conversation_id": conversation_id, "summary_seq": summary_seq}
+
+            rows = conn.execute("""
+                SELECT id, role, content FROM conversation_turns
+                WHERE conversation_id = ? AND id > ? AND id <= ?
+                ORDER BY id LIMIT ?
+            """, (conversation_id, summary_seq, cutoff, self.summary_batch)).fetchall()
+
+        if not rows:
+            return {"conversation_id": conversation_id, "summary_seq": summary_seq}
+
+        transcript = "\n".join(f"{SPEAKERS.get(role, role)}: {content}" for _, role, content in rows)
+        updated = openai_service.update_conversation_summary(user_id, summary, transcript)
+        if updated is None:
+            return {"conversation_id": conversation_id, "summary_seq": summary_seq}
+
+        last_seq = rows[-1][0]
+        with self.db.connection() as conn:
+            # Only move forward from the state this update was computed on
+            conn.execute("""
+                UPDATE conversations SET summary = ?, summary_seq = ?
+                WHERE id = ? AND summary_seq = ?
+            """, (updated, last_seq, conversation_id, summary_seq))
+
+        if len(rows) == self.summary_batch:
+            job_queue.enqueue(
+                user_id, CONVERSATION_SUMMARY_JOB, {"conversation_id": conversation_id},
+                max_attempts=3, dedupe_key=f"{CONVERSATION_SUMMARY_JOB}:{conversation_id}"
+            )
+        return {"conversation_id": conversation_id, "summary_seq": last_seq}
+
+
+# Initialize conversation memory instance
+conversation_memory = ConversationMemory(
+    db,
+    history_tokens=int(os.environ.get("CHAT_HISTORY_TOKENS", "1500")),
+    max_turns=int(os.environ.get("CHAT_HISTORY_MAX_TURNS", "40"))
+)
+
+job_queue.register(CONVERSATION_SUMMARY_JOB, conversation_memory.summarize_job)
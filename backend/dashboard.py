@@ -0,0 +1,119 @@
+"""Per-user dashboard read model.
+
+The dashboard (counts plus the newest few meetings, open tasks, pending
+todos and sent emails) is loaded with one query and kept in memory together
+with the user's version from dashboard_versions. Triggers (schema migration
+13) bump that version whenever a row the dashboard shows changes, whichever
+process or code path made the change, so the ETag and the cached snapshot
+are checked against one primary-key lookup and never outlive the data.
+A client holding the current ETag gets a 304 without loading the dashboard.
+"""
+import json
+import os
+
+from cache import TTLCache
+from database import db
+
+# Each list is built as a JSON array inside the query, so the whole
+# dashboard comes back as a single row
+DASHBOARD_QUERY = """
+SELECT
+    (SELECT version FROM dashboard_versions WHERE user_id = :user_id),
+    (SELECT COUNT(*) FROM meetings WHERE user_id = :user_id),
+    (SELECT COUNT(*) FROM tasks WHERE user_id = :user_id AND status != 'completed'),
+    (SELECT COUNT(*) FROM todos WHERE user_id = :user_id AND status != 'completed'),
+    (SELECT COUNT(*) FROM emails WHERE user_id = :user_id),
+    (SELECT json_group_array(json_object(
+        'id', id, 'title', title, 'attendees', attendees, 'status', status,
+        'created_at', created_at, 'ended_at', ended_at))
+     FROM (SELECT id, title, attendees, status, created_at, ended_at FROM meetings
+           WHERE user_id = :user_id ORDER BY created_at DESC LIMIT :recent)),
+    (SELECT json_group_array(json_object(
+        'id', id, 'title', title, 'assignee', assignee, 'assignee_email', assignee_email,
+        'priority', priority, 'status', status, 'created_at', created_at,
+        'due_date', due_date, 'last_followup', last_followup))
+     FROM (SELECT id, title, assignee, assignee_email, priority, status, created_at, due_date, last_followup
+           FROM tasks WHERE user_id = :user_id AND status != 'completed'
+           ORDER BY created_at DESC LIMIT :top_n)),
+    (SELECT json_group_array(json_object(
+        'id', id, 'title', title, 'description', description, 'status', status,
+        'created_at', created_at, 'completed_at', completed_at))
+     FROM (SELECT id, title, description, status, created_at, completed_at
+           FROM todos WHERE user_id = :user_id AND status != 'completed'
+           ORDER BY created_at DESC LIMIT :top_n)),
+    (SELECT json_group_array(json_object(
+        'id', id, 'recipient', recipient, 'subject', subject, 'body', body,
+        'sent_at', sent_at, 'email_type', email_type))
+     FROM (SELECT id, recipient, subject, body, sent_at, email_type FROM emails
+           WHERE user_id = :user_id ORDER BY sent_at DESC LIMIT :recent))
+"""
+
+
+class DashboardReadModel:
+    def __init__(self, database, top_n: int = 10, recent: int = 5, maxsize: int = 1024, ttl: float = 300.0):
+        self.db = database
+        self.top_n = top_n
+        self.recent = recent
+        self.snapshots = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def version(self, user_id: int) -> int:
+        """The user's current dashboard version (0 before their first write)"""
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT version FROM dashboard_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def etag(self, user_id: int, version: int) -> str:
+        return f'W/"{user_id}-{version}"'
+
+    def bump(self, user_id: int):
+        """Drop the user's cached snapshot after a write.
+
+        Optional: the triggers already bumped the version, which makes the
+        snapshot stale; this just frees it early.
+        """
+        self.snapshots.invalidate(user_id)
+
+    def cached(self, user_id: int, version: int):
+        """The (version, data) snapshot for this version if it is in memory, else None"""
+        entry = self.snapshots.get(user_id)
+        if entry is not None and entry[0] == version:
+            return entry
+        return None
+
+    def load(self, conn, user_id: int):
+        """Run the dashboard query and decode it; returns (version, data)"""
+        row = conn.execute(DASHBOARD_QUERY, {"user_id": user_id, "top_n": self.top_n, "recent": self.recent}).fetchone()
+        return row[0] or 0, {
+            "counts": {
+                "meetings": row[1],
+                "active_tasks": row[2],
+                "pending_todos": row[3],
+                "emails": row[4]
+            },
+            "recent_meetings": json.loads(row[5]),
+            "active_tasks": json.loads(row[6]),
+            "pending_todos": json.loads(row[7]),
+            "recent_emails": json.loads(row[8])
+        }
+
+    def snapshot(self, user_id: int, version: int = None):
+        """Return (version, data), loading and caching it unless `version` is cached"""
+        if version is not None:
+            cached = self.cached(user_id, version)
+            if cached is not None:
+                return cached
+
+        # The version is read by the same statement as the data, so the
+        # snapshot is always tagged with the version it reflects
+        with self.db.connection() as conn:
+            version, data = self.load(conn, user_id)
+        self.snapshots.set(user_id, (version, data))
+        return version, data
+
+
+# Initialize dashboard read model instance
+dashboard = DashboardReadModel(
+    db,
+    top_n=int(os.environ.get("DASHBOARD_TOP_N", "10")),
+    maxsize=int(os.environ.get("DASHBOARD_CACHE_SIZE", "1024"))
+)
@@ -2,120 +2,172 @@ import sqlite3
 import os
 from pathlib import Path
 import hashlib
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import logging
 
+from cache import TTLCache
+from metrics import InstrumentedConnection
+from migrations import migrate
+
 logger = logging.getLogger(__name__)
 
+# Applied once to every connection when it is opened, never per request
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",  # 16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+)
+
 class Database:
     def __init__(self, db_path="jarvis.db"):
         self.db_path = Path(__file__).parent / db_path
+        # A bounded pool of long-lived connections. A thread checks one out for
+        # its outermost connection() block and returns it afterwards, so
+        # short-lived threads (anyio workers, ad hoc executors) never keep one
+        self.pool_size = int(os.environ.get("DB_POOL_SIZE", "16"))
+        self.pool_timeout = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._pool_available = threading.Condition(self._pool_lock)
+        self._idle = []
+        self._connections = []
+        # Connections opened or being opened; never more than pool_size
+        self._open_count = 0
+        self._pool_hits = 0
+        self._pool_misses = 0
+        self._pool_waits = 0
+        # Decoded system_config rows, keyed by user id
+        self.config_cache = TTLCache(
+            maxsize=int(os.environ.get("CONFIG_CACHE_SIZE", "1024")),
+            ttl=float(os.environ.get("CONFIG_CACHE_TTL", "300"))
+        )
+        self._config_invalidation_publisher = None
         self.init_database()
     
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        """Open a new SQLite connection with the performance PRAGMAs applied"""
+        # Statements are timed for the metrics endpoint and Server-Timing
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=InstrumentedConnection)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
     
-    def init_database(self):
-        """Initialize the SQLite database with required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                security_question TEXT,
-                security_answer TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Meetings table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS meetings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT,
-                attendees TEXT,
-                notes TEXT,
-                mom TEXT,
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ended_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
-        
-        # Tasks table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                assignee TEXT,
-                assignee_email TEXT,
-                priority TEXT DEFAULT 'medium',
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                due_date TIMESTAMP,
-                last_followup TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
+    def _checkout(self):
+        """Take an idle pooled connection, opening a new one while under pool_size"""
+        with self._pool_available:
+            if not self._idle and self._open_count >= self.pool_size:
+                self._pool_waits += 1
+                if not self._pool_available.wait_for(
+                    lambda: self._idle or self._open_count < self.pool_size, self.pool_timeout
+                ):
+                    raise sqlite3.OperationalError(
+                        f"No database connection free after {self.pool_timeout}s (pool size {self.pool_size})"
+                    )
+            if self._idle:
+                self._pool_hits += 1
+                return self._idle.pop()
+            self._pool_misses += 1
+            self._open_count += 1
         
-        # Todos table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS todos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
+        try:
+            conn = self.get_connection()
+        except BaseException:
+            with self._pool_available:
+                self._open_count -= 1
+                self._pool_available.notify()
+            raise
+        with self._pool_lock:
+            self._connections.append(conn)
+        return conn
+    
+    def _checkin(self, conn):
+        """Return a connection to the pool, or close it if the pool was closed meanwhile"""
+        with self._pool_available:
+            if conn in self._connections:
+                self._idle.append(conn)
+                self._pool_available.notify()
+                return
+            self._open_count -= 1
+            self._pool_available.notify()
+        conn.close()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block.
         
-        # Emails table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS emails (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                recipient TEXT NOT NULL,
-                subject TEXT NOT NULL,
-                body TEXT NOT NULL,
-                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                email_type TEXT DEFAULT 'general',
-                related_id INTEGER,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
+        Nested blocks on the same thread share the connection and its
+        transaction: it commits when the outermost block exits cleanly, rolls
+        back if it raises, and then goes back to the pool.
+        """
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = self._checkout()
+            local.conn = conn
+            local.depth = 0
         
-        # System config table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS system_config (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                openai_key TEXT,
-                smtp_host TEXT,
-                smtp_port INTEGER,
-                smtp_user TEXT,
-                smtp_pass TEXT,
-                user_email TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
+        local.depth += 1
+        try:
+            yield conn
+            if local.depth == 1:
+                conn.commit()
+        except BaseException:
+            if local.depth == 1:
+                conn.rollback()
+            raise
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                local.conn = None
+                self._checkin(conn)
+    
+    def pool_stats(self) -> dict:
+        """Report connection pool usage and hit/miss statistics"""
+        with self._pool_lock:
+            hits, misses, waits = self._pool_hits, self._pool_misses, self._pool_waits
+            open_connections = len(self._connections)
+            idle_connections = len(self._idle)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "waits": waits,
+            "pool_size": self.pool_size,
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "in_use": open_connections - idle_connections,
+            "hit_rate": hits / total if total else 0.0
+        }
+    
+    def close_all(self):
+        """Close every pooled connection (used at application shutdown).
         
-        conn.commit()
-        conn.close()
-        logger.info("Database initialized successfully")
+        Connections still checked out are closed when they are returned.
+        """
+        with self._pool_available:
+            connections, self._idle = self._idle, []
+            self._connections = []
+            self._open_count -= len(connections)
+            self._pool_available.notify_all()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to close pooled connection: {e}")
+        self._local = threading.local()
+    
+    def init_database(self):
+        """Bring the SQLite schema up to date by applying pending migrations"""
+        with self.connection() as conn:
+            version = migrate(conn)
+        logger.info(f"Database initialized successfully (schema version {version})")
     
     def hash_password(self, password: str) -> str:
         """Hash password using SHA-256"""
@@ -123,48 +175,41 @@ class Database:
     
     def create_user(self, name: str, email: str, password: str, security_question: str = None, security_answer: str = None):
         """Create a new user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         password_hash = self.hash_password(password)
         
         try:
-            cursor.execute("""
-                INSERT INTO users (name, email, password_hash, security_question, security_answer)
-                VALUES (?, ?, ?, ?, ?)
-            """, (name, email, password_hash, security_question, security_answer))
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO users (name, email, password_hash, security_question, security_answer)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (name, email, password_hash, security_question, security_answer))
+                
+                user_id = cursor.lastrowid
+                
+                # Create default system config
+                cursor.execute("""
+                    INSERT INTO system_config (user_id, user_email)
+                    VALUES (?, ?)
+                """, (user_id, email))
             
-            user_id = cursor.lastrowid
-            conn.commit()
-            
-            # Create default system config
-            cursor.execute("""
-                INSERT INTO system_config (user_id, user_email)
-                VALUES (?, ?)
-            """, (user_id, email))
-            
-            conn.commit()
-            conn.close()
             return user_id
             
         except sqlite3.IntegrityError:
-            conn.close()
             raise ValueError("Email already exists")
     
     def authenticate_user(self, email: str, password: str):
         """Authenticate user credentials"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         password_hash = self.hash_password(password)
         
-        cursor.execute("""
-            SELECT id, name, email FROM users 
-            WHERE email = ? AND password_hash = ?
-        """, (email, password_hash))
-        
-        user = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name, email FROM users 
+                WHERE email = ? AND password_hash = ?
+            """, (email, password_hash))
+            
+            user = cursor.fetchone()
         
         if user:
             return {"id": user[0], "name": user[1], "email": user[2]}
@@ -172,42 +217,144 @@ class Database:
     
     def get_user_config(self, user_id: int):
         """Get user system configuration"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT openai_key, smtp_host, smtp_port, smtp_user, smtp_pass, user_email
-            FROM system_config WHERE user_id = ?
-        """, (user_id,))
+        cached = self.config_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
         
-        config = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT openai_key, smtp_host, smtp_port, smtp_user, smtp_pass, user_email, llm_cache_enabled
+                FROM system_config WHERE user_id = ?
+            """, (user_id,))
+            
+            config = cursor.fetchone()
         
         if config:
-            return {
+            config = {
                 "openai_key": config[0],
                 "smtp_host": config[1],
                 "smtp_port": config[2],
                 "smtp_user": config[3],
                 "smtp_pass": config[4],
-                "user_email": config[5]
+                "user_email": config[5],
+                "llm_cache_enabled": bool(config[6]) if config[6] is not None else True
             }
+            self.config_cache.set(user_id, config)
+            return dict(config)
         return None
     
     def update_user_config(self, user_id: int, config: dict):
         """Update user system configuration"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            conn.execute("""
+                UPDATE system_config 
+                SET openai_key = ?, smtp_host = ?, smtp_port = ?, smtp_user = ?, smtp_pass = ?,
+                    llm_cache_enabled = COALESCE(?, llm_cache_enabled), updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            """, (config.get('openai_key'), config.get('smtp_host'), config.get('smtp_port'), 
+                  config.get('smtp_user'), config.get('smtp_pass'), config.get('llm_cache_enabled'), user_id))
         
-        cursor.execute("""
-            UPDATE system_config 
-            SET openai_key = ?, smtp_host = ?, smtp_port = ?, smtp_user = ?, smtp_pass = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        """, (config.get('openai_key'), config.get('smtp_host'), config.get('smtp_port'), 
-              config.get('smtp_user'), config.get('smtp_pass'), user_id))
+        self.invalidate_user_config(user_id)
+    
+    def invalidate_user_config(self, user_id: int, publish: bool = True):
+        """Drop a cached config and, optionally, tell the other workers to do the same.
         
-        conn.commit()
-        conn.close()
+        A subscriber receiving another worker's message should call this with
+        publish=False so the invalidation is not echoed back.
+        """
+        self.config_cache.invalidate(user_id)
+        if publish and self._config_invalidation_publisher:
+            try:
+                self._config_invalidation_publisher(user_id)
+            except Exception as e:
+                logger.warning(f"Config invalidation publish failed for user {user_id}: {e}")
+    
+    def set_config_invalidation_publisher(self, publish):
+        """Register a callable(user_id) that broadcasts config invalidations (e.g. Redis pub/sub)"""
+        self._config_invalidation_publisher = publish
+
+    def add_meeting_note(self, user_id: int, meeting_id: int, note: str):
+        """Append a note to a meeting; returns its sequence number or None if not found"""
+        with self.connection() as conn:
+            # The next seq is read from the unique (meeting_id, seq) index inside
+            # the INSERT itself, so concurrent writers each get their own row
+            cursor = conn.execute("""
+                INSERT INTO meeting_notes (meeting_id, seq, note)
+                SELECT id, COALESCE((SELECT MAX(seq) FROM meeting_notes WHERE meeting_id = ?), 0) + 1, ?
+                FROM meetings WHERE id = ? AND user_id = ?
+            """, (meeting_id, note, meeting_id, user_id))
+            
+            if cursor.rowcount == 0:
+                return None
+            return conn.execute(
+                "SELECT seq FROM meeting_notes WHERE id = ?", (cursor.lastrowid,)
+            ).fetchone()[0]
+    
+    def get_meeting_notes(self, meeting_id: int, after_seq: int = 0) -> str:
+        """Assemble a meeting's notes (optionally only those after a seq) in sequence order"""
+        with self.connection() as conn:
+            rows = conn.execute("""
+                SELECT note FROM meeting_notes WHERE meeting_id = ? AND seq > ? ORDER BY seq
+            """, (meeting_id, after_seq)).fetchall()
+        return "\n".join(row[0] for row in rows)
+    
+    def get_meeting_notes_batch(self, meeting_id: int, after_seq: int = 0, limit: int = 500):
+        """Fetch (seq, note, created_at) rows after a sequence number, for streaming"""
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT seq, note, created_at FROM meeting_notes
+                WHERE meeting_id = ? AND seq > ? ORDER BY seq LIMIT ?
+            """, (meeting_id, after_seq, limit)).fetchall()
+
+class AsyncDatabase:
+    """Awaitable data-access API that keeps SQLite work off the event loop.
+    
+    Every call runs on a small dedicated executor. Connections are not tied
+    to its threads: each call borrows one from the wrapped Database's pool
+    for its connection() block and returns it afterwards, so the executor
+    and other threads share the same DB_POOL_SIZE connections.
+    """
+    def __init__(self, database: Database, max_workers: int = None):
+        self.db = database
+        max_workers = max_workers or int(os.environ.get("DB_EXECUTOR_THREADS", "4"))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jarvis-db")
+    
+    async def call(self, func, *args, **kwargs):
+        """Run a blocking Database helper (e.g. db.get_user_config) on a DB thread"""
+        loop = asyncio.get_running_loop()
+        # Run in the caller's context so DB time is attributed to its request
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, lambda: context.run(func, *args, **kwargs))
+    
+    async def run(self, func, *args):
+        """Run func(conn, *args) in a single pooled transaction on a DB thread"""
+        return await self.call(self._run_in_transaction, func, args)
+    
+    def _run_in_transaction(self, func, args):
+        with self.db.connection() as conn:
+            return func(conn, *args)
+    
+    async def fetchone(self, sql: str, params: tuple = ()):
+        """Execute a query and return its first row"""
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+    
+    async def fetchall(self, sql: str, params: tuple = ()):
+        """Execute a query and return every row"""
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+    
+    async def execute(self, sql: str, params: tuple = ()) -> int:
+        """Execute a write statement and return the number of affected rows"""
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount)
+    
+    async def insert(self, sql: str, params: tuple = ()) -> int:
+        """Execute an INSERT and return the new row id"""
+        return await self.run(lambda conn: conn.execute(sql, params).lastrowid)
+    
+    def shutdown(self):
+        """Stop the executor, waiting for in-flight queries to finish"""
+        self._executor.shutdown(wait=True)
 
 # Initialize database instance
-db = Database()
\ No newline at end of file
+db = Database(os.environ.get("JARVIS_DB_PATH", "jarvis.db"))
+adb = AsyncDatabase(db)
\ No newline at end of file
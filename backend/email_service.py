@@ -1,62 +1,379 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 from database import db
+from jobs import backoff_delay
+from dashboard import dashboard
+from metrics import record_smtp
 
 logger = logging.getLogger(__name__)
 
-class EmailService:
-    def __init__(self):
-        pass
+def smtp_configured(config: dict) -> bool:
+    """Whether a user config has everything needed to send mail"""
+    return bool(config) and all([config.get('smtp_host'), config.get('smtp_user'), config.get('smtp_pass')])
+
+def connect_smtp(config: dict, timeout: float = 30.0) -> smtplib.SMTP:
+    """Open an SMTP session, upgrade it with STARTTLS and log in"""
+    server = smtplib.SMTP(config['smtp_host'], config['smtp_port'], timeout=timeout)
+    server.starttls()
+    server.login(config['smtp_user'], config['smtp_pass'])
+    return server
+
+class SMTPSessionPool:
+    """Authenticated SMTP sessions kept open per SMTP configuration.
     
-    def send_email(self, user_id: int, recipient: str, subject: str, body: str, email_type: str = "general", related_id: int = None) -> bool:
-        """Send email using SMTP"""
-        try:
-            config = db.get_user_config(user_id)
-            if not config or not all([config.get('smtp_host'), config.get('smtp_user'), config.get('smtp_pass')]):
-                logger.error("SMTP configuration not complete")
-                return False
-            
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = config['smtp_user']
-            msg['To'] = recipient
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Send email
-            server = smtplib.SMTP(config['smtp_host'], config['smtp_port'])
-            server.starttls()
-            server.login(config['smtp_user'], config['smtp_pass'])
+    A session is checked out for the duration of a batch and returned
+    afterwards; an idle session is health-checked with NOOP before reuse and
+    dropped once it has been idle longer than idle_timeout (most servers
+    disconnect idle clients after a few minutes anyway).
+    """
+    def __init__(self, idle_timeout: float = 60.0, connect_timeout: float = 30.0):
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+    
+    @staticmethod
+    def config_key(config: dict) -> str:
+        raw = f"{config['smtp_host']}|{config['smtp_port']}|{config['smtp_user']}|{config['smtp_pass']}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+    
+    def acquire(self, config: dict) -> smtplib.SMTP:
+        """Check out a live session for this configuration, connecting if needed"""
+        key = self.config_key(config)
+        while True:
+            with self._lock:
+                sessions = self._idle.get(key)
+                entry = sessions.pop() if sessions else None
+            if entry is None:
+                break
             
-            text = msg.as_string()
-            server.sendmail(config['smtp_user'], recipient, text)
+            server, last_used = entry
+            if time.monotonic() - last_used < self.idle_timeout:
+                try:
+                    if server.noop()[0] == 250:
+                        with self._lock:
+                            self.reused += 1
+                        return server
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self.discard(server)
+        
+        server = connect_smtp(config, self.connect_timeout)
+        with self._lock:
+            self.opened += 1
+        return server
+    
+    def release(self, config: dict, server: smtplib.SMTP):
+        """Return a healthy session to the pool"""
+        with self._lock:
+            self._idle.setdefault(self.config_key(config), []).append((server, time.monotonic()))
+    
+    def discard(self, server: smtplib.SMTP):
+        """Close a session that is broken or no longer wanted"""
+        try:
             server.quit()
-            
-            # Log email in database
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for server, _ in sessions:
+                self.discard(server)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "opened": self.opened,
+                "reused": self.reused,
+                "idle": sum(len(sessions) for sessions in self._idle.values())
+            }
+
+class EmailService:
+    """Queues outgoing email in the outbox table and delivers it in the background.
+    
+    The sender thread claims ready messages in batches (one user, so one SMTP
+    configuration, per batch), sends them over a pooled session and, for each
+    message, writes the emails log row and marks the outbox row sent in one
+    transaction. Transient failures are retried with exponential backoff;
+    5xx rejections fail the message immediately.
+    """
+    def __init__(self, database=db, batch_size: int = 50, poll_interval: float = 2.0,
+                 max_attempts: int = 5, stale_after: float = 600.0):
+        self.db = database
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        # Messages left "sending" this long (sender crashed mid-batch) are requeued
+        self.stale_after = stale_after
+        self.sessions = SMTPSessionPool(idle_timeout=float(os.environ.get("SMTP_SESSION_IDLE_TIMEOUT", "60")))
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+    
+    def build_message(self, sender: str, recipient: str, subject: str, body: str) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        
+        msg.attach(MIMEText(body, 'plain'))
+        return msg.as_string()
+    
+    def queue_email(self, user_id: int, recipient: str, subject: str, body: str, email_type: str = "general", related_id: int = None) -> int:
+        """Add an email to the outbox and return its outbox id.
+        
+        Raises ValueError if the user has not configured SMTP.
+        """
+        if not smtp_configured(self.db.get_user_config(user_id)):
+            raise ValueError("SMTP configuration not complete")
+        
+        with self.db.connection() as conn:
+            outbox_id = conn.execute("""
+                INSERT INTO outbox (user_id, recipient, subject, body, email_type, related_id, max_attempts, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (user_id, recipient, subject, body, email_type, related_id, self.max_attempts, time.time())).lastrowid
+        
+        self.wake()
+        return outbox_id
+    
+    def queue_emails(self, user_id: int, messages: list) -> list:
+        """Add several (recipient, subject, body, email_type, related_id) emails in one transaction.
+        
+        Returns their outbox ids in order. Raises ValueError if the user has not configured SMTP.
+        """
+        if not smtp_configured(self.db.get_user_config(user_id)):
+            raise ValueError("SMTP configuration not complete")
+        if not messages:
+            return []
+        
+        now = time.time()
+        with self.db.connection() as conn:
+            conn.executemany("""
+                INSERT INTO outbox (user_id, recipient, subject, body, email_type, related_id, max_attempts, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(user_id, *message, self.max_attempts, now) for message in messages])
+            # The transaction holds the write lock, so the new ids are consecutive
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        
+        self.wake()
+        return list(range(last_id - len(messages) + 1, last_id + 1))
+    
+    def wake(self):
+        """Nudge the sender; call again after committing if queueing inside a larger transaction"""
+        self._wakeup.set()
+    
+    def get_outbox_entry(self, outbox_id: int, user_id: int):
+        """Delivery status of a queued email, or None if it is not the user's"""
+        with self.db.connection() as conn:
+            row = conn.execute("""
+                SELECT id, recipient, subject, status, attempts, error, email_id, created_at, sent_at
+                FROM outbox WHERE id = ? AND user_id = ?
+            """, (outbox_id, user_id)).fetchone()
+        
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "recipient": row[1],
+            "subject": row[2],
+            "status": row[3],
+            "attempts": row[4],
+            "error": row[5],
+            "email_id": row[6],
+            "created_at": row[7],
+            "sent_at": row[8]
+        }
+    
+    def _claim_batch(self) -> list:
+        """Mark up to batch_size ready messages of one user as sending"""
+        now = time.time()
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                UPDATE outbox SET status = 'sending', attempts = attempts + 1, locked_at = ?
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE status = 'queued' AND next_attempt_at <= ? AND user_id = (
+                        SELECT user_id FROM outbox WHERE status = 'queued' AND next_attempt_at <= ?
+                        ORDER BY next_attempt_at LIMIT 1
+                    )
+                    ORDER BY next_attempt_at LIMIT ?
+                )
+                RETURNING id, user_id, recipient, subject, body, email_type, related_id, attempts, max_attempts
+            """, (now, now, now, self.batch_size)).fetchall()
+        return sorted(rows)
+    
+    def _record_sent(self, row):
+        """Log the sent email and complete its outbox row atomically"""
+        outbox_id, user_id, recipient, subject, body, email_type, related_id = row[:7]
+        with self.db.connection() as conn:
+            email_id = conn.execute("""
                 INSERT INTO emails (user_id, recipient, subject, body, email_type, related_id)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (user_id, recipient, subject, body, email_type, related_id))
-            conn.commit()
-            conn.close()
-            
-            logger.info(f"Email sent successfully to {recipient}")
-            return True
+            """, (user_id, recipient, subject, body, email_type, related_id)).lastrowid
+            conn.execute("""
+                UPDATE outbox SET status = 'sent', email_id = ?, error = NULL, locked_at = NULL,
+                    sent_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (email_id, outbox_id))
+        dashboard.bump(user_id)
+    
+    def _record_failure(self, rows, error: str, permanent: bool = False):
+        """Schedule a retry with backoff, or fail messages that are out of attempts"""
+        with self.db.connection() as conn:
+            for row in rows:
+                outbox_id, attempts, max_attempts = row[0], row[7], row[8]
+                if permanent or attempts >= max_attempts:
+                    conn.execute("""
+                        UPDATE outbox SET status = 'failed', error = ?, locked_at = NULL WHERE id = ?
+                    """, (error, outbox_id))
+                    logger.error(f"Email {outbox_id} to {row[2]} failed permanently: {error}")
+                else:
+                    conn.execute("""
+                        UPDATE outbox SET status = 'queued', error = ?, locked_at = NULL, next_attempt_at = ?
+                        WHERE id = ?
+                    """, (error, time.time() + backoff_delay(attempts), outbox_id))
+                    logger.warning(f"Email {outbox_id} to {row[2]} attempt {attempts} failed: {error}")
+    
+    def deliver_batch(self, rows):
+        """Send a claimed batch of one user's messages over a single SMTP session"""
+        config = self.db.get_user_config(rows[0][1])
+        if not smtp_configured(config):
+            self._record_failure(rows, "SMTP configuration not complete")
+            return
+        
+        try:
+            server = self.sessions.acquire(config)
+        except (smtplib.SMTPException, OSError) as e:
+            self._record_failure(rows, f"SMTP connection failed: {e}")
+            return
+        
+        for i, row in enumerate(rows):
+            started = time.perf_counter()
+            try:
+                message = self.build_message(config['smtp_user'], row[2], row[3], row[4])
+                server.sendmail(config['smtp_user'], row[2], message)
+            except smtplib.SMTPRecipientsRefused as e:
+                record_smtp(time.perf_counter() - started, "error")
+                self._record_failure([row], f"Recipient refused: {e.recipients}", permanent=True)
+                continue
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                record_smtp(time.perf_counter() - started, "error")
+                # 5xx is a permanent rejection of this message; 4xx may succeed later
+                self._record_failure([row], f"{e.smtp_code} {e.smtp_error!r}", permanent=e.smtp_code >= 500)
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                record_smtp(time.perf_counter() - started, "error")
+                # The session is gone; retry this and the remaining messages later
+                self.sessions.discard(server)
+                self._record_failure(rows[i:], str(e))
+                return
+            except Exception as e:
+                # Not an SMTP error, e.g. a message that cannot be encoded: retry or
+                # fail this message, and reset the session before the next one
+                record_smtp(time.perf_counter() - started, "error")
+                logger.exception(f"Unexpected error sending email {row[0]}")
+                self._record_failure([row], f"Unexpected error: {e!r}")
+                try:
+                    server.rset()
+                except (smtplib.SMTPException, OSError) as e:
+                    self.sessions.discard(server)
+                    self._record_failure(rows[i + 1:], str(e))
+                    return
+                continue
+            record_smtp(time.perf_counter() - started)
             
-        except Exception as e:
-            logger.error(f"Email sending failed: {e}")
-            return False
+            try:
+                self._record_sent(row)
+            except Exception as e:
+                # Already delivered, so never retried: the recipient would get it twice
+                logger.exception(f"Email {row[0]} was sent but could not be recorded")
+                self._record_failure([row], f"Sent, but recording it failed: {e!r}", permanent=True)
+                continue
+            logger.info(f"Email sent successfully to {row[2]}")
+        
+        self.sessions.release(config, server)
+    
+    def run_once(self) -> int:
+        """Deliver one batch; returns the number of messages claimed"""
+        rows = self._claim_batch()
+        if rows:
+            try:
+                self.deliver_batch(rows)
+            except Exception:
+                # Whatever was not finished goes back to the queue instead of staying "sending"
+                self._release([row[0] for row in rows])
+                raise
+        return len(rows)
+    
+    def _release(self, outbox_ids: list) -> int:
+        """Requeue claimed messages that are still sending, without using up an attempt"""
+        with self.db.connection() as conn:
+            return conn.execute("""
+                UPDATE outbox SET status = 'queued', attempts = attempts - 1, locked_at = NULL
+                WHERE id IN (SELECT value FROM json_each(?)) AND status = 'sending'
+            """, (json.dumps(outbox_ids),)).rowcount
+    
+    def requeue_stale(self) -> int:
+        """Requeue messages left sending by a sender that died mid-batch"""
+        with self.db.connection() as conn:
+            return conn.execute("""
+                UPDATE outbox SET status = 'queued', locked_at = NULL
+                WHERE status = 'sending' AND locked_at < ?
+            """, (time.time() - self.stale_after,)).rowcount
+    
+    def _sender(self):
+        last_requeue = time.monotonic()
+        while not self._stopping.is_set():
+            try:
+                # Also covers other processes' senders, not just this one at startup
+                if time.monotonic() - last_requeue >= self.stale_after:
+                    last_requeue = time.monotonic()
+                    requeued = self.requeue_stale()
+                    if requeued:
+                        logger.warning(f"Requeued {requeued} stale outbox message(s)")
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Email sender error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+    
+    def start(self):
+        """Start the background sender thread"""
+        if self._thread:
+            return
+        requeued = self.requeue_stale()
+        if requeued:
+            logger.info(f"Requeued {requeued} stale outbox message(s)")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._sender, name="jarvis-smtp", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 30.0):
+        """Stop the sender after its current batch and close pooled sessions"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.sessions.close_all()
     
     def test_smtp_connection(self, user_id: int) -> bool:
         """Test SMTP connection"""
         try:
             config = db.get_user_config(user_id)
-            if not config or not all([config.get('smtp_host'), config.get('smtp_user'), config.get('smtp_pass')]):
+            if not smtp_configured(config):
                 return False
             
             server = smtplib.SMTP(config['smtp_host'], config['smtp_port'])
@@ -71,4 +388,7 @@ class EmailService:
             return False
 
 # Initialize email service
-email_service = EmailService()
\ No newline at end of file
+email_service = EmailService(
+    batch_size=int(os.environ.get("EMAIL_BATCH_SIZE", "50")),
+    poll_interval=float(os.environ.get("EMAIL_POLL_INTERVAL", "2.0"))
+)
\ No newline at end of file
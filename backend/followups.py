@@ -0,0 +1,266 @@
+"""Reminder emails for open tasks that are due.
+
+An open task with a due date and an assignee email is first followed up
+`lead` seconds before it is due, then every `interval` seconds while it
+stays open; tasks.last_followup records the last reminder. The scheduler
+keeps a heap of (next follow-up time, task id, user id) built at startup
+from the partial idx_tasks_followup index, and picks up newer tasks by id
+on each sync, so a tick only touches tasks that are actually due.
+
+Due tasks are claimed with one UPDATE ... RETURNING that re-checks they are
+still open and due, which also keeps several workers from reminding twice.
+Each assignee gets one digest email per tick through the email outbox.
+"""
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from dashboard import dashboard
+from database import db
+from email_service import email_service, smtp_configured
+
+logger = logging.getLogger(__name__)
+
+def next_followup(due_at: int, followed_up_at, lead: float, interval: float) -> float:
+    """Epoch time of a task's next reminder"""
+    first = due_at - lead
+    if followed_up_at is None:
+        return first
+    return max(first, followed_up_at + interval)
+
+
+def format_due(due_at: int) -> str:
+    return datetime.fromtimestamp(due_at, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+
+def build_followup_email(assignee: str, tasks: list, now: float):
+    """Subject and body of one assignee's reminder digest"""
+    lines = []
+    for task in tasks:
+        state = "overdue since" if task["due_at"] <= now else "due"
+        lines.append(f"- {task['title']} (priority: {task['priority']}, {state} {format_due(task['due_at'])})")
+
+    if len(tasks) == 1:
+        subject = f"Reminder: {tasks[0]['title']}"
+    else:
+        subject = f"Reminder: {len(tasks)} open tasks"
+    body = (
+        f"Hi {assignee or 'there'},\n\n"
+        f"This is a reminder about the following task{'s' if len(tasks) > 1 else ''} assigned to you:\n\n"
+        + "\n".join(lines)
+        + "\n\nPlease reply with a status update, or let us know once it is done.\n\nJarvis"
+    )
+    return subject, body
+
+
+class FollowUpScheduler:
+    def __init__(self, database, lead: float = 86400.0, interval: float = 86400.0,
+                 batch_size: int = 500, sync_interval: float = 60.0, load_page: int = 10000):
+        self.db = database
+        self.lead = lead
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.load_page = load_page
+        self._heap = []
+        self._last_task_id = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.reminders_sent = 0
+
+    def sync(self) -> int:
+        """Add tasks created since the last sync (all of them on the first call) to the heap"""
+        added = 0
+        while True:
+            with self.db.connection() as conn:
+                rows = conn.execute("""
+                    SELECT id, user_id, CAST(strftime('%s', due_date) AS INTEGER),
+                           CAST(strftime('%s', last_followup) AS INTEGER)
+                    FROM tasks
+                    WHERE id > ? AND status != 'completed' AND assignee_email IS NOT NULL AND due_date IS NOT NULL
+                    ORDER BY id LIMIT ?
+                """, (self._last_task_id, self.load_page)).fetchall()
+
+            entries = [
+                (next_followup(due_at, followed_up_at, self.lead, self.interval), task_id, user_id)
+                for task_id, user_id, due_at, followed_up_at in rows if due_at is not None
+            ]
+            with self._lock:
+                # Heapify for the initial load, push for the trickle of new tasks
+                if len(entries) > len(self._heap):
+                    self._heap.extend(entries)
+                    heapq.heapify(self._heap)
+                else:
+                    for entry in entries:
+                        heapq.heappush(self._heap, entry)
+                if rows:
+                    self._last_task_id = rows[-1][0]
+            added += len(entries)
+            if len(rows) < self.load_page:
+                return added
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def _push(self, entries):
+        with self._lock:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+    def _claim(self, conn, task_ids: list, now: float) -> list:
+        """Mark due tasks as followed up now and return them; tasks completed or already reminded are skipped"""
+        return conn.execute("""
+            UPDATE tasks SET last_followup = datetime(:now, 'unixepoch')
+            WHERE id IN (SELECT value FROM json_each(:ids))
+              AND status != 'completed' AND assignee_email IS NOT NULL
+              AND CAST(strftime('%s', due_date) AS INTEGER) <= :due_before
+              AND (last_followup IS NULL OR CAST(strftime('%s', last_followup) AS INTEGER) <= :followed_up_before)
+            RETURNING id, user_id, title, priority, assignee, assignee_email, CAST(strftime('%s', due_date) AS INTEGER)
+        """, {
+            "now": int(now),
+            "ids": json.dumps(task_ids),
+            "due_before": now + self.lead,
+            "followed_up_before": now - self.interval
+        }).fetchall()
+
+    def run_once(self, now: float = None) -> int:
+        """Send the reminders that are due; returns how many tasks were followed up"""
+        now = time.time() if now is None else now
+        due = self._pop_due(now)
+        if not due:
+            return 0
+
+        # Users without SMTP are retried next interval without touching the task
+        by_user = {}
+        for entry in due:
+            by_user.setdefault(entry[2], []).append(entry)
+        retry_later = []
+        for user_id in list(by_user):
+            if not smtp_configured(self.db.get_user_config(user_id)):
+                retry_later.extend((now + self.interval, task_id, user_id) for _, task_id, _ in by_user.pop(user_id))
+
+        claimed, reloaded, sent = [], [], 0
+        if by_user:
+            task_ids = [task_id for entries in by_user.values() for _, task_id, _ in entries]
+            try:
+                with self.db.connection() as conn:
+                    claimed = self._claim(conn, task_ids, now)
+                    sent = self._queue_reminders(claimed, now)
+                    # Tasks another worker just reminded are still open: track their new time
+                    unclaimed = set(task_ids) - {row[0] for row in claimed}
+                    if unclaimed:
+                        reloaded = self._load(conn, sorted(unclaimed))
+                email_service.wake()
+                # last_followup is on the dashboard
+                for user_id in {row[1] for row in claimed}:
+                    dashboard.bump(user_id)
+            except Exception:
+                # Nothing was claimed; try these tasks again after the next sync
+                self._push((now + self.sync_interval, task_id, user_id) for _, task_id, user_id in due)
+                raise
+            self.reminders_sent += sent
+
+        self._push(retry_later)
+        self._push(reloaded)
+        self._push(
+            (next_followup(due_at, now, self.lead, self.interval), task_id, user_id)
+            for task_id, user_id, *_, due_at in claimed
+        )
+        return len(claimed)
+
+    def _queue_reminders(self, claimed: list, now: float) -> int:
+        """Queue one digest per (user, assignee email); returns how many emails were queued"""
+        digests = {}
+        for task_id, user_id, title, priority, assignee, assignee_email, due_at in claimed:
+            digests.setdefault((user_id, assignee_email), []).append({
+                "id": task_id, "title": title, "priority": priority, "assignee": assignee, "due_at": due_at
+            })
+
+        by_user = {}
+        for (user_id, assignee_email), tasks in digests.items():
+            subject, body = build_followup_email(tasks[0]["assignee"], tasks, now)
+            related_id = tasks[0]["id"] if len(tasks) == 1 else None
+            by_user.setdefault(user_id, []).append((assignee_email, subject, body, "task_followup", related_id))
+        # Queued in the claim's transaction, so a failure leaves the tasks due
+        for user_id, messages in by_user.items():
+            email_service.queue_emails(user_id, messages)
+        return len(digests)
+
+    def _load(self, conn, task_ids: list) -> list:
+        """Heap entries for the given tasks that are still open"""
+        rows = conn.execute("""
+            SELECT id, user_id, CAST(strftime('%s', due_date) AS INTEGER),
+                   CAST(strftime('%s', last_followup) AS INTEGER)
+            FROM tasks
+            WHERE id IN (SELECT value FROM json_each(?))
+              AND status != 'completed' AND assignee_email IS NOT NULL AND due_date IS NOT NULL
+        """, (json.dumps(task_ids),)).fetchall()
+        return [
+            (next_followup(due_at, followed_up_at, self.lead, self.interval), task_id, user_id)
+            for task_id, user_id, due_at, followed_up_at in rows if due_at is not None
+        ]
+
+    def _scheduler(self):
+        last_sync = time.monotonic()
+        while not self._stopping.is_set():
+            try:
+                if time.monotonic() - last_sync >= self.sync_interval:
+                    self.sync()
+                    last_sync = time.monotonic()
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Follow-up scheduler error: {e}")
+
+            # Sleep until the earliest reminder, but never past the next sync
+            timeout = self.sync_interval
+            with self._lock:
+                if self._heap:
+                    timeout = min(timeout, max(self._heap[0][0] - time.time(), 0.0))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def start(self):
+        """Build the heap and start the background scheduler thread"""
+        if self._thread:
+            return
+        started = time.monotonic()
+        loaded = self.sync()
+        logger.info(f"Follow-up scheduler tracking {loaded} open task(s), loaded in {time.monotonic() - started:.2f}s")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._scheduler, name="jarvis-followups", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracked_tasks": len(self._heap),
+                "next_followup_at": self._heap[0][0] if self._heap else None,
+                "reminders_sent": self.reminders_sent
+            }
+
+
+# Initialize follow-up scheduler instance
+followup_scheduler = FollowUpScheduler(
+    db,
+    lead=float(os.environ.get("FOLLOWUP_LEAD_HOURS", "24")) * 3600,
+    interval=float(os.environ.get("FOLLOWUP_INTERVAL_HOURS", "24")) * 3600,
+    batch_size=int(os.environ.get("FOLLOWUP_BATCH_SIZE", "500"))
+)
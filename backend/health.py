@@ -0,0 +1,138 @@
+"""Cached health probes for a user's OpenAI and SMTP settings.
+
+Probes are cheap (an OpenAI models list instead of a chat completion, an
+SMTP login without sending), run concurrently with a timeout, and their
+results are cached per (user, config hash). A cached result older than
+refresh_after is still returned immediately while a background task
+re-probes; only a cold cache makes the caller wait, and concurrent callers
+share that single probe.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+from email_service import connect_smtp, smtp_configured
+from openai_service import OPENAI_AVAILABLE, async_openai_service
+
+logger = logging.getLogger(__name__)
+
+
+def config_hash(config: dict) -> str:
+    """Hash the settings a probe depends on, so changed settings miss the cache"""
+    config = config or {}
+    raw = "|".join(str(config.get(field)) for field in (
+        "openai_key", "smtp_host", "smtp_port", "smtp_user", "smtp_pass"
+    ))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def probe_result(connected: bool, error: str = None, started: float = None) -> dict:
+    return {
+        "connected": connected,
+        "error": error,
+        "latency_ms": round((time.monotonic() - started) * 1000, 1) if started else None
+    }
+
+
+class HealthProber:
+    def __init__(self, ttl: float = 300.0, refresh_after: float = 60.0, timeout: float = 5.0, maxsize: int = 1024):
+        self.refresh_after = refresh_after
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # SMTP's blocking handshake gets its own threads, away from the DB executor
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="jarvis-health")
+        self._inflight = {}
+
+    async def probe_openai(self, config: dict) -> dict:
+        """List models with the user's key; no tokens are spent"""
+        if not config or not config.get('openai_key'):
+            return probe_result(False)
+        if not OPENAI_AVAILABLE:
+            return probe_result(False, "OpenAI library not installed")
+
+        started = time.monotonic()
+        try:
+            client = async_openai_service.clients.get(config['openai_key'])
+            await asyncio.wait_for(
+                client.with_options(timeout=self.timeout, max_retries=0).models.list(),
+                self.timeout
+            )
+            return probe_result(True, started=started)
+        except asyncio.TimeoutError:
+            return probe_result(False, f"Timed out after {self.timeout:g}s", started)
+        except Exception as e:
+            return probe_result(False, str(e), started)
+
+    def _smtp_login(self, config: dict):
+        server = connect_smtp(config, self.timeout)
+        server.quit()
+
+    async def probe_smtp(self, config: dict) -> dict:
+        """Connect, STARTTLS and log in, then disconnect"""
+        if not smtp_configured(config):
+            return probe_result(False)
+
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(loop.run_in_executor(self._executor, self._smtp_login, config), self.timeout)
+            return probe_result(True, started=started)
+        except asyncio.TimeoutError:
+            return probe_result(False, f"Timed out after {self.timeout:g}s", started)
+        except Exception as e:
+            return probe_result(False, str(e), started)
+
+    async def probe(self, config: dict) -> dict:
+        """Probe both services concurrently, bypassing the cache"""
+        openai_status, smtp_status = await asyncio.gather(self.probe_openai(config), self.probe_smtp(config))
+        return {"openai": openai_status, "smtp": smtp_status, "checked_at": time.time()}
+
+    def _start_probe(self, key, config: dict) -> asyncio.Task:
+        """Start (or join) the probe for a cache key and store its result when done"""
+        task = self._inflight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    status = await self.probe(config)
+                    self.cache.set(key, status)
+                    return status
+                finally:
+                    self._inflight.pop(key, None)
+
+            task = self._inflight[key] = asyncio.ensure_future(run())
+        return task
+
+    async def status(self, user_id: int, config: dict) -> dict:
+        """Cached health of the user's services, refreshed in the background when stale"""
+        key = (user_id, config_hash(config))
+        cached = self.cache.get(key)
+        if cached is None:
+            return await asyncio.shield(self._start_probe(key, config))
+
+        if time.time() - cached["checked_at"] > self.refresh_after:
+            self._start_probe(key, config)
+        return cached
+
+    async def refresh(self, user_id: int, config: dict) -> dict:
+        """Probe now and cache the result (e.g. right after the settings change)"""
+        key = (user_id, config_hash(config))
+        self.cache.invalidate_where(lambda cached_key, _: cached_key[0] == user_id)
+        return await asyncio.shield(self._start_probe(key, config))
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "probes_in_flight": len(self._inflight)}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+# Initialize health prober instance
+health_prober = HealthProber(
+    ttl=float(os.environ.get("HEALTH_CACHE_TTL", "300")),
+    refresh_after=float(os.environ.get("HEALTH_REFRESH_AFTER", "60")),
+    timeout=float(os.environ.get("HEALTH_PROBE_TIMEOUT", "5"))
+)
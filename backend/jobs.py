@@ -0,0 +1,298 @@
+"""Persistent background job queue backed by the SQLite jobs table.
+
+Jobs survive restarts: they are claimed atomically by worker threads
+(UPDATE ... RETURNING under SQLite's write lock, so several processes can
+share one queue), retried with exponential backoff when their handler
+raises, and marked failed once max_attempts is exhausted. Listeners can
+subscribe to a job to be told when it finishes. Workers also run periodic
+housekeeping: old finished jobs are purged, along with anything other
+modules register through add_housekeeping().
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 300.0) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt"""
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class JobQueue:
+    def __init__(self, database, workers: int = 2, poll_interval: float = 1.0, stale_after: float = 600.0,
+                 housekeeping_interval: float = 3600.0):
+        self.db = database
+        self.workers = workers
+        self.poll_interval = poll_interval
+        # Jobs left "running" longer than this (e.g. by a crashed worker) are requeued
+        self.stale_after = stale_after
+        self.housekeeping_interval = housekeeping_interval
+        self._housekeeping = [("finished job(s)", self.purge_finished)]
+        self._housekeeping_lock = threading.Lock()
+        self._next_housekeeping = 0.0
+        self._handlers: Dict[str, Callable] = {}
+        self._listeners: Dict[int, list] = {}
+        self._listeners_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+    
+    def register(self, kind: str, handler: Callable):
+        """Register handler(job) for a job kind; its return value is stored as the result"""
+        self._handlers[kind] = handler
+    
+    def add_housekeeping(self, label: str, task: Callable[[], int]):
+        """Run task() at startup and every housekeeping_interval; it returns how many `label` it removed"""
+        self._housekeeping.append((label, task))
+    
+    def enqueue(self, user_id: int, kind: str, payload: dict, delay: float = 0.0,
+                max_attempts: int = 5, dedupe_key: Optional[str] = None) -> int:
+        """Queue a job and return its id.
+        
+        If dedupe_key is given and a queued job with the same key exists, that
+        job's id is returned instead of queueing a duplicate.
+        """
+        with self.db.connection() as conn:
+            # The partial unique index on queued dedupe keys makes this atomic
+            # across workers: a duplicate insert is ignored
+            cursor = conn.execute("""
+                INSERT OR IGNORE INTO jobs (user_id, kind, payload, run_after, max_attempts, dedupe_key)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, kind, json.dumps(payload), time.time() + delay, max_attempts, dedupe_key))
+            if cursor.rowcount == 0:
+                return conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status = 'queued'", (dedupe_key,)
+                ).fetchone()[0]
+            job_id = cursor.lastrowid
+        
+        if delay <= 0:
+            self.wake()
+        return job_id
+    
+    def wake(self):
+        """Nudge idle workers to look for ready jobs now.
+        
+        Callers that enqueue inside a larger transaction should call this
+        again after committing, since workers cannot see the job before that.
+        """
+        self._wakeup.set()
+    
+    def get(self, job_id: int, user_id: int = None) -> Optional[dict]:
+        """Return a job as a dict, optionally scoped to its owner"""
+        with self.db.connection() as conn:
+            row = conn.execute("""
+                SELECT id, user_id, kind, payload, status, attempts, max_attempts, result, error, created_at, updated_at
+                FROM jobs WHERE id = ?
+            """, (job_id,)).fetchone()
+        
+        if not row or (user_id is not None and row[1] != user_id):
+            return None
+        return {
+            "id": row[0],
+            "user_id": row[1],
+            "kind": row[2],
+            "payload": json.loads(row[3]),
+            "status": row[4],
+            "attempts": row[5],
+            "max_attempts": row[6],
+            "result": json.loads(row[7]) if row[7] else None,
+            "error": row[8],
+            "created_at": row[9],
+            "updated_at": row[10]
+        }
+    
+    def subscribe(self, job_id: int, callback: Callable):
+        """Call callback(job) from a worker thread once the job succeeds or finally fails"""
+        with self._listeners_lock:
+            self._listeners.setdefault(job_id, []).append(callback)
+    
+    def unsubscribe(self, job_id: int, callback: Callable):
+        with self._listeners_lock:
+            callbacks = self._listeners.get(job_id, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._listeners.pop(job_id, None)
+    
+    def _notify(self, job_id: int):
+        with self._listeners_lock:
+            callbacks = self._listeners.pop(job_id, [])
+        if not callbacks:
+            return
+        job = self.get(job_id)
+        for callback in callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                logger.warning(f"Job {job_id} listener failed: {e}")
+    
+    def _claim(self) -> Optional[dict]:
+        """Atomically move the oldest ready job of a kind with a handler to running.
+        
+        Jobs of other kinds stay queued, untouched, for a worker that knows
+        them (e.g. during a rolling deploy).
+        """
+        now = time.time()
+        with self.db.connection() as conn:
+            row = conn.execute("""
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1, locked_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued' AND run_after <= ? AND kind IN (SELECT value FROM json_each(?))
+                    ORDER BY run_after LIMIT 1
+                )
+                RETURNING id, user_id, kind, payload, attempts, max_attempts
+            """, (now, now, json.dumps(list(self._handlers)))).fetchone()
+        
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "user_id": row[1],
+            "kind": row[2],
+            "payload": json.loads(row[3]),
+            "attempts": row[4],
+            "max_attempts": row[5]
+        }
+    
+    def _complete(self, job: dict, result):
+        with self.db.connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, locked_at = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (json.dumps(result), job["id"]))
+        self._notify(job["id"])
+    
+    def _release(self, job: dict, delay: float):
+        """Put a claimed job back in the queue without using up an attempt"""
+        with self.db.connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = 'queued', attempts = attempts - 1, run_after = ?, locked_at = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (time.time() + delay, job["id"]))
+    
+    def _fail(self, job: dict, error: str):
+        if job["attempts"] < job["max_attempts"]:
+            delay = backoff_delay(job["attempts"])
+            with self.db.connection() as conn:
+                conn.execute("""
+                    UPDATE jobs SET status = 'queued', run_after = ?, error = ?, locked_at = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (time.time() + delay, error, job["id"]))
+            logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay:.1f}s: {error}")
+            return
+        
+        with self.db.connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = 'failed', error = ?, locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (error, job["id"]))
+        logger.error(f"Job {job['id']} ({job['kind']}) failed permanently: {error}")
+        self._notify(job["id"])
+    
+    def run_once(self) -> bool:
+        """Claim and run a single ready job; returns False if none was ready"""
+        job = self._claim()
+        if not job:
+            return False
+        
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            # Only if the handler went away after the claim; leave the job for another worker
+            self._release(job, self.poll_interval)
+            return True
+        
+        try:
+            result = handler(job)
+        except Exception as e:
+            self._fail(job, str(e))
+        else:
+            self._complete(job, result)
+        return True
+    
+    def requeue_stale(self) -> int:
+        """Requeue jobs whose worker died while running them"""
+        with self.db.connection() as conn:
+            return conn.execute("""
+                UPDATE jobs SET status = 'queued', locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND locked_at < ?
+            """, (time.time() - self.stale_after,)).rowcount
+    
+    def purge_finished(self, older_than_days: int = 7) -> int:
+        """Delete succeeded and failed jobs last updated more than N days ago"""
+        with self.db.connection() as conn:
+            return conn.execute("""
+                DELETE FROM jobs
+                WHERE status IN ('succeeded', 'failed') AND updated_at < datetime('now', ?)
+            """, (f"-{int(older_than_days)} days",)).rowcount
+    
+    def housekeep(self, force: bool = False):
+        """Run the housekeeping tasks if they are due (or force); one worker runs them at a time"""
+        with self._housekeeping_lock:
+            if not force and time.monotonic() < self._next_housekeeping:
+                return
+            self._next_housekeeping = time.monotonic() + self.housekeeping_interval
+            tasks = list(self._housekeeping)
+        for label, task in tasks:
+            try:
+                removed = task()
+                if removed:
+                    logger.info(f"Purged {removed} {label}")
+            except Exception as e:
+                logger.error(f"Housekeeping of {label} failed: {e}")
+    
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                self.housekeep()
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+    
+    def start(self):
+        """Start the worker threads"""
+        if self._threads:
+            return
+        requeued = self.requeue_stale()
+        if requeued:
+            logger.info(f"Requeued {requeued} stale job(s)")
+        self.housekeep(force=True)
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"jarvis-jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout: float = 10.0):
+        """Stop the worker threads, letting running jobs finish"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+# Initialize job queue instance; workers are started by the application
+job_queue = JobQueue(
+    db,
+    workers=int(os.environ.get("JOB_WORKERS", "2")),
+    poll_interval=float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+)
@@ -0,0 +1,104 @@
+"""Background jobs that post-process meetings"""
+import logging
+import os
+
+from database import db
+from jobs import job_queue
+from openai_service import openai_service
+
+logger = logging.getLogger(__name__)
+
+MOM_JOB = "generate_mom"
+ROLLING_SUMMARY_JOB = "update_rolling_summary"
+
+# A burst of notes within this many seconds is folded by a single update
+ROLLING_SUMMARY_DEBOUNCE = float(os.environ.get("ROLLING_SUMMARY_DEBOUNCE", "30"))
+ROLLING_SUMMARY_BATCH = 500
+
+
+def schedule_rolling_summary(user_id: int, meeting_id: int) -> int:
+    """Queue a debounced rolling-summary update for a meeting.
+
+    While an update is already queued, further notes join it instead of
+    queueing another; its run_after is not pushed back, so a steady stream of
+    notes is still summarised once per debounce window.
+    """
+    return job_queue.enqueue(
+        user_id, ROLLING_SUMMARY_JOB, {"meeting_id": meeting_id},
+        delay=ROLLING_SUMMARY_DEBOUNCE, max_attempts=3,
+        dedupe_key=f"{ROLLING_SUMMARY_JOB}:{meeting_id}"
+    )
+
+
+def update_rolling_summary_job(job: dict) -> dict:
+    """Fold the notes added since the last update into the meeting's running summary"""
+    user_id = job["user_id"]
+    meeting_id = job["payload"]["meeting_id"]
+
+    with db.connection() as conn:
+        meeting = conn.execute("""
+            SELECT title, status, rolling_summary, summary_seq FROM meetings WHERE id = ? AND user_id = ?
+        """, (meeting_id, user_id)).fetchone()
+
+    # Once the meeting has ended, the MoM job folds whatever is left
+    if not meeting or meeting[1] != 'active':
+        return {"meeting_id": meeting_id, "summary_seq": meeting[3] if meeting else None}
+
+    title, _, summary, summary_seq = meeting
+    rows = db.get_meeting_notes_batch(meeting_id, summary_seq, ROLLING_SUMMARY_BATCH)
+    if not rows:
+        return {"meeting_id": meeting_id, "summary_seq": summary_seq}
+
+    updated = openai_service.update_rolling_summary(user_id, title, summary, "\n".join(row[1] for row in rows))
+    if updated is None:
+        return {"meeting_id": meeting_id, "summary_seq": summary_seq}
+
+    last_seq = rows[-1][0]
+    with db.connection() as conn:
+        # Only move forward from the state this update was computed on
+        conn.execute("""
+            UPDATE meetings SET rolling_summary = ?, summary_seq = ?
+            WHERE id = ? AND summary_seq = ?
+        """, (updated, last_seq, meeting_id, summary_seq))
+
+    if len(rows) == ROLLING_SUMMARY_BATCH:
+        job_queue.enqueue(
+            user_id, ROLLING_SUMMARY_JOB, {"meeting_id": meeting_id},
+            max_attempts=3, dedupe_key=f"{ROLLING_SUMMARY_JOB}:{meeting_id}"
+        )
+    return {"meeting_id": meeting_id, "summary_seq": last_seq}
+
+
+def generate_mom_job(job: dict) -> dict:
+    """Generate a meeting's Minutes of Meeting and store them on the meeting.
+
+    When a rolling summary exists, only the notes added after it are folded
+    in, so the work left at the end of a meeting does not grow with its length.
+    """
+    user_id = job["user_id"]
+    meeting_id = job["payload"]["meeting_id"]
+
+    with db.connection() as conn:
+        meeting = conn.execute("""
+            SELECT title, attendees, rolling_summary, summary_seq FROM meetings WHERE id = ? AND user_id = ?
+        """, (meeting_id, user_id)).fetchone()
+
+    if not meeting:
+        logger.warning(f"MoM job {job['id']}: meeting {meeting_id} no longer exists")
+        return {"meeting_id": meeting_id}
+
+    title, attendees, summary, summary_seq = meeting
+    if summary:
+        notes = db.get_meeting_notes(meeting_id, summary_seq)
+        mom = openai_service.generate_mom(user_id, title, attendees, notes, raise_errors=True, rolling_summary=summary)
+    else:
+        notes = db.get_meeting_notes(meeting_id)
+        mom = openai_service.generate_mom(user_id, title, attendees, notes, raise_errors=True)
+
+    with db.connection() as conn:
+        conn.execute("UPDATE meetings SET mom = ? WHERE id = ?", (mom, meeting_id))
+    return {"meeting_id": meeting_id}
+
+
+job_queue.register(MOM_JOB, generate_mom_job)
+job_queue.register(ROLLING_SUMMARY_JOB, update_rolling_summary_job)
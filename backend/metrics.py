@@ -0,0 +1,282 @@
+"""In-process performance metrics in the Prometheus text format.
+
+Histograms and counters are plain locked lists, so recording costs a
+bisect and a few additions. MetricsMiddleware times every HTTP request by
+route template and keeps a RequestTiming in a context variable; SQLite
+(through InstrumentedConnection), OpenAI and SMTP timings are added both to
+their own metrics and to the current request's timing, which can be echoed
+in a Server-Timing header. AsyncDatabase runs its calls in a copy of the
+caller's context so database work on executor threads is still attributed
+to the request.
+"""
+import contextvars
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = format_labels(self.labelnames, labels, f'le="{format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            series_labels = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series_labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+
+class RequestTiming:
+    """Time spent in each dependency while serving one request"""
+    __slots__ = ("db_seconds", "db_queries", "openai_seconds", "openai_calls")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.openai_seconds = 0.0
+        self.openai_calls = 0
+
+
+current_request = contextvars.ContextVar("jarvis_request_timing", default=None)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "jarvis_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "jarvis_http_request_db_seconds", "SQLite time spent per HTTP request", ("route",), QUERY_BUCKETS
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "jarvis_http_request_db_queries", "SQLite statements executed per HTTP request", ("route",), COUNT_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    "jarvis_db_query_seconds", "SQLite statement execution latency", (), QUERY_BUCKETS
+)
+OPENAI_REQUEST_SECONDS = Histogram(
+    "jarvis_openai_request_duration_seconds", "OpenAI API call latency by call type", ("call_type", "outcome"), LLM_BUCKETS
+)
+OPENAI_TOKENS = Counter(
+    "jarvis_openai_tokens_total", "OpenAI tokens used by call type", ("call_type", "kind")
+)
+SMTP_SEND_SECONDS = Histogram(
+    "jarvis_smtp_send_duration_seconds", "SMTP send latency per message", ("outcome",)
+)
+
+REGISTRY = (
+    HTTP_REQUEST_SECONDS, HTTP_REQUEST_DB_SECONDS, HTTP_REQUEST_DB_QUERIES, DB_QUERY_SECONDS,
+    OPENAI_REQUEST_SECONDS, OPENAI_TOKENS, SMTP_SEND_SECONDS
+)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_db(elapsed: float, statement: bool):
+    """Add SQLite time to the current request; statements also count as queries"""
+    timing = current_request.get()
+    if timing is not None:
+        timing.db_seconds += elapsed
+        if statement:
+            timing.db_queries += 1
+
+
+def record_openai(call_type: str, elapsed: float, outcome: str = "ok", usage=None):
+    OPENAI_REQUEST_SECONDS.observe(elapsed, (call_type, outcome))
+    if usage is not None:
+        OPENAI_TOKENS.inc((call_type, "prompt"), getattr(usage, "prompt_tokens", 0) or 0)
+        OPENAI_TOKENS.inc((call_type, "completion"), getattr(usage, "completion_tokens", 0) or 0)
+    timing = current_request.get()
+    if timing is not None:
+        timing.openai_seconds += elapsed
+        timing.openai_calls += 1
+
+
+def record_smtp(elapsed: float, outcome: str = "ok"):
+    SMTP_SEND_SECONDS.observe(elapsed, (outcome,))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times statements and row fetches; fetches add time but not query counts"""
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_QUERY_SECONDS.observe(elapsed)
+            record_db(elapsed, True)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_QUERY_SECONDS.observe(elapsed)
+            record_db(elapsed, True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record_db(time.perf_counter() - started, False)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_db(time.perf_counter() - started, False)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose cursors (and conn.execute) are timed"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these shortcuts bypass cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_db(time.perf_counter() - started, False)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and dependency time.
+
+    Routes are labelled with their path template (e.g. /api/meetings/{meeting_id})
+    so label cardinality stays fixed. With server_timing, the response
+    carries a Server-Timing header (total, db, openai) for browser devtools.
+    """
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timing = RequestTiming()
+        token = current_request.set(timing)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    total = (time.perf_counter() - started) * 1000
+                    header = (
+                        f"app;dur={total:.1f}, db;dur={timing.db_seconds * 1000:.1f};desc=\"{timing.db_queries} queries\", "
+                        f"openai;dur={timing.openai_seconds * 1000:.1f}"
+                    )
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(elapsed, (scope["method"], route, str(status)))
+            HTTP_REQUEST_DB_SECONDS.observe(timing.db_seconds, (route,))
+            HTTP_REQUEST_DB_QUERIES.observe(timing.db_queries, (route,))
+            current_request.reset(token)
+
+
+SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+# /metrics is only served when a scrape token is configured
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+
+def scrape_authorized(authorization: str, token: str = None) -> bool:
+    """Whether an Authorization header carries the metrics bearer token"""
+    token = METRICS_TOKEN if token is None else token
+    if not token:
+        return False
+    return secrets.compare_digest((authorization or "").encode(), f"Bearer {token}".encode())
@@ -0,0 +1,603 @@
+"""Versioned schema migrations for the Jarvis SQLite database.
+
+The schema version lives in PRAGMA user_version. Each migration is applied
+in its own transaction together with the version bump, so a database is
+always at exactly one numbered version. A database that is already current
+costs a single PRAGMA read at startup.
+
+To change the schema, append a new (version, description, steps) entry to
+MIGRATIONS. Never edit a migration that has already shipped.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def current_version(conn) -> int:
+    """Return the schema version recorded in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """Apply every pending migration and return the resulting schema version"""
+    version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+    
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have migrated while we waited for the lock
+            if current_version(conn) >= number:
+                conn.execute("COMMIT")
+                continue
+            
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(number)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error(f"Schema migration {number} ({description}) failed")
+            raise
+        
+        logger.info(f"Applied schema migration {number}: {description}")
+        version = number
+    
+    return version
+
+
+# 1: the original schema. IF NOT EXISTS lets databases created before
+# versioning was introduced adopt version 1 without changes.
+INITIAL_SCHEMA = [
+    # Users table
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        security_question TEXT,
+        security_answer TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Meetings table
+    """
+    CREATE TABLE IF NOT EXISTS meetings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT,
+        attendees TEXT,
+        notes TEXT,
+        mom TEXT,
+        status TEXT DEFAULT 'active',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ended_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    # Tasks table
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        assignee TEXT,
+        assignee_email TEXT,
+        priority TEXT DEFAULT 'medium',
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        due_date TIMESTAMP,
+        last_followup TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    # Todos table
+    """
+    CREATE TABLE IF NOT EXISTS todos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        completed_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    # Emails table
+    """
+    CREATE TABLE IF NOT EXISTS emails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        email_type TEXT DEFAULT 'general',
+        related_id INTEGER,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    # System config table
+    """
+    CREATE TABLE IF NOT EXISTS system_config (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        openai_key TEXT,
+        smtp_host TEXT,
+        smtp_port INTEGER,
+        smtp_user TEXT,
+        smtp_pass TEXT,
+        user_email TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+]
+
+# 2: per-user listing indexes. created_at/sent_at follow user_id so
+# ORDER BY ... DESC walks the index backwards instead of sorting, and status
+# is carried in the index so "status != 'completed'" is filtered before the
+# table row is read.
+LISTING_INDEXES = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_meetings_user_created
+    ON meetings (user_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_user_created_status
+    ON tasks (user_id, created_at, status)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_todos_user_created_status
+    ON todos (user_id, created_at, status)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_emails_user_sent
+    ON emails (user_id, sent_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_system_config_user
+    ON system_config (user_id)
+    """,
+]
+
+# 3: keyset pagination orders by (created_at, id). An index on
+# (user_id, created_at) carries the rowid as its last column, so it serves
+# that order directly; status in the middle forced a sort on id. Open
+# tasks/todos get partial indexes for the dashboard instead.
+KEYSET_INDEXES = [
+    "DROP INDEX IF EXISTS idx_tasks_user_created_status",
+    "DROP INDEX IF EXISTS idx_todos_user_created_status",
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_user_created
+    ON tasks (user_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_user_open
+    ON tasks (user_id, created_at) WHERE status != 'completed'
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_todos_user_created
+    ON todos (user_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_todos_user_open
+    ON todos (user_id, created_at) WHERE status != 'completed'
+    """,
+]
+
+# 4: meeting notes become append-only rows instead of one TEXT column that
+# was rewritten on every note. Existing notes are moved over as seq 1.
+MEETING_NOTES = [
+    """
+    CREATE TABLE IF NOT EXISTS meeting_notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        meeting_id INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        note TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (meeting_id) REFERENCES meetings (id)
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_meeting_notes_meeting_seq
+    ON meeting_notes (meeting_id, seq)
+    """,
+    """
+    INSERT INTO meeting_notes (meeting_id, seq, note, created_at)
+    SELECT id, 1, ltrim(notes, char(10)), created_at FROM meetings
+    WHERE notes IS NOT NULL AND ltrim(notes, char(10)) != ''
+    """,
+    "UPDATE meetings SET notes = NULL",
+]
+
+# 5: persistent tier of the LLM response cache, plus the per-user opt-out
+LLM_CACHE = [
+    """
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        model TEXT,
+        response TEXT NOT NULL,
+        total_tokens INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_llm_cache_expires
+    ON llm_cache (expires_at)
+    """,
+    "ALTER TABLE system_config ADD COLUMN llm_cache_enabled INTEGER DEFAULT 1",
+]
+
+# 6: persistent background job queue (see jobs.py); meetings remember the
+# job generating their MoM so clients can poll it
+JOBS = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        run_after REAL NOT NULL,
+        locked_at REAL,
+        dedupe_key TEXT,
+        result TEXT,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_jobs_ready
+    ON jobs (status, run_after)
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_queued_dedupe
+    ON jobs (dedupe_key) WHERE status = 'queued'
+    """,
+    "ALTER TABLE meetings ADD COLUMN mom_job_id INTEGER",
+]
+
+# 7: running summary of an active meeting, covering notes up to summary_seq
+ROLLING_SUMMARY = [
+    "ALTER TABLE meetings ADD COLUMN rolling_summary TEXT",
+    "ALTER TABLE meetings ADD COLUMN summary_seq INTEGER NOT NULL DEFAULT 0",
+]
+
+# 8: outbound email queue drained by the background SMTP sender; the emails
+# table stays the log of messages actually sent
+OUTBOX = [
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        email_type TEXT DEFAULT 'general',
+        related_id INTEGER,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        next_attempt_at REAL NOT NULL,
+        locked_at REAL,
+        error TEXT,
+        email_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_outbox_ready
+    ON outbox (status, next_attempt_at)
+    """,
+]
+
+# 9: one FTS5 index over meetings (title, MoM), meeting notes, tasks and sent
+# emails, kept in sync by triggers. rowid = source id * 8 + kind code keeps
+# the sources apart; the indexed scope column holds "u<user_id> <kind>" so
+# per-user and per-kind filtering happen inside the full-text index. Only
+# title/content changes touch the index, not status updates.
+SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        scope, title, body,
+        kind UNINDEXED, ref_id UNINDEXED, meeting_id UNINDEXED,
+        tokenize = 'porter unicode61', prefix = '2 3'
+    )
+    """,
+    # bm25 weights per column: scope never counts, titles count 5x
+    "INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(0.0, 5.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS search_meetings_insert AFTER INSERT ON meetings BEGIN
+        INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+        VALUES (new.id * 8 + 1, 'u' || new.user_id || ' meeting', new.title, new.mom, 'meeting', new.id, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_meetings_update AFTER UPDATE OF title, mom ON meetings BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 8 + 1;
+        INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+        VALUES (new.id * 8 + 1, 'u' || new.user_id || ' meeting', new.title, new.mom, 'meeting', new.id, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_meetings_delete AFTER DELETE ON meetings BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 8 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_notes_insert AFTER INSERT ON meeting_notes BEGIN
+        INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+        SELECT new.id * 8 + 2, 'u' || user_id || ' note', NULL, new.note, 'note', new.id, new.meeting_id
+        FROM meetings WHERE id = new.meeting_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_notes_delete AFTER DELETE ON meeting_notes BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 8 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_tasks_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+        VALUES (new.id * 8 + 3, 'u' || new.user_id || ' task', new.title, new.description, 'task', new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_tasks_update AFTER UPDATE OF title, description ON tasks BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 8 + 3;
+        INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+        VALUES (new.id * 8 + 3, 'u' || new.user_id || ' task', new.title, new.description, 'task', new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_tasks_delete AFTER DELETE ON tasks BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 8 + 3;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_emails_insert AFTER INSERT ON emails BEGIN
+        INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+        VALUES (new.id * 8 + 4, 'u' || new.user_id || ' email', new.subject, new.body, 'email', new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_emails_delete AFTER DELETE ON emails BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 8 + 4;
+    END
+    """,
+    """
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+    SELECT id * 8 + 1, 'u' || user_id || ' meeting', title, mom, 'meeting', id, id FROM meetings
+    """,
+    """
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+    SELECT n.id * 8 + 2, 'u' || m.user_id || ' note', NULL, n.note, 'note', n.id, n.meeting_id
+    FROM meeting_notes n JOIN meetings m ON m.id = n.meeting_id
+    """,
+    """
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+    SELECT id * 8 + 3, 'u' || user_id || ' task', title, description, 'task', id, NULL FROM tasks
+    """,
+    """
+    INSERT INTO search_index (rowid, scope, title, body, kind, ref_id, meeting_id)
+    SELECT id * 8 + 4, 'u' || user_id || ' email', subject, body, 'email', id, NULL FROM emails
+    """,
+]
+
+# 10: server-side chat history. Each turn's token estimate is stored when it
+# is written so building a prompt never re-tokenizes old turns; turns up to
+# summary_seq are covered by the conversation's running summary
+CONVERSATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT,
+        summary TEXT,
+        summary_seq INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        token_count INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_conversation_turns_conversation
+    ON conversation_turns (conversation_id, id)
+    """,
+]
+
+# 11: source text for the per-user retrieval vectors. Triggers copy every
+# change to meetings (title and MoM), notes, tasks and sent emails here and
+# bump `dirty`; the retrieval index embeds dirty chunks into its vector file
+# and clears the counter only if no newer change arrived meanwhile. Deleted
+# sources keep their row (content NULL) until their vector slot is cleared.
+RETRIEVAL_CHUNKS = [
+    """
+    CREATE TABLE IF NOT EXISTS retrieval_chunks (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        ref_id INTEGER NOT NULL,
+        meeting_id INTEGER,
+        content TEXT,
+        slot INTEGER,
+        dirty INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_retrieval_chunks_dirty
+    ON retrieval_chunks (user_id, dirty) WHERE dirty > 0
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_retrieval_chunks_slot
+    ON retrieval_chunks (user_id, slot)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_meetings_insert AFTER INSERT ON meetings BEGIN
+        INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+        VALUES (new.id * 8 + 1, new.user_id, 'meeting', new.id, new.id,
+                COALESCE(new.title, '') || char(10) || COALESCE(new.mom, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_meetings_update AFTER UPDATE OF title, mom ON meetings BEGIN
+        UPDATE retrieval_chunks
+        SET content = COALESCE(new.title, '') || char(10) || COALESCE(new.mom, ''), dirty = dirty + 1
+        WHERE id = new.id * 8 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_meetings_delete AFTER DELETE ON meetings BEGIN
+        UPDATE retrieval_chunks SET content = NULL, dirty = dirty + 1 WHERE id = old.id * 8 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_notes_insert AFTER INSERT ON meeting_notes BEGIN
+        INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+        SELECT new.id * 8 + 2, user_id, 'note', new.id, new.meeting_id, new.note
+        FROM meetings WHERE id = new.meeting_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_notes_delete AFTER DELETE ON meeting_notes BEGIN
+        UPDATE retrieval_chunks SET content = NULL, dirty = dirty + 1 WHERE id = old.id * 8 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_tasks_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+        VALUES (new.id * 8 + 3, new.user_id, 'task', new.id, NULL,
+                new.title || char(10) || COALESCE(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_tasks_update AFTER UPDATE OF title, description ON tasks BEGIN
+        UPDATE retrieval_chunks
+        SET content = new.title || char(10) || COALESCE(new.description, ''), dirty = dirty + 1
+        WHERE id = new.id * 8 + 3;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_tasks_delete AFTER DELETE ON tasks BEGIN
+        UPDATE retrieval_chunks SET content = NULL, dirty = dirty + 1 WHERE id = old.id * 8 + 3;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_emails_insert AFTER INSERT ON emails BEGIN
+        INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+        VALUES (new.id * 8 + 4, new.user_id, 'email', new.id, NULL,
+                COALESCE(new.subject, '') || char(10) || COALESCE(new.body, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS retrieval_emails_delete AFTER DELETE ON emails BEGIN
+        UPDATE retrieval_chunks SET content = NULL, dirty = dirty + 1 WHERE id = old.id * 8 + 4;
+    END
+    """,
+    """
+    INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+    SELECT id * 8 + 1, user_id, 'meeting', id, id, COALESCE(title, '') || char(10) || COALESCE(mom, '')
+    FROM meetings
+    """,
+    """
+    INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+    SELECT n.id * 8 + 2, m.user_id, 'note', n.id, n.meeting_id, n.note
+    FROM meeting_notes n JOIN meetings m ON m.id = n.meeting_id
+    """,
+    """
+    INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+    SELECT id * 8 + 3, user_id, 'task', id, NULL, title || char(10) || COALESCE(description, '')
+    FROM tasks
+    """,
+    """
+    INSERT INTO retrieval_chunks (id, user_id, kind, ref_id, meeting_id, content)
+    SELECT id * 8 + 4, user_id, 'email', id, NULL, COALESCE(subject, '') || char(10) || COALESCE(body, '')
+    FROM emails
+    """,
+]
+
+# 12: the follow-up scheduler loads open, dated tasks with an assignee email
+# in id order (at startup, then only ids it has not seen), so the index
+# leads with id and covers the columns that decide the next follow-up
+FOLLOWUP_INDEX = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_followup
+    ON tasks (id, user_id, due_date, last_followup)
+    WHERE status != 'completed' AND assignee_email IS NOT NULL AND due_date IS NOT NULL
+    """,
+]
+
+# 13: per-user dashboard version, bumped by triggers whenever a row the
+# dashboard shows changes, whichever process or code path wrote it. The
+# dashboard ETag and its in-memory snapshots are keyed by this version
+DASHBOARD_COLUMNS = (
+    ("meetings", "title, attendees, status, created_at, ended_at"),
+    ("tasks", "title, assignee, assignee_email, priority, status, created_at, due_date, last_followup"),
+    ("todos", "title, description, status, created_at, completed_at"),
+    ("emails", "recipient, subject, body, sent_at, email_type"),
+)
+DASHBOARD_VERSIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS dashboard_{table}_{event.split()[0].lower()} AFTER {event} ON {table} BEGIN
+        INSERT INTO dashboard_versions (user_id, version) VALUES ({row}.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+    END
+    """
+    for table, columns in DASHBOARD_COLUMNS
+    for event, row in (("INSERT", "new"), (f"UPDATE OF {columns}", "new"), ("DELETE", "old"))
+]
+
+MIGRATIONS = [
+    (1, "initial schema", INITIAL_SCHEMA),
+    (2, "per-user listing indexes", LISTING_INDEXES),
+    (3, "keyset pagination indexes", KEYSET_INDEXES),
+    (4, "append-only meeting notes", MEETING_NOTES),
+    (5, "LLM response cache", LLM_CACHE),
+    (6, "background job queue", JOBS),
+    (7, "rolling meeting summaries", ROLLING_SUMMARY),
+    (8, "email outbox", OUTBOX),
+    (9, "full-text search index", SEARCH_INDEX),
+    (10, "chat conversations", CONVERSATIONS),
+    (11, "retrieval chunks", RETRIEVAL_CHUNKS),
+    (12, "task follow-up index", FOLLOWUP_INDEX),
+    (13, "dashboard versions", DASHBOARD_VERSIONS),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
@@ -20,16 +20,21 @@ class SystemConfig(BaseModel):
     smtp_port: Optional[int] = None
     smtp_user: Optional[str] = None
     smtp_pass: Optional[str] = None
+    # None leaves the stored preference unchanged
+    llm_cache_enabled: Optional[bool] = None
 
 # Chat Models
 class ChatMessage(BaseModel):
     message: str
     context: Optional[str] = ""
+    # History is kept server-side; omit to start a new conversation
+    conversation_id: Optional[int] = None
 
 class ChatResponse(BaseModel):
     response: str
     command_detected: Optional[str] = None
     action_required: Optional[str] = None
+    conversation_id: Optional[int] = None
 
 # Meeting Models
 class MeetingStart(BaseModel):
@@ -43,13 +48,17 @@ class MeetingNote(BaseModel):
 class Meeting(BaseModel):
     id: int
     title: Optional[str]
-    attendees: Optional[str]
-    notes: Optional[str]
-    mom: Optional[str]
+    attendees: Optional[str] = None
+    notes: Optional[str] = None
+    mom: Optional[str] = None
     status: str
     created_at: datetime
     ended_at: Optional[datetime]
 
+class MeetingPage(BaseModel):
+    items: List[Meeting]
+    next_cursor: Optional[str] = None
+
 # Task Models
 class TaskCreate(BaseModel):
     title: str
@@ -59,10 +68,14 @@ class TaskCreate(BaseModel):
     priority: Optional[str] = "medium"
     due_date: Optional[datetime] = None
 
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=1000)
+    notify_assignees: bool = True
+
 class Task(BaseModel):
     id: int
     title: str
-    description: Optional[str]
+    description: Optional[str] = None
     assignee: Optional[str]
     assignee_email: Optional[str]
     priority: str
@@ -71,6 +84,10 @@ class Task(BaseModel):
     due_date: Optional[datetime]
     last_followup: Optional[datetime]
 
+class TaskPage(BaseModel):
+    items: List[Task]
+    next_cursor: Optional[str] = None
+
 # Todo Models
 class TodoCreate(BaseModel):
     title: str
@@ -79,11 +96,15 @@ class TodoCreate(BaseModel):
 class Todo(BaseModel):
     id: int
     title: str
-    description: Optional[str]
+    description: Optional[str] = None
     status: str
     created_at: datetime
     completed_at: Optional[datetime]
 
+class TodoPage(BaseModel):
+    items: List[Todo]
+    next_cursor: Optional[str] = None
+
 # Email Models
 class EmailSend(BaseModel):
     recipient: str
@@ -104,6 +125,19 @@ class Email(BaseModel):
     sent_at: datetime
     email_type: str
 
+# Search Models
+class SearchHit(BaseModel):
+    kind: str
+    id: int
+    meeting_id: Optional[int] = None
+    title: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
 # System Models
 class SystemStatus(BaseModel):
     openai_connected: bool
@@ -111,7 +145,14 @@ class SystemStatus(BaseModel):
     database_connected: bool
     message: str
 
+class DashboardCounts(BaseModel):
+    meetings: int
+    active_tasks: int
+    pending_todos: int
+    emails: int
+
 class DashboardData(BaseModel):
+    counts: Optional[DashboardCounts] = None
     recent_meetings: List[Meeting]
     active_tasks: List[Task]
     pending_todos: List[Todo]
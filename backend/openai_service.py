@@ -1,209 +1,655 @@
 try:
-    from openai import OpenAI
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
     
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
-from database import db
+from cache import TTLCache
+from database import db, adb
+from jobs import job_queue
+from metrics import record_openai
+from retrieval import retrieval_index
+from summarizer import build_conversation_summary_prompt, chunk_notes, create_meeting_summarizer
 
 logger = logging.getLogger(__name__)
 
-class OpenAIService:
-    def __init__(self):
-        self.client = None
+# Jarvis personality prompt
+JARVIS_SYSTEM_PROMPT = """You are Jarvis, an AI personal assistant created by Sumit Roy. 
+You help with meetings, tasks, to-dos, and emails. You are professional, helpful, and efficient.
+You operate in a terminal-style interface with green text on black background.
+
+Commands you understand:
+- "start meeting" - Begin a new meeting
+- "end meeting" - End current meeting and generate MoM
+- "create task" - Create a new task
+- "create todo" - Create a new to-do item
+- "show tasks" - Display all tasks
+- "show todos" - Display all to-do items
+- "send email to [name]" - Send an email
+- "complete task [id]" - Mark task as complete
+- "system check" - Check system status
+
+When asked who created you, respond: "I was created by Sumit Roy."
+
+Keep responses concise and terminal-friendly. Use > prefix for system messages.
+"""
+
+def format_snippets(snippets: list) -> str:
+    """Render retrieved items as a system message the model can cite"""
+    lines = [f"- [{snippet['kind']} #{snippet['id']}] {snippet['text']}" for snippet in snippets]
+    return "Relevant items from the user's own meetings, tasks and emails:\n" + "\n".join(lines)
+
+def build_chat_messages(message: str, context: str = "", history: list = None, snippets: list = None) -> list:
+    """Build the chat completion messages for a Jarvis conversation turn.
     
-    def initialize_client(self, api_key: str):
-        """Initialize OpenAI client with API key"""
-        if not OPENAI_AVAILABLE:
-            logger.error("OpenAI library not installed")
+    `history` holds earlier turns (and their summary) as chat messages;
+    `snippets` are retrieved items that ground the reply in the user's data.
+    """
+    messages = [{"role": "system", "content": JARVIS_SYSTEM_PROMPT}]
+    if snippets:
+        messages.append({"role": "system", "content": format_snippets(snippets)})
+    return [
+        *messages,
+        *(history or []),
+        {"role": "user", "content": f"Context: {context}\n\nUser: {message}"}
+    ]
+
+def build_mom_prompt(meeting_title: str, attendees: str, notes: str) -> str:
+    """Build the Meeting Minutes prompt"""
+    return f"""Generate professional Meeting Minutes (MoM) from the following:
+    
+    Meeting Title: {meeting_title}
+    Attendees: {attendees}
+    Notes: {notes}
+    
+    Format:
+    Subject: [Meeting Title]
+    Date: [Current Date]
+    Attendees: [List of attendees]
+    
+    Meeting Summary:
+    • [Key point 1]
+    • [Key point 2]
+    • [Key point 3]
+    
+    Action Items:
+    • [Action item 1]
+    • [Action item 2]
+    
+    Signed by: [User Name]
+    Powered by: Jarvis AI Assistant
+    """
+
+def build_email_prompt(recipient: str, context: str, email_type: str = "general") -> str:
+    """Build the email drafting prompt"""
+    if email_type == "task_assignment":
+        return f"""Draft a professional email for task assignment:
+        
+        Recipient: {recipient}
+        Context: {context}
+        
+        Create a professional email with:
+        - Clear subject line
+        - Professional greeting
+        - Task description and requirements
+        - Deadline if mentioned
+        - Professional closing
+        
+        Format as:
+        Subject: [subject]
+        Body: [email body]
+        """
+    return f"""Draft a professional email:
+    
+    Recipient: {recipient}
+    Context: {context}
+    
+    Create a well-structured email with appropriate subject and body.
+    
+    Format as:
+    Subject: [subject]
+    Body: [email body]
+    """
+
+def parse_email_draft(content: str) -> dict:
+    """Parse the "Subject:"/"Body:" reply of an email drafting prompt"""
+    lines = content.split('\n')
+    subject = ""
+    body = ""
+    
+    for i, line in enumerate(lines):
+        if line.startswith("Subject:"):
+            subject = line.replace("Subject:", "").strip()
+        elif line.startswith("Body:"):
+            body = '\n'.join(lines[i+1:]).strip()
+            break
+    
+    return {"subject": subject, "body": body}
+
+class LLMResponseCache:
+    """Exact-match cache of LLM completions.
+    
+    Keys are a SHA-256 of the normalized (model, messages, temperature,
+    max_tokens) request, so the system prompt is part of the key. An
+    in-memory LRU sits in front of the persistent llm_cache table; both
+    tiers honour the same TTL. Users can opt out through
+    system_config.llm_cache_enabled, and deterministic_only skips the cache
+    for any request sampled with temperature > 0. Expired rows are purged
+    by job queue housekeeping, which also caps the table at max_rows.
+    """
+    def __init__(self, database, maxsize: int = 2048, ttl: float = 86400.0, deterministic_only: bool = False,
+                 max_rows: int = 100000):
+        self.db = database
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.deterministic_only = deterministic_only
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+    
+    @staticmethod
+    def make_key(model: str, messages: list, temperature: float = None, max_tokens: int = None, **_) -> str:
+        """Hash a completion request, ignoring whitespace differences in the prompts"""
+        normalized = {
+            "model": model,
+            "messages": [
+                {"role": m["role"], "content": " ".join(str(m["content"]).split())}
+                for m in messages
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    
+    def enabled_for(self, config: dict, temperature: float = None) -> bool:
+        """Whether this user's request may be served from or stored in the cache"""
+        if config and config.get('llm_cache_enabled') is not None and not config['llm_cache_enabled']:
+            return False
+        if self.deterministic_only and (temperature or 0) > 0:
             return False
+        return True
+    
+    def _record_hit(self, tier: str, total_tokens: int):
+        with self._lock:
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.persistent_hits += 1
+            self.tokens_saved += total_tokens or 0
+    
+    def get_memory(self, key: str) -> Optional[str]:
+        """Look a key up in the in-memory tier only (never touches SQLite)"""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        self._record_hit("memory", entry[1])
+        return entry[0]
+    
+    def get_persistent(self, key: str) -> Optional[str]:
+        """Look a key up in SQLite, promoting a hit into the memory tier"""
+        now = time.time()
+        with self.db.connection() as conn:
+            row = conn.execute(
+                "SELECT response, total_tokens, expires_at FROM llm_cache WHERE cache_key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        self._memory.set(key, (row[0], row[1]), ttl=row[2] - now)
+        self._record_hit("persistent", row[1])
+        return row[0]
+    
+    def get(self, key: str) -> Optional[str]:
+        """Look a key up in both tiers"""
+        cached = self.get_memory(key)
+        if cached is not None:
+            return cached
+        return self.get_persistent(key)
+    
+    def set(self, key: str, model: str, response: str, total_tokens: int = 0):
+        """Store a completion in both tiers"""
+        expires_at = time.time() + self.ttl
+        self._memory.set(key, (response, total_tokens))
+        with self.db.connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO llm_cache (cache_key, model, response, total_tokens, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, model, response, total_tokens, expires_at))
+    
+    def purge_expired(self) -> int:
+        """Delete expired rows from the persistent tier, then the soonest to expire beyond max_rows"""
+        now = time.time()
+        with self.db.connection() as conn:
+            expired = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+            # Every row has the same TTL, so the soonest to expire are the oldest
+            evicted = conn.execute("""
+                DELETE FROM llm_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_cache WHERE expires_at > ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (now, self.max_rows)).rowcount
+        return expired + evicted
+    
+    def stats(self) -> dict:
+        """Report hit/miss counters and the tokens the cache has saved"""
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "memory_size": len(self._memory)
+            }
+
+def usage_tokens(response) -> int:
+    """Total tokens reported for a completion, 0 if unknown"""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+class ClientRegistry:
+    """LRU registry of API clients keyed by a hash of the API key.
+    
+    Each client owns a keep-alive HTTP connection pool, so reusing it across
+    requests skips the TCP/TLS handshake. Clients idle for longer than
+    idle_timeout, or pushed out by the LRU bound, are closed.
+    """
+    def __init__(self, factory, maxsize: int = 64, idle_timeout: float = 600.0, closer=None):
+        self._factory = factory
+        self._closer = closer or (lambda client: client.close())
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, api_key: str):
+        """Return the pooled client for an API key, creating it on first use"""
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._clients.move_to_end(key)
+                entry[1] = now
+                self.hits += 1
+                client = entry[0]
+            else:
+                self.misses += 1
+                client = self._factory(api_key)
+                self._clients[key] = [client, now]
             
+            # The LRU end holds the least recently used clients
+            while self._clients:
+                oldest_key, (oldest, last_used) = next(iter(self._clients.items()))
+                if len(self._clients) <= self.maxsize and now - last_used < self.idle_timeout:
+                    break
+                del self._clients[oldest_key]
+                evicted.append(oldest)
+        
+        for stale in evicted:
+            self._close(stale)
+        return client
+    
+    def _close(self, client):
         try:
-            self.client = OpenAI(api_key=api_key)
-            # Test the connection
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=10
-            )
-            return True
+            self._closer(client)
         except Exception as e:
-            logger.error(f"OpenAI initialization failed: {e}")
-            return False
+            logger.warning(f"Failed to close pooled OpenAI client: {e}")
     
-    def generate_response(self, user_id: int, message: str, context: str = "") -> str:
-        """Generate AI response using GPT"""
+    def drain(self) -> list:
+        """Remove and return every pooled client"""
+        with self._lock:
+            clients = [entry[0] for entry in self._clients.values()]
+            self._clients.clear()
+        return clients
+    
+    def close_all(self):
+        """Close every pooled client (used at application shutdown)"""
+        for client in self.drain():
+            self._close(client)
+    
+    def stats(self) -> dict:
+        """Report the number of pooled clients and registry hit counters"""
+        with self._lock:
+            return {"clients": len(self._clients), "hits": self.hits, "misses": self.misses}
+
+def create_openai_client(api_key: str):
+    """Build a sync OpenAI client with its own keep-alive connection pool"""
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.environ.get("OPENAI_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "120"))
+        ),
+        timeout=httpx.Timeout(float(os.environ.get("OPENAI_TIMEOUT", "60")), connect=10.0)
+    )
+    return OpenAI(api_key=api_key, http_client=http_client)
+
+def create_async_openai_client(api_key: str):
+    """Build an AsyncOpenAI client with its own keep-alive connection pool"""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.environ.get("OPENAI_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "120"))
+        ),
+        timeout=httpx.Timeout(float(os.environ.get("OPENAI_TIMEOUT", "60")), connect=10.0)
+    )
+    return AsyncOpenAI(api_key=api_key, http_client=http_client)
+
+def close_async_client(client):
+    """Close an AsyncOpenAI client from sync code, on the running loop if there is one"""
+    try:
+        asyncio.get_running_loop().create_task(client.close())
+    except RuntimeError:
+        asyncio.run(client.close())
+
+class OpenAIService:
+    """Blocking completions for background jobs: meeting minutes and running summaries.
+    
+    Request handlers use AsyncOpenAIService instead; both share llm_cache.
+    """
+    def __init__(self):
+        self.clients = ClientRegistry(
+            create_openai_client,
+            maxsize=int(os.environ.get("OPENAI_CLIENT_REGISTRY_SIZE", "64")),
+            idle_timeout=float(os.environ.get("OPENAI_CLIENT_IDLE_TIMEOUT", "600"))
+        )
+    
+    def _complete(self, config: dict, call_type: str = "chat", **kwargs) -> str:
+        """Run one chat completion, served from the response cache when possible"""
+        use_cache = llm_cache.enabled_for(config, kwargs.get("temperature"))
+        if use_cache:
+            key = llm_cache.make_key(**kwargs)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        # Reuse the pooled client (and its open connections) for this key
+        client = self.clients.get(config['openai_key'])
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except Exception:
+            record_openai(call_type, time.perf_counter() - started, "error")
+            raise
+        record_openai(call_type, time.perf_counter() - started, usage=getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        
+        if use_cache:
+            llm_cache.set(key, kwargs["model"], content, usage_tokens(response))
+        return content
+    
+    def generate_mom(self, user_id: int, meeting_title: str, attendees: str, notes: str,
+                     raise_errors: bool = False, rolling_summary: str = None) -> str:
+        """Generate Meeting Minutes using GPT.
+        
+        With a rolling_summary, `notes` only holds the notes the summary has
+        not seen yet. With raise_errors, API failures propagate instead of
+        being returned as text, so a background job can retry them.
+        """
         if not OPENAI_AVAILABLE:
             return "OpenAI library not installed. Please install it using: pip install openai"
             
         try:
             config = db.get_user_config(user_id)
             if not config or not config.get('openai_key'):
-                return "OpenAI API key not configured. Please configure it in system settings."
-            
-            # Initialize client for each request
-            client = OpenAI(api_key=config['openai_key'])
-            
-            # Jarvis personality prompt
-            system_prompt = """You are Jarvis, an AI personal assistant created by Sumit Roy. 
-            You help with meetings, tasks, to-dos, and emails. You are professional, helpful, and efficient.
-            You operate in a terminal-style interface with green text on black background.
-            
-            Commands you understand:
-            - "start meeting" - Begin a new meeting
-            - "end meeting" - End current meeting and generate MoM
-            - "create task" - Create a new task
-            - "create todo" - Create a new to-do item
-            - "show tasks" - Display all tasks
-            - "show todos" - Display all to-do items
-            - "send email to [name]" - Send an email
-            - "complete task [id]" - Mark task as complete
-            - "system check" - Check system status
-            
-            When asked who created you, respond: "I was created by Sumit Roy."
+                return "OpenAI API key not configured."
             
-            Keep responses concise and terminal-friendly. Use > prefix for system messages.
-            """
+            complete = lambda **request: self._complete(config, "mom", **request)
+            if rolling_summary:
+                return mom_summarizer.summarize_incremental(complete, meeting_title, attendees, rolling_summary, notes)
+            return mom_summarizer.summarize(complete, meeting_title, attendees, notes)
             
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Context: {context}\n\nUser: {message}"}
-            ]
+        except Exception as e:
+            logger.error(f"MoM generation error: {e}")
+            if raise_errors:
+                raise
+            return f"Failed to generate MoM: {str(e)}"
+    
+    def update_rolling_summary(self, user_id: int, meeting_title: str, summary: str, notes: str) -> Optional[str]:
+        """Fold new notes into a meeting's running summary.
+        
+        Returns None when OpenAI is not available or configured; API errors
+        propagate so the background job can retry.
+        """
+        if not OPENAI_AVAILABLE:
+            return None
+        
+        config = db.get_user_config(user_id)
+        if not config or not config.get('openai_key'):
+            return None
+        
+        return mom_summarizer.fold(
+            lambda **request: self._complete(config, "mom", **request), meeting_title, summary, notes
+        )
+    
+    def update_conversation_summary(self, user_id: int, summary: str, transcript: str) -> Optional[str]:
+        """Fold older chat turns into a conversation's running summary.
+        
+        Returns None when OpenAI is not available or configured; API errors
+        propagate so the background job can retry.
+        """
+        if not OPENAI_AVAILABLE:
+            return None
+        
+        config = db.get_user_config(user_id)
+        if not config or not config.get('openai_key'):
+            return None
+        
+        for chunk in chunk_notes(transcript, mom_summarizer.chunk_tokens):
+            summary = self._complete(
+                config,
+                "summary",
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": build_conversation_summary_prompt(summary, chunk)}],
+                max_tokens=400,
+                temperature=0
+            )
+        return summary
+    
+class AsyncOpenAIService:
+    """Completions for request handlers (chat, streaming, email drafts) on AsyncOpenAI.
+    
+    LLM waits no longer hold the event loop or a worker thread, and a
+    per-key semaphore caps how many completions one API key has in flight.
+    Cancelling the awaiting task (e.g. when the HTTP client disconnects)
+    aborts the upstream request.
+    """
+    def __init__(self, max_concurrency_per_key: int = None):
+        self.max_concurrency_per_key = max_concurrency_per_key or int(
+            os.environ.get("OPENAI_MAX_CONCURRENCY_PER_KEY", "16")
+        )
+        self.clients = ClientRegistry(
+            create_async_openai_client,
+            maxsize=int(os.environ.get("OPENAI_CLIENT_REGISTRY_SIZE", "64")),
+            idle_timeout=float(os.environ.get("OPENAI_CLIENT_IDLE_TIMEOUT", "600")),
+            closer=close_async_client
+        )
+        # Bounded like the client registry, so rotated and per-user keys do not pile up
+        self._limiters = TTLCache(
+            maxsize=int(os.environ.get("OPENAI_CLIENT_REGISTRY_SIZE", "64")),
+            ttl=float(os.environ.get("OPENAI_CLIENT_IDLE_TIMEOUT", "600"))
+        )
+    
+    def _limiter(self, api_key: str) -> asyncio.Semaphore:
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = asyncio.Semaphore(self.max_concurrency_per_key)
+        # Re-set on every use so only keys idle for the whole TTL expire
+        self._limiters.set(key, limiter)
+        return limiter
+    
+    async def _get_config(self, user_id: int) -> Optional[dict]:
+        config = await adb.call(db.get_user_config, user_id)
+        if not config or not config.get('openai_key'):
+            return None
+        return config
+    
+    async def _cache_lookup(self, key: str) -> Optional[str]:
+        # The memory tier is checked inline; only a miss pays for a DB thread hop
+        cached = llm_cache.get_memory(key)
+        if cached is not None:
+            return cached
+        return await adb.call(llm_cache.get_persistent, key)
+    
+    async def _complete(self, config: dict, call_type: str = "chat", **kwargs) -> str:
+        """Run one chat completion under the key's concurrency limit, using the response cache"""
+        use_cache = llm_cache.enabled_for(config, kwargs.get("temperature"))
+        if use_cache:
+            key = llm_cache.make_key(**kwargs)
+            cached = await self._cache_lookup(key)
+            if cached is not None:
+                return cached
+        
+        api_key = config['openai_key']
+        async with self._limiter(api_key):
+            started = time.perf_counter()
+            try:
+                response = await self.clients.get(api_key).chat.completions.create(**kwargs)
+            except Exception:
+                record_openai(call_type, time.perf_counter() - started, "error")
+                raise
+        record_openai(call_type, time.perf_counter() - started, usage=getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        
+        if use_cache:
+            await adb.call(llm_cache.set, key, kwargs["model"], content, usage_tokens(response))
+        return content
+    
+    async def generate_response(self, user_id: int, message: str, context: str = "", history: list = None) -> str:
+        """Generate AI response using GPT"""
+        if not OPENAI_AVAILABLE:
+            return "OpenAI library not installed. Please install it using: pip install openai"
+        
+        try:
+            config = await self._get_config(user_id)
+            if not config:
+                return "OpenAI API key not configured. Please configure it in system settings."
             
-            response = client.chat.completions.create(
+            snippets = await adb.call(retrieval_index.relevant, user_id, message)
+            return await self._complete(
+                config,
                 model="gpt-3.5-turbo",
-                messages=messages,
+                messages=build_chat_messages(message, context, history, snippets),
                 max_tokens=500,
                 temperature=0.7
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
             return f"AI service error: {str(e)}"
     
-    def generate_mom(self, user_id: int, meeting_title: str, attendees: str, notes: str) -> str:
-        """Generate Meeting Minutes using GPT"""
+    async def stream_response(self, user_id: int, message: str, context: str = "", history: list = None):
+        """Stream an AI response as text deltas as soon as GPT produces them"""
         if not OPENAI_AVAILABLE:
-            return "OpenAI library not installed. Please install it using: pip install openai"
-            
+            yield "OpenAI library not installed. Please install it using: pip install openai"
+            return
+        
         try:
-            config = db.get_user_config(user_id)
-            if not config or not config.get('openai_key'):
-                return "OpenAI API key not configured."
-            
-            # Initialize client for each request
-            client = OpenAI(api_key=config['openai_key'])
-            
-            prompt = f"""Generate professional Meeting Minutes (MoM) from the following:
-            
-            Meeting Title: {meeting_title}
-            Attendees: {attendees}
-            Notes: {notes}
-            
-            Format:
-            Subject: [Meeting Title]
-            Date: [Current Date]
-            Attendees: [List of attendees]
-            
-            Meeting Summary:
-            • [Key point 1]
-            • [Key point 2]
-            • [Key point 3]
+            config = await self._get_config(user_id)
+            if not config:
+                yield "OpenAI API key not configured. Please configure it in system settings."
+                return
             
-            Action Items:
-            • [Action item 1]
-            • [Action item 2]
-            
-            Signed by: [User Name]
-            Powered by: Jarvis AI Assistant
-            """
-            
-            response = client.chat.completions.create(
+            snippets = await adb.call(retrieval_index.relevant, user_id, message)
+            request = dict(
                 model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.3
+                messages=build_chat_messages(message, context, history, snippets),
+                max_tokens=500,
+                temperature=0.7
             )
+            use_cache = llm_cache.enabled_for(config, request["temperature"])
+            if use_cache:
+                key = llm_cache.make_key(**request)
+                cached = await self._cache_lookup(key)
+                if cached is not None:
+                    yield cached
+                    return
             
-            return response.choices[0].message.content
+            api_key = config['openai_key']
+            parts = []
+            async with self._limiter(api_key):
+                started = time.perf_counter()
+                stream = await self.clients.get(api_key).chat.completions.create(**request, stream=True)
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            # Streams report no usage; only their duration is recorded
+            record_openai("chat", time.perf_counter() - started)
+            
+            if use_cache:
+                await adb.call(llm_cache.set, key, request["model"], "".join(parts))
             
         except Exception as e:
-            logger.error(f"MoM generation error: {e}")
-            return f"Failed to generate MoM: {str(e)}"
+            logger.error(f"OpenAI streaming error: {e}")
+            yield f"AI service error: {str(e)}"
     
-    def draft_email(self, user_id: int, recipient: str, context: str, email_type: str = "general") -> dict:
+    async def draft_email(self, user_id: int, recipient: str, context: str, email_type: str = "general") -> dict:
         """Draft email using GPT"""
         if not OPENAI_AVAILABLE:
             return {"error": "OpenAI library not installed. Please install it using: pip install openai"}
-            
+        
         try:
-            config = db.get_user_config(user_id)
-            if not config or not config.get('openai_key'):
+            config = await self._get_config(user_id)
+            if not config:
                 return {"error": "OpenAI API key not configured."}
             
-            # Initialize client for each request
-            client = OpenAI(api_key=config['openai_key'])
-            
-            if email_type == "task_assignment":
-                prompt = f"""Draft a professional email for task assignment:
-                
-                Recipient: {recipient}
-                Context: {context}
-                
-                Create a professional email with:
-                - Clear subject line
-                - Professional greeting
-                - Task description and requirements
-                - Deadline if mentioned
-                - Professional closing
-                
-                Format as:
-                Subject: [subject]
-                Body: [email body]
-                """
-            else:
-                prompt = f"""Draft a professional email:
-                
-                Recipient: {recipient}
-                Context: {context}
-                
-                Create a well-structured email with appropriate subject and body.
-                
-                Format as:
-                Subject: [subject]
-                Body: [email body]
-                """
-            
-            response = client.chat.completions.create(
+            content = await self._complete(
+                config,
+                "draft",
                 model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": build_email_prompt(recipient, context, email_type)}],
                 max_tokens=600,
                 temperature=0.5
             )
-            
-            content = response.choices[0].message.content
-            
-            # Parse subject and body
-            lines = content.split('\n')
-            subject = ""
-            body = ""
-            
-            for i, line in enumerate(lines):
-                if line.startswith("Subject:"):
-                    subject = line.replace("Subject:", "").strip()
-                elif line.startswith("Body:"):
-                    body = '\n'.join(lines[i+1:]).strip()
-                    break
-            
-            return {"subject": subject, "body": body}
+            return parse_email_draft(content)
             
         except Exception as e:
             logger.error(f"Email drafting error: {e}")
             return {"error": f"Failed to draft email: {str(e)}"}
+    
+    async def close(self):
+        """Close every pooled async client (used at application shutdown)"""
+        clients = self.clients.drain()
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+# Shared by both services so sync and async callers see the same entries
+llm_cache = LLMResponseCache(
+    db,
+    maxsize=int(os.environ.get("LLM_CACHE_SIZE", "2048")),
+    ttl=float(os.environ.get("LLM_CACHE_TTL", "86400")),
+    deterministic_only=os.environ.get("LLM_CACHE_DETERMINISTIC_ONLY", "").lower() in ("1", "true", "yes"),
+    max_rows=int(os.environ.get("LLM_CACHE_MAX_ROWS", "100000"))
+)
+job_queue.add_housekeeping("expired LLM cache row(s)", llm_cache.purge_expired)
+
+# Long meetings are summarized map-reduce; partial summaries go through llm_cache
+mom_summarizer = create_meeting_summarizer(build_mom_prompt)
 
 # Initialize OpenAI service
-openai_service = OpenAIService()
\ No newline at end of file
+openai_service = OpenAIService()
+async_openai_service = AsyncOpenAIService()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Keyset (cursor) pagination for the per-user listing endpoints.
+
+Pages are ordered newest first by (created_at, id). A cursor is the opaque,
+URL-safe encoding of the last row's (created_at, id); the next page starts
+strictly after it, so pages stay stable while new rows are inserted.
+"""
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Listing:
+    """Columns of a paginated per-user table.
+    
+    Required columns are always returned; optional ones (usually large text
+    columns) can be left out with the fields= projection.
+    """
+    def __init__(self, table: str, required: Tuple[str, ...], optional: Tuple[str, ...],
+                 expressions: Optional[Dict[str, str]] = None):
+        self.table = table
+        self.required = required
+        self.optional = optional
+        # Columns computed from other tables, only evaluated when selected
+        self.expressions = expressions or {}
+    
+    def columns(self, fields: Optional[str] = None) -> List[str]:
+        """Resolve a comma-separated fields= parameter into the columns to select"""
+        if not fields:
+            return list(self.required + self.optional)
+        
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(self.required + self.optional)
+        if unknown:
+            raise ValueError(f"Unknown fields for {self.table}: {', '.join(sorted(unknown))}")
+        
+        return list(self.required) + [column for column in self.optional if column in requested]
+    
+    def page_query(self, columns: List[str], after_cursor: bool) -> str:
+        """Build the keyset query; column names come from the fixed listing definition"""
+        keyset = "AND (created_at, id) < (?, ?) " if after_cursor else ""
+        select_list = ", ".join(
+            f"{self.expressions[column]} AS {column}" if column in self.expressions else column
+            for column in columns
+        )
+        return (
+            f"SELECT {select_list} FROM {self.table} "
+            f"WHERE user_id = ? {keyset}"
+            f"ORDER BY created_at DESC, id DESC LIMIT ?"
+        )
+
+
+# Notes live in meeting_notes and are assembled in sequence order on demand
+MEETING_NOTES_EXPRESSION = (
+    "(SELECT group_concat(note, char(10)) FROM "
+    "(SELECT note FROM meeting_notes WHERE meeting_id = meetings.id ORDER BY seq))"
+)
+
+MEETINGS = Listing(
+    "meetings",
+    ("id", "title", "status", "created_at", "ended_at"),
+    ("attendees", "notes", "mom"),
+    {"notes": MEETING_NOTES_EXPRESSION}
+)
+TASKS = Listing(
+    "tasks",
+    ("id", "title", "assignee", "assignee_email", "priority", "status", "created_at", "due_date", "last_followup"),
+    ("description",)
+)
+TODOS = Listing("todos", ("id", "title", "status", "created_at", "completed_at"), ("description",))
+
+LISTINGS = (MEETINGS, TASKS, TODOS)
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Encode a (created_at, id) position as an opaque cursor"""
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def fetch_page(conn, listing: Listing, user_id: int, columns: List[str],
+               position: Optional[Tuple[str, int]], limit: int):
+    """Fetch one page of rows as dicts plus the cursor for the next page"""
+    params = [user_id]
+    if position:
+        params.extend(position)
+    # One extra row tells us whether another page exists
+    params.append(limit + 1)
+    
+    rows = conn.execute(listing.page_query(columns, position is not None), params).fetchall()
+    items = [dict(zip(columns, row)) for row in rows[:limit]]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return items, next_cursor
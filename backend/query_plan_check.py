@@ -0,0 +1,101 @@
+"""Fail if any SQL query used by the backend scans a table or sorts in a temp B-tree.
+
+Usage: python query_plan_check.py
+
+Every SELECT/UPDATE/DELETE string literal in CHECKED_MODULES, plus the
+keyset pagination queries, is run through EXPLAIN QUERY PLAN against a fresh database built with the application
+schema. The exit status is non-zero when any plan contains a SCAN or a
+USE TEMP B-TREE step.
+"""
+import ast
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from database import Database
+from pagination import LISTINGS
+
+BACKEND_DIR = Path(__file__).parent
+CHECKED_MODULES = (
+    "server.py", "auth.py", "database.py", "email_service.py", "openai_service.py", "command_router.py",
+    "jobs.py", "meeting_jobs.py", "dashboard.py", "search.py", "conversation.py", "retrieval.py", "followups.py"
+)
+QUERY_PREFIXES = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def extract_queries(module_path: Path):
+    """Yield (line number, SQL) for every query string literal in a module"""
+    tree = ast.parse(module_path.read_text(), filename=str(module_path))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            sql = " ".join(node.value.split())
+            if sql.startswith(QUERY_PREFIXES):
+                yield node.lineno, sql
+
+
+def listing_queries():
+    """Yield the dynamically built keyset pagination queries"""
+    for listing in LISTINGS:
+        columns = listing.columns()
+        for after_cursor in (False, True):
+            yield f"pagination.py:{listing.table}", listing.page_query(columns, after_cursor)
+
+
+class NullParams(dict):
+    """Binds NULL to every named parameter of a query"""
+    def __missing__(self, key):
+        return None
+
+
+def is_bad_step(detail: str) -> bool:
+    """A plan step is bad if it walks a whole table or builds a sort B-tree"""
+    # Scanning a subquery's already-filtered rows, a virtual table or the
+    # single row of a table-less SELECT is fine
+    if detail.startswith("SCAN") and not detail.startswith(("SCAN (", "SCAN CONSTANT ROW")) \
+            and "VIRTUAL TABLE" not in detail:
+        return True
+    return "USE TEMP B-TREE" in detail
+
+
+def check_query_plans(database: Database, modules=CHECKED_MODULES):
+    """Return a list of (location, sql, plan) for every query with a bad plan"""
+    queries = [
+        (f"{module}:{lineno}", sql)
+        for module in modules
+        for lineno, sql in extract_queries(BACKEND_DIR / module)
+    ]
+    queries.extend(listing_queries())
+    
+    failures = []
+    with database.connection() as conn:
+        for location, sql in queries:
+            params = NullParams() if re.search(r":[a-z_]", sql) else (None,) * sql.count("?")
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            if any(is_bad_step(step) for step in plan):
+                failures.append((location, sql, plan))
+    return failures
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(str(Path(tmp) / "plan_check.db"))
+        try:
+            failures = check_query_plans(database)
+        finally:
+            database.close_all()
+    
+    for location, sql, plan in failures:
+        print(f"{location}: {sql}")
+        for step in plan:
+            print(f"    {step}")
+    
+    if failures:
+        print(f"{len(failures)} query plan(s) scan a table or use a temp B-tree")
+        return 1
+    print("All query plans use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
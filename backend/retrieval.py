@@ -0,0 +1,374 @@
+"""Retrieval of a user's own meetings, notes, tasks and emails for chat.
+
+Each chunk (a meeting's title and MoM, a note, a task, a sent email) is
+embedded as a hashed term-frequency vector: log-scaled word counts are
+hashed with a sign into `dim` buckets and L2-normalized. A user's vectors
+live in one float32 memory-mapped file, so a query is a single
+matrix-vector product over pages the OS keeps cached. IDF weights come from
+per-bucket document counts and are applied to the query only, so adding a
+chunk never rewrites vectors already stored.
+
+Triggers (schema migration 11) copy every change to the source rows into
+retrieval_chunks and mark it dirty; dirty chunks are embedded before the
+user's next query, whichever code path made the change. A query embeds at
+most `request_refresh_limit` of them; a larger backlog (an import, a new
+index) is left to a background job, and queries meanwhile search what is
+already embedded.
+
+Several server processes can share one index directory: a refresh holds
+an exclusive lock file for the user (fcntl.flock) and, under it, takes the
+next slots from retrieval_chunks and picks up a vector file grown by
+another process. Without fcntl (Windows) the lock only covers threads, so
+the index must not be shared between processes there.
+
+NumPy is optional: without it retrieval is disabled and chat works as before.
+"""
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+from database import db
+from jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w\w+", re.UNICODE)
+STOP_WORDS = frozenset("""
+a an and are as at be but by can did do does for from had has have he her his how i if in
+into is it its me my no not of on or our she so that the their them then there these they
+this to was we were what when where which who why will with you your about all any been
+just more than too very would should could also
+""".split())
+
+# Only the start of very long chunks is embedded, and less is shown to the LLM
+EMBED_CHARS = 8000
+SNIPPET_CHARS = 400
+# Candidates scored per result kept, to survive the shared-word check
+CANDIDATE_FACTOR = 5
+INITIAL_CAPACITY = 1024
+
+REFRESH_JOB = "refresh_retrieval_index"
+
+
+@lru_cache(maxsize=65536)
+def hash_term(term: str, dim: int):
+    """Map a term to its (bucket, sign); crc32 is stable across processes"""
+    h = zlib.crc32(term.encode())
+    return h % dim, 1.0 if h & 0x80000000 else -1.0
+
+
+def tokenize(text: str) -> List[str]:
+    return [term for term in TOKEN_PATTERN.findall(text[:EMBED_CHARS].lower()) if term not in STOP_WORDS]
+
+
+def terms(text: str) -> set:
+    return set(tokenize(text))
+
+
+def term_weights(text: str, dim: int) -> dict:
+    """Signed, log-scaled term frequencies of a text, keyed by bucket"""
+    counts = Counter(tokenize(text))
+    weights = {}
+    for term, count in counts.items():
+        bucket, sign = hash_term(term, dim)
+        weights[bucket] = weights.get(bucket, 0.0) + sign * (1.0 + math.log(count))
+    return weights
+
+
+def embed(texts: List[str], dim: int):
+    """Embed texts as rows of L2-normalized hashed TF vectors"""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        weights = term_weights(text, dim)
+        if weights:
+            matrix[row, list(weights)] = list(weights.values())
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class UserVectors:
+    """One user's vector file (slots x dim float32) and its bucket document counts.
+
+    The files are mapped by load(), and changed only inside locked().
+    """
+    def __init__(self, directory: Path, user_id: int, dim: int):
+        self.dim = dim
+        # dim is part of the names, so changing it starts fresh files
+        self.vector_path = directory / f"{user_id}.{dim}.vec"
+        self.df_path = directory / f"{user_id}.{dim}.df"
+        self.lock = threading.Lock()
+        self._lock_fd = os.open(directory / f"{user_id}.{dim}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self.df = None
+        self.vectors = None
+        self.capacity = 0
+        self.count = 0
+
+    @contextmanager
+    def locked(self):
+        """Hold the user's files against other threads and other processes"""
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def load(self) -> bool:
+        """Map the files, creating them if needed; returns whether they are new"""
+        is_new = not self.vector_path.exists()
+        # The last df entry holds the number of embedded chunks
+        self.df = self._map(self.df_path, np.float64, (self.dim + 1,))
+        if is_new:
+            self.df[:] = 0
+        self.capacity = max(INITIAL_CAPACITY, self._rows_on_disk())
+        self.vectors = self._map(self.vector_path, np.float32, (self.capacity, self.dim))
+        return is_new
+
+    def sync(self, count: int):
+        """Adopt the slot count in the database and any growth of the file by another process"""
+        rows = self._rows_on_disk()
+        if rows > self.capacity:
+            self.capacity = rows
+            self.vectors = self._map(self.vector_path, np.float32, (self.capacity, self.dim))
+        self.count = count
+
+    def _rows_on_disk(self) -> int:
+        if self.vector_path.exists():
+            return self.vector_path.stat().st_size // (self.dim * 4)
+        return 0
+
+    @staticmethod
+    def _map(path: Path, dtype, shape):
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        # Growing the file in place keeps existing rows; new bytes read as zeros
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def reserve(self, slots: int):
+        """Make room for at least `slots` rows, doubling the file as needed"""
+        if slots <= self.capacity:
+            return
+        while self.capacity < slots:
+            self.capacity *= 2
+        self.vectors.flush()
+        self.vectors = self._map(self.vector_path, np.float32, (self.capacity, self.dim))
+
+    def clear(self, slots: List[int]):
+        """Zero the given rows and take them out of the document counts"""
+        if not slots:
+            return
+        old = self.vectors[slots]
+        self.df[:-1] -= (old != 0).sum(axis=0)
+        self.df[-1] -= np.count_nonzero(old.any(axis=1))
+        self.vectors[slots] = 0
+
+    def write(self, slots: List[int], matrix):
+        if not slots:
+            return
+        self.vectors[slots] = matrix
+        self.df[:-1] += (matrix != 0).sum(axis=0)
+        self.df[-1] += len(slots)
+        self.count = max(self.count, max(slots) + 1)
+
+    def flush(self):
+        self.vectors.flush()
+        self.df.flush()
+
+
+class RetrievalIndex:
+    def __init__(self, database, directory: str, dim: int = 512, top_k: int = 4, min_score: float = 0.1,
+                 request_refresh_limit: int = 200, job_batch: int = 2000):
+        self.db = database
+        self.directory = Path(directory)
+        self.dim = dim
+        self.top_k = top_k
+        self.min_score = min_score
+        self.request_refresh_limit = request_refresh_limit
+        self.job_batch = job_batch
+        self._users = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return NUMPY_AVAILABLE and self.top_k > 0
+
+    @staticmethod
+    def _slot_count(conn, user_id: int) -> int:
+        return conn.execute(
+            "SELECT COALESCE(MAX(slot), -1) + 1 FROM retrieval_chunks WHERE user_id = ?", (user_id,)
+        ).fetchone()[0]
+
+    def _vectors(self, user_id: int) -> UserVectors:
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                vectors = UserVectors(self.directory, user_id, self.dim)
+                # The connection commits before the lock is released
+                with vectors.locked(), self.db.connection() as conn:
+                    if vectors.load():
+                        # No vectors on disk (new user, new dim, lost files): embed everything again
+                        conn.execute("UPDATE retrieval_chunks SET slot = NULL, dirty = dirty + 1 WHERE user_id = ?", (user_id,))
+                    vectors.count = self._slot_count(conn, user_id)
+                self._users[user_id] = vectors
+            return vectors
+
+    def refresh(self, user_id: int, limit: int = None) -> int:
+        """Embed up to `limit` (default all) of the user's dirty chunks; returns how many were handled"""
+        vectors = self._vectors(user_id)
+        with vectors.locked(), self.db.connection() as conn:
+            # Another process may have embedded chunks since our last look
+            vectors.sync(self._slot_count(conn, user_id))
+            rows = conn.execute(
+                "SELECT id, content, slot, dirty FROM retrieval_chunks WHERE user_id = ? AND dirty > 0 LIMIT ?",
+                (user_id, -1 if limit is None else limit)
+            ).fetchall()
+            if not rows:
+                return 0
+
+            vectors.clear([slot for _, _, slot, _ in rows if slot is not None])
+            next_slot = vectors.count
+            live, removed = [], []
+            for chunk_id, content, slot, dirty in rows:
+                if content is None:
+                    removed.append((chunk_id, dirty))
+                    continue
+                if slot is None:
+                    slot, next_slot = next_slot, next_slot + 1
+                live.append((slot, chunk_id, dirty, content))
+
+            vectors.reserve(next_slot)
+            vectors.write([slot for slot, *_ in live], embed([content for *_, content in live], self.dim))
+            vectors.flush()
+
+            # A chunk changed again meanwhile stays dirty and is embedded next time
+            conn.executemany(
+                "UPDATE retrieval_chunks SET slot = ?, dirty = 0 WHERE id = ? AND dirty = ?",
+                [(slot, chunk_id, dirty) for slot, chunk_id, dirty, _ in live]
+            )
+            conn.executemany("DELETE FROM retrieval_chunks WHERE id = ? AND dirty = ?", removed)
+        return len(rows)
+
+    def refresh_for_query(self, user_id: int):
+        """Embed a few recent changes inline and hand a larger backlog to the job queue"""
+        if self.refresh(user_id, self.request_refresh_limit) >= self.request_refresh_limit:
+            job_queue.enqueue(user_id, REFRESH_JOB, {}, max_attempts=3, dedupe_key=f"{REFRESH_JOB}:{user_id}")
+
+    def refresh_job(self, job: dict) -> dict:
+        """Embed the user's whole backlog in batches"""
+        refreshed = 0
+        while True:
+            count = self.refresh(job["user_id"], self.job_batch)
+            refreshed += count
+            if count < self.job_batch:
+                return {"refreshed": refreshed}
+
+    def query_weights(self, query: str, df):
+        """The query's buckets and unit-length TF-IDF weights; None if it has no usable terms"""
+        weights = term_weights(query, self.dim)
+        if not weights:
+            return None
+        buckets = np.fromiter(weights, dtype=np.intp)
+        idf = np.log((df[-1] + 1.0) / (df[buckets] + 1.0)) + 1.0
+        tf_idf = np.fromiter(weights.values(), dtype=np.float64) * idf
+        return buckets, (tf_idf / np.linalg.norm(tf_idf)).astype(np.float32)
+
+    def search(self, user_id: int, query: str, k: int = None) -> List[dict]:
+        """The user's k most similar chunks scoring at least min_score, best first.
+
+        Scores are the cosine between the TF-IDF query and each chunk's TF
+        vector. Only the query's buckets can contribute, so just those
+        columns are read. The best candidates are then checked for a word
+        in common with the query, which drops matches that only come from
+        hash collisions.
+        """
+        k = k or self.top_k
+        self.refresh_for_query(user_id)
+        vectors = self._vectors(user_id)
+
+        with vectors.lock:
+            query_weights = self.query_weights(query, vectors.df)
+            if query_weights is None or vectors.count == 0:
+                return []
+            buckets, weights = query_weights
+            scores = vectors.vectors[:vectors.count, buckets] @ weights
+
+        pool = k * CANDIDATE_FACTOR
+        top = np.argpartition(-scores, pool)[:pool] if len(scores) > pool else np.arange(len(scores))
+        top = [int(slot) for slot in top[np.argsort(-scores[top])] if scores[slot] >= self.min_score]
+        if not top:
+            return []
+
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT slot, kind, ref_id, meeting_id, substr(content, 1, ?)
+                FROM retrieval_chunks WHERE user_id = ? AND slot IN (SELECT value FROM json_each(?))
+            """, (EMBED_CHARS, user_id, json.dumps(top))).fetchall()
+        found = {row[0]: row for row in rows}
+
+        query_terms = terms(query)
+        hits = []
+        for slot in top:
+            row = found.get(slot)
+            if row is None or query_terms.isdisjoint(terms(row[4])):
+                continue
+            hits.append({
+                "kind": row[1],
+                "id": row[2],
+                "meeting_id": row[3],
+                "text": row[4][:SNIPPET_CHARS],
+                "score": round(float(scores[slot]), 4)
+            })
+            if len(hits) == k:
+                break
+        return hits
+
+    def relevant(self, user_id: int, query: str) -> List[dict]:
+        """Snippets to ground a chat reply in; retrieval problems never fail the chat"""
+        if not self.enabled:
+            return []
+        try:
+            return self.search(user_id, query)
+        except Exception as e:
+            logger.error(f"Retrieval failed for user {user_id}: {e}")
+            return []
+
+
+# Initialize retrieval index instance
+retrieval_index = RetrievalIndex(
+    db,
+    # Next to the database, however the server was started
+    os.environ.get("RAG_INDEX_DIR", str(Path(__file__).parent / "retrieval_index")),
+    dim=int(os.environ.get("RAG_DIM", "512")),
+    top_k=int(os.environ.get("RAG_TOP_K", "4")),
+    min_score=float(os.environ.get("RAG_MIN_SCORE", "0.1")),
+    request_refresh_limit=int(os.environ.get("RAG_REQUEST_REFRESH_LIMIT", "200"))
+)
+
+if retrieval_index.enabled:
+    job_queue.register(REFRESH_JOB, retrieval_index.refresh_job)
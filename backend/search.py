@@ -0,0 +1,96 @@
+"""Full-text search over a user's meetings, notes, tasks and emails.
+
+Backed by the FTS5 search_index table (schema migration 9), which triggers
+keep in sync with the source tables. Results are ranked by BM25 with titles
+weighted above bodies, and come with a highlighted snippet.
+"""
+import base64
+import json
+import re
+from typing import List, Optional, Tuple
+
+SEARCH_KINDS = ("meeting", "note", "task", "email")
+MAX_QUERY_TERMS = 8
+MAX_OFFSET = 1000
+
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+SEARCH_QUERY = """
+SELECT search_index.kind, search_index.ref_id, search_index.meeting_id,
+       COALESCE(search_index.title, meetings.title),
+       snippet(search_index, 2, '[', ']', '…', 16), search_index.rank
+FROM search_index LEFT JOIN meetings ON meetings.id = search_index.meeting_id
+WHERE search_index MATCH ? ORDER BY search_index.rank LIMIT ? OFFSET ?
+"""
+
+
+def build_match(user_id: int, query: str, kinds: Optional[List[str]] = None) -> Optional[str]:
+    """Turn free text into a safe FTS5 expression scoped to one user.
+
+    Every word must appear in the title or body; the last word also matches
+    as a prefix so results keep up with typing. FTS5 operators in the input
+    are treated as plain words. Returns None if the query has no words.
+    """
+    terms = TERM_PATTERN.findall(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    scope = f"u{int(user_id)}"
+    if kinds:
+        scope += " AND (" + " OR ".join(kinds) + ")"
+    return f"scope: ({scope}) AND {{title body}}: ({' AND '.join(phrases)})"
+
+
+def parse_kinds(kinds: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated kinds= filter; raises ValueError for unknown kinds"""
+    if not kinds:
+        return None
+    requested = [kind.strip() for kind in kinds.split(",") if kind.strip()]
+    unknown = [kind for kind in requested if kind not in SEARCH_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown search kinds: {', '.join(unknown)}")
+    return requested
+
+
+def encode_search_cursor(offset: int) -> str:
+    raw = json.dumps([offset]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: Optional[str]) -> int:
+    """Decode a search cursor into a result offset; raises ValueError if malformed"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        (offset,) = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(offset, int) or not 0 <= offset <= MAX_OFFSET:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def search(conn, user_id: int, query: str, kinds: Optional[List[str]], offset: int, limit: int) -> Tuple[list, Optional[str]]:
+    """Return one page of ranked hits and the cursor of the next page"""
+    match = build_match(user_id, query, kinds)
+    if match is None:
+        return [], None
+
+    # One extra row tells us whether another page exists
+    rows = conn.execute(SEARCH_QUERY, (match, limit + 1, offset)).fetchall()
+    has_more = len(rows) > limit and offset + limit <= MAX_OFFSET
+    items = [
+        {
+            "kind": kind,
+            "id": ref_id,
+            "meeting_id": meeting_id,
+            "title": title,
+            "snippet": snippet,
+            "score": -rank
+        }
+        for kind, ref_id, meeting_id, title, snippet, rank in rows[:limit]
+    ]
+    return items, encode_search_cursor(offset + limit) if has_more else None
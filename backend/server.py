@@ -1,18 +1,31 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
+import json
+import asyncio
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 import sqlite3
 
 # Import custom modules
-from database import db
-from auth import create_access_token, get_current_user
-from openai_service import openai_service
+from database import db, adb
+from auth import create_access_token, get_current_user, get_user, invalidate_user, user_cache, token_cache
+from openai_service import openai_service, async_openai_service, llm_cache, mom_summarizer
 from email_service import email_service
+from command_router import command_router, respond as respond_to_command
+from jobs import job_queue, TERMINAL_STATUSES
+from meeting_jobs import MOM_JOB, schedule_rolling_summary
+from health import health_prober
+from dashboard import dashboard
+from search import search, parse_kinds, decode_search_cursor
+from conversation import conversation_memory
+from followups import followup_scheduler
+from metrics import MetricsMiddleware, METRICS_TOKEN, SERVER_TIMING, render_metrics, scrape_authorized
+from pagination import MEETINGS, TASKS, TODOS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, fetch_page
 from models import *
 
 ROOT_DIR = Path(__file__).parent
@@ -24,11 +37,29 @@ app = FastAPI(title="Jarvis AI Assistant", version="1.0.0")
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+DISCONNECT_POLL_INTERVAL = 0.5
+
+async def cancel_on_disconnect(request: Request, coro):
+    """Await an LLM coroutine, cancelling it and its upstream call if the client goes away"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
 # Authentication Routes
 @api_router.post("/register")
 async def register(user_data: UserRegister):
     try:
-        user_id = db.create_user(
+        user_id = await adb.call(
+            db.create_user,
             name=user_data.name,
             email=user_data.email,
             password=user_data.password,
@@ -41,7 +72,7 @@ async def register(user_data: UserRegister):
 
 @api_router.post("/login")
 async def login(user_data: UserLogin):
-    user = db.authenticate_user(user_data.email, user_data.password)
+    user = await adb.call(db.authenticate_user, user_data.email, user_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -54,11 +85,7 @@ async def verify_forgot_password(data: dict):
     if not email:
         raise HTTPException(status_code=400, detail="Email is required")
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT security_question FROM users WHERE email = ?", (email,))
-    user = cursor.fetchone()
-    conn.close()
+    user = await adb.fetchone("SELECT security_question FROM users WHERE email = ?", (email,))
     
     if not user or not user[0]:
         raise HTTPException(status_code=404, detail="User not found or no security question set")
@@ -74,44 +101,42 @@ async def reset_password(data: dict):
     if not all([email, security_answer, new_password]):
         raise HTTPException(status_code=400, detail="All fields are required")
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Verify security answer
-    cursor.execute("SELECT security_answer FROM users WHERE email = ?", (email,))
-    user = cursor.fetchone()
-    
-    if not user or user[0] != security_answer:
-        conn.close()
-        raise HTTPException(status_code=401, detail="Invalid security answer")
+    def reset(conn):
+        cursor = conn.cursor()
+        
+        # Verify security answer
+        cursor.execute("SELECT id, security_answer FROM users WHERE email = ?", (email,))
+        user = cursor.fetchone()
+        
+        if not user or user[1] != security_answer:
+            raise HTTPException(status_code=401, detail="Invalid security answer")
+        
+        # Update password
+        new_password_hash = db.hash_password(new_password)
+        cursor.execute("UPDATE users SET password_hash = ? WHERE email = ?", (new_password_hash, email))
+        return user[0]
     
-    # Update password
-    new_password_hash = db.hash_password(new_password)
-    cursor.execute("UPDATE users SET password_hash = ? WHERE email = ?", (new_password_hash, email))
-    conn.commit()
-    conn.close()
+    user_id = await adb.run(reset)
+    invalidate_user(user_id)
     
     return {"message": "Password reset successfully"}
 
 @api_router.get("/me")
 async def get_current_user_info(user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, email FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    # get_current_user has just loaded this record into the user cache
+    user = get_user(user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return {"id": user[0], "name": user[1], "email": user[2]}
+    return user
 
 # System Configuration Routes
 @api_router.get("/config")
 async def get_system_config(user_id: int = Depends(get_current_user)):
-    config = db.get_user_config(user_id)
+    config = await adb.call(db.get_user_config, user_id)
     if not config:
-        return {"openai_key": None, "smtp_host": None, "smtp_port": None, "smtp_user": None, "smtp_pass": None}
+        return {"openai_key": None, "smtp_host": None, "smtp_port": None, "smtp_user": None, "smtp_pass": None, "llm_cache_enabled": True}
     
     # Don't return sensitive data
     return {
@@ -119,45 +144,23 @@ async def get_system_config(user_id: int = Depends(get_current_user)):
         "smtp_host": config.get('smtp_host'),
         "smtp_port": config.get('smtp_port'),
         "smtp_user": config.get('smtp_user'),
-        "smtp_pass": "***" if config.get('smtp_pass') else None
+        "smtp_pass": "***" if config.get('smtp_pass') else None,
+        "llm_cache_enabled": config.get('llm_cache_enabled', True)
     }
 
 @api_router.post("/config")
 async def update_system_config(config: SystemConfig, user_id: int = Depends(get_current_user)):
     try:
-        # Test OpenAI API if provided
-        openai_test_result = False
-        openai_error = None
-        if config.openai_key and config.openai_key.strip():
-            try:
-                # Test OpenAI API
-                from openai import OpenAI
-                test_client = OpenAI(api_key=config.openai_key)
-                response = test_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": "Hello"}],
-                    max_tokens=5
-                )
-                openai_test_result = True
-            except Exception as e:
-                openai_error = str(e)
-        
-        # Test SMTP if provided
-        smtp_test_result = False
-        smtp_error = None
-        if all([config.smtp_host, config.smtp_port, config.smtp_user, config.smtp_pass]):
-            try:
-                import smtplib
-                server = smtplib.SMTP(config.smtp_host, config.smtp_port)
-                server.starttls()
-                server.login(config.smtp_user, config.smtp_pass)
-                server.quit()
-                smtp_test_result = True
-            except Exception as e:
-                smtp_error = str(e)
-        
         # Save configuration to database
-        db.update_user_config(user_id, config.dict())
+        await adb.call(db.update_user_config, user_id, config.dict())
+        
+        # Probe the new settings now, which also primes the status cache
+        saved = await adb.call(db.get_user_config, user_id)
+        health = await health_prober.refresh(user_id, saved)
+        openai_test_result = health["openai"]["connected"]
+        openai_error = health["openai"]["error"]
+        smtp_test_result = health["smtp"]["connected"]
+        smtp_error = health["smtp"]["error"]
         
         # Prepare response message
         response_msg = "Configuration saved successfully!\n\n"
@@ -190,274 +193,439 @@ async def update_system_config(config: SystemConfig, user_id: int = Depends(get_
         raise HTTPException(status_code=500, detail=f"Configuration update failed: {str(e)}")
 
 # Chat Routes
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def open_conversation(message: ChatMessage, user_id: int) -> dict:
+    """Load the conversation the message belongs to, or start one"""
+    conversation = await adb.run(conversation_memory.open, user_id, message.conversation_id, message.message)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+async def record_turn(conversation: dict, user_id: int, message: str, reply: str):
+    await adb.run(conversation_memory.record, conversation["id"], message, reply)
+    if conversation["overflow"]:
+        await adb.call(conversation_memory.schedule_summary, user_id, conversation["id"])
+
 @api_router.post("/chat", response_model=ChatResponse)
-async def chat_with_jarvis(message: ChatMessage, user_id: int = Depends(get_current_user)):
+async def chat_with_jarvis(message: ChatMessage, request: Request, user_id: int = Depends(get_current_user)):
     try:
-        # Process the message and detect commands
-        response = openai_service.generate_response(user_id, message.message, message.context)
+        conversation = await open_conversation(message, user_id)
         
-        # Detect commands
-        command_detected = None
-        action_required = None
+        # Recognized commands are answered locally without an LLM round trip
+        match = command_router.classify(message.message)
+        if match:
+            response = await respond_to_command(match, user_id)
+            await record_turn(conversation, user_id, message.message, response)
+            return ChatResponse(
+                response=response,
+                command_detected=match.command,
+                action_required=match.action,
+                conversation_id=conversation["id"]
+            )
         
-        msg_lower = message.message.lower()
-        if "start meeting" in msg_lower:
-            command_detected = "start_meeting"
-            action_required = "collect_meeting_details"
-        elif "end meeting" in msg_lower:
-            command_detected = "end_meeting"
-            action_required = "generate_mom"
-        elif "create task" in msg_lower:
-            command_detected = "create_task"
-            action_required = "collect_task_details"
-        elif "create todo" in msg_lower:
-            command_detected = "create_todo"
-            action_required = "collect_todo_details"
-        elif "send email" in msg_lower:
-            command_detected = "send_email"
-            action_required = "collect_email_details"
-        elif "system check" in msg_lower:
-            command_detected = "system_check"
-            action_required = "run_system_check"
+        response = await cancel_on_disconnect(
+            request, async_openai_service.generate_response(
+                user_id, message.message, message.context, conversation["history"]
+            )
+        )
+        await record_turn(conversation, user_id, message.message, response)
         
+        # The frontend still walks the user through commands the LLM answered
+        hint = command_router.hint(message.message)
         return ChatResponse(
             response=response,
-            command_detected=command_detected,
-            action_required=action_required
+            command_detected=hint.command if hint else None,
+            action_required=hint.action if hint else None,
+            conversation_id=conversation["id"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+@api_router.post("/chat/stream")
+async def stream_chat_with_jarvis(message: ChatMessage, user_id: int = Depends(get_current_user)):
+    """Stream the chat reply as Server-Sent Events.
+    
+    A "command" event is sent first, since it only depends on the input
+    (a hint from the message when the LLM answers), followed by one "token"
+    event per text delta and a final "done" event.
+    Recognized commands are answered locally in a single "token" event.
+    The turn is stored once the reply is complete.
+    """
+    conversation = await open_conversation(message, user_id)
+    match = command_router.classify(message.message)
+    hint = match or command_router.hint(message.message)
+    
+    # Starlette cancels this generator, and with it the upstream stream, when
+    # the client disconnects
+    async def event_stream():
+        yield sse_event("command", {
+            "command_detected": hint.command if hint else None,
+            "action_required": hint.action if hint else None,
+            "conversation_id": conversation["id"]
+        })
+        parts = []
+        if match:
+            parts.append(await respond_to_command(match, user_id))
+            yield sse_event("token", {"text": parts[0]})
+        else:
+            async for delta in async_openai_service.stream_response(
+                user_id, message.message, message.context, conversation["history"]
+            ):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        await record_turn(conversation, user_id, message.message, "".join(parts))
+        yield sse_event("done", {})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def parse_page_params(listing, fields: Optional[str], cursor: Optional[str]):
+    """Validate the fields= projection and cursor of a paginated listing"""
+    try:
+        return listing.columns(fields), decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Meeting Routes
 @api_router.post("/meetings/start")
 async def start_meeting(meeting: MeetingStart, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO meetings (user_id, title, attendees, notes, status)
-        VALUES (?, ?, ?, ?, 'active')
-    """, (user_id, meeting.title, meeting.attendees, "", ))
-    
-    meeting_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    meeting_id = await adb.insert("""
+        INSERT INTO meetings (user_id, title, attendees, status)
+        VALUES (?, ?, ?, 'active')
+    """, (user_id, meeting.title, meeting.attendees))
+    dashboard.bump(user_id)
     
     return {"meeting_id": meeting_id, "message": "Meeting started successfully"}
 
 @api_router.post("/meetings/{meeting_id}/notes")
 async def add_meeting_note(meeting_id: int, note: MeetingNote, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Get current notes
-    cursor.execute("SELECT notes FROM meetings WHERE id = ? AND user_id = ?", (meeting_id, user_id))
-    current_notes = cursor.fetchone()
-    
-    if not current_notes:
-        conn.close()
+    seq = await adb.call(db.add_meeting_note, user_id, meeting_id, note.note)
+    if seq is None:
         raise HTTPException(status_code=404, detail="Meeting not found")
     
-    # Append new note
-    updated_notes = (current_notes[0] or "") + "\n" + note.note
-    
-    cursor.execute("""
-        UPDATE meetings SET notes = ? WHERE id = ? AND user_id = ?
-    """, (updated_notes, meeting_id, user_id))
+    # Keep the running summary current so ending the meeting stays fast
+    await adb.call(schedule_rolling_summary, user_id, meeting_id)
     
-    conn.commit()
-    conn.close()
+    return {"message": "Note added successfully", "seq": seq}
+
+@api_router.get("/meetings/{meeting_id}/notes/export")
+async def export_meeting_notes(meeting_id: int, user_id: int = Depends(get_current_user)):
+    meeting = await adb.fetchone(
+        "SELECT id FROM meetings WHERE id = ? AND user_id = ?", (meeting_id, user_id)
+    )
+    if not meeting:
+        raise HTTPException(status_code=404, detail="Meeting not found")
     
-    return {"message": "Note added successfully"}
+    async def stream_notes():
+        # Page through the notes by seq so memory stays flat for long meetings
+        after_seq = 0
+        while True:
+            rows = await adb.call(db.get_meeting_notes_batch, meeting_id, after_seq)
+            if not rows:
+                break
+            yield "".join(f"[{created_at}] {note}\n" for _, note, created_at in rows)
+            after_seq = rows[-1][0]
+    
+    return StreamingResponse(
+        stream_notes(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="meeting-{meeting_id}-notes.txt"'}
+    )
 
-@api_router.post("/meetings/{meeting_id}/end")
+@api_router.post("/meetings/{meeting_id}/end", status_code=202)
 async def end_meeting(meeting_id: int, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Get meeting details
-    cursor.execute("""
-        SELECT title, attendees, notes FROM meetings 
-        WHERE id = ? AND user_id = ? AND status = 'active'
-    """, (meeting_id, user_id))
+    def end(conn):
+        # Close the meeting and queue its MoM in one transaction, so a meeting
+        # can only be ended (and summarised) once
+        ended = conn.execute("""
+            UPDATE meetings SET status = 'completed', ended_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ? AND status = 'active'
+        """, (meeting_id, user_id)).rowcount
+        if not ended:
+            return None
+        
+        job_id = job_queue.enqueue(user_id, MOM_JOB, {"meeting_id": meeting_id})
+        conn.execute("UPDATE meetings SET mom_job_id = ? WHERE id = ?", (job_id, meeting_id))
+        return job_id
     
-    meeting = cursor.fetchone()
-    if not meeting:
-        conn.close()
+    job_id = await adb.run(end)
+    if job_id is None:
         raise HTTPException(status_code=404, detail="Active meeting not found")
+    job_queue.wake()
+    dashboard.bump(user_id)
     
-    # Generate MoM using OpenAI
-    mom = openai_service.generate_mom(user_id, meeting[0], meeting[1], meeting[2])
-    
-    # Update meeting
-    cursor.execute("""
-        UPDATE meetings 
-        SET status = 'completed', ended_at = CURRENT_TIMESTAMP, mom = ?
-        WHERE id = ? AND user_id = ?
-    """, (mom, meeting_id, user_id))
-    
-    conn.commit()
-    conn.close()
-    
-    return {"message": "Meeting ended successfully", "mom": mom, "meeting_id": meeting_id}
+    return {
+        "message": "Meeting ended; Minutes of Meeting are being generated",
+        "meeting_id": meeting_id,
+        "job_id": job_id,
+        "status": "queued"
+    }
 
-@api_router.get("/meetings", response_model=List[Meeting])
-async def get_meetings(user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, title, attendees, notes, mom, status, created_at, ended_at
-        FROM meetings WHERE user_id = ? ORDER BY created_at DESC
-    """, (user_id,))
-    
-    meetings = cursor.fetchall()
-    conn.close()
+async def get_meeting_minutes(meeting_id: int, user_id: int) -> Optional[dict]:
+    """Current MoM state of a meeting, or None if it is not the user's"""
+    row = await adb.fetchone("""
+        SELECT m.mom, m.mom_job_id, j.status, j.error
+        FROM meetings m LEFT JOIN jobs j ON j.id = m.mom_job_id
+        WHERE m.id = ? AND m.user_id = ?
+    """, (meeting_id, user_id))
+    if not row:
+        return None
+    
+    mom, job_id, status, error = row
+    if status is None:
+        # No job (meetings ended before the queue existed) or already purged
+        status = "succeeded" if mom is not None else "not_started"
+    return {"meeting_id": meeting_id, "job_id": job_id, "status": status, "mom": mom, "error": error}
+
+@api_router.get("/meetings/{meeting_id}/mom")
+async def get_meeting_mom(meeting_id: int, user_id: int = Depends(get_current_user)):
+    minutes = await get_meeting_minutes(meeting_id, user_id)
+    if minutes is None:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    return minutes
+
+JOB_EVENT_RECHECK_INTERVAL = 5.0
+JOB_EVENT_TIMEOUT = 300.0
+
+@api_router.get("/meetings/{meeting_id}/mom/events")
+async def stream_meeting_mom(meeting_id: int, user_id: int = Depends(get_current_user)):
+    minutes = await get_meeting_minutes(meeting_id, user_id)
+    if minutes is None:
+        raise HTTPException(status_code=404, detail="Meeting not found")
     
-    return [
-        Meeting(
-            id=m[0], title=m[1], attendees=m[2], notes=m[3], mom=m[4],
-            status=m[5], created_at=m[6], ended_at=m[7]
-        ) for m in meetings
-    ]
+    async def event_stream():
+        current = minutes
+        yield sse_event("status", current)
+        if current["job_id"] is None or current["status"] in TERMINAL_STATUSES:
+            return
+        
+        # Worker threads report completion through call_soon_threadsafe; the
+        # periodic re-read covers jobs finished by another process's workers
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+        
+        def on_finished(job):
+            loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(job))
+        
+        job_queue.subscribe(current["job_id"], on_finished)
+        try:
+            deadline = loop.time() + JOB_EVENT_TIMEOUT
+            while loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(asyncio.shield(finished), JOB_EVENT_RECHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                current = await get_meeting_minutes(meeting_id, user_id)
+                if current["status"] in TERMINAL_STATUSES:
+                    break
+            yield sse_event("done", current)
+        finally:
+            job_queue.unsubscribe(current["job_id"], on_finished)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/meetings", response_model=MeetingPage, response_model_exclude_unset=True)
+async def get_meetings(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user_id: int = Depends(get_current_user)
+):
+    columns, position = parse_page_params(MEETINGS, fields, cursor)
+    meetings, next_cursor = await adb.run(fetch_page, MEETINGS, user_id, columns, position, limit)
+    
+    return MeetingPage(items=[Meeting(**m) for m in meetings], next_cursor=next_cursor)
 
 # Task Routes
+def task_email_context(tasks: List[TaskCreate]) -> str:
+    """Describe one task, or a digest of several, for the assignment email draft"""
+    details = [
+        f"Task: {task.title}\nDescription: {task.description}\nPriority: {task.priority}"
+        for task in tasks
+    ]
+    if len(details) == 1:
+        return details[0]
+    return f"Digest of {len(details)} tasks assigned in one batch:\n\n" + "\n\n".join(details)
+
+BULK_DRAFT_CONCURRENCY = int(os.environ.get("BULK_DRAFT_CONCURRENCY", "8"))
+
 @api_router.post("/tasks")
 async def create_task(task: TaskCreate, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
+    task_id = await adb.insert("""
         INSERT INTO tasks (user_id, title, description, assignee, assignee_email, priority, due_date)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (user_id, task.title, task.description, task.assignee, task.assignee_email, task.priority, task.due_date))
+    dashboard.bump(user_id)
     
-    task_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    # Send assignment email if assignee email is provided
+    # Queue assignment email if assignee email is provided
+    outbox_id = None
     if task.assignee_email:
-        email_draft = openai_service.draft_email(
+        email_draft = await async_openai_service.draft_email(
             user_id, 
             task.assignee_email, 
-            f"Task: {task.title}\nDescription: {task.description}\nPriority: {task.priority}", 
+            task_email_context([task]), 
             "task_assignment"
         )
         
         if "error" not in email_draft:
-            email_service.send_email(
-                user_id, 
-                task.assignee_email, 
-                email_draft["subject"], 
-                email_draft["body"], 
-                "task_assignment",
-                task_id
-            )
+            try:
+                outbox_id = await adb.call(
+                    email_service.queue_email,
+                    user_id, 
+                    task.assignee_email, 
+                    email_draft["subject"], 
+                    email_draft["body"], 
+                    "task_assignment",
+                    task_id
+                )
+            except ValueError as e:
+                logger.warning(f"Task {task_id} assignment email not queued: {e}")
     
-    return {"task_id": task_id, "message": "Task created successfully"}
+    return {"task_id": task_id, "email_outbox_id": outbox_id, "message": "Task created successfully"}
 
-@api_router.get("/tasks", response_model=List[Task])
-async def get_tasks(user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, title, description, assignee, assignee_email, priority, status, created_at, due_date, last_followup
-        FROM tasks WHERE user_id = ? ORDER BY created_at DESC
-    """, (user_id,))
+@api_router.post("/tasks/bulk")
+async def create_tasks_bulk(bulk: TaskBulkCreate, user_id: int = Depends(get_current_user)):
+    rows = [
+        (user_id, task.title, task.description, task.assignee, task.assignee_email, task.priority, task.due_date)
+        for task in bulk.tasks
+    ]
     
-    tasks = cursor.fetchall()
-    conn.close()
+    def insert_tasks(conn):
+        conn.executemany("""
+            INSERT INTO tasks (user_id, title, description, assignee, assignee_email, priority, due_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        # The transaction holds the write lock, so the new ids are consecutive
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+    
+    task_ids = await adb.run(insert_tasks)
+    dashboard.bump(user_id)
+    
+    # One digest email per assignee, drafted concurrently
+    by_assignee = {}
+    for task_id, task in zip(task_ids, bulk.tasks):
+        if task.assignee_email:
+            by_assignee.setdefault(task.assignee_email, []).append((task_id, task))
+    
+    outbox_ids = {}
+    if bulk.notify_assignees and by_assignee:
+        limiter = asyncio.Semaphore(BULK_DRAFT_CONCURRENCY)
+        
+        async def draft(recipient, assigned):
+            async with limiter:
+                return await async_openai_service.draft_email(
+                    user_id, recipient, task_email_context([task for _, task in assigned]), "task_assignment"
+                )
+        
+        drafts = await asyncio.gather(*(draft(recipient, assigned) for recipient, assigned in by_assignee.items()))
+        messages = [
+            (recipient, email_draft["subject"], email_draft["body"], "task_assignment", assigned[0][0])
+            for (recipient, assigned), email_draft in zip(by_assignee.items(), drafts)
+            if "error" not in email_draft
+        ]
+        try:
+            ids = await adb.call(email_service.queue_emails, user_id, messages)
+            outbox_ids = {message[0]: outbox_id for message, outbox_id in zip(messages, ids)}
+        except ValueError as e:
+            logger.warning(f"Bulk task assignment emails not queued: {e}")
     
-    return [
-        Task(
-            id=t[0], title=t[1], description=t[2], assignee=t[3], assignee_email=t[4],
-            priority=t[5], status=t[6], created_at=t[7], due_date=t[8], last_followup=t[9]
-        ) for t in tasks
-    ]
+    return {
+        "task_ids": task_ids,
+        "email_outbox_ids": outbox_ids,
+        "message": f"{len(task_ids)} tasks created successfully"
+    }
+
+@api_router.get("/tasks", response_model=TaskPage, response_model_exclude_unset=True)
+async def get_tasks(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user_id: int = Depends(get_current_user)
+):
+    columns, position = parse_page_params(TASKS, fields, cursor)
+    tasks, next_cursor = await adb.run(fetch_page, TASKS, user_id, columns, position, limit)
+    
+    return TaskPage(items=[Task(**t) for t in tasks], next_cursor=next_cursor)
 
 @api_router.put("/tasks/{task_id}/complete")
 async def complete_task(task_id: int, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
+    await adb.execute("""
         UPDATE tasks SET status = 'completed' WHERE id = ? AND user_id = ?
     """, (task_id, user_id))
-    
-    conn.commit()
-    conn.close()
+    dashboard.bump(user_id)
     
     return {"message": "Task marked as completed"}
 
 # Todo Routes
 @api_router.post("/todos")
 async def create_todo(todo: TodoCreate, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
+    todo_id = await adb.insert("""
         INSERT INTO todos (user_id, title, description)
         VALUES (?, ?, ?)
     """, (user_id, todo.title, todo.description))
-    
-    todo_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    dashboard.bump(user_id)
     
     return {"todo_id": todo_id, "message": "Todo created successfully"}
 
-@api_router.get("/todos", response_model=List[Todo])
-async def get_todos(user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, title, description, status, created_at, completed_at
-        FROM todos WHERE user_id = ? ORDER BY created_at DESC
-    """, (user_id,))
-    
-    todos = cursor.fetchall()
-    conn.close()
-    
-    return [
-        Todo(
-            id=t[0], title=t[1], description=t[2], status=t[3], 
-            created_at=t[4], completed_at=t[5]
-        ) for t in todos
-    ]
+@api_router.get("/todos", response_model=TodoPage, response_model_exclude_unset=True)
+async def get_todos(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user_id: int = Depends(get_current_user)
+):
+    columns, position = parse_page_params(TODOS, fields, cursor)
+    todos, next_cursor = await adb.run(fetch_page, TODOS, user_id, columns, position, limit)
+    
+    return TodoPage(items=[Todo(**t) for t in todos], next_cursor=next_cursor)
 
 @api_router.put("/todos/{todo_id}/complete")
 async def complete_todo(todo_id: int, user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
+    await adb.execute("""
         UPDATE todos SET status = 'completed', completed_at = CURRENT_TIMESTAMP 
         WHERE id = ? AND user_id = ?
     """, (todo_id, user_id))
-    
-    conn.commit()
-    conn.close()
+    dashboard.bump(user_id)
     
     return {"message": "Todo marked as completed"}
 
 # Email Routes
-@api_router.post("/emails/send")
+@api_router.post("/emails/send", status_code=202)
 async def send_email(email: EmailSend, user_id: int = Depends(get_current_user)):
-    success = email_service.send_email(
-        user_id, email.recipient, email.subject, email.body, email.email_type
-    )
-    
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to send email")
+    try:
+        outbox_id = await adb.call(
+            email_service.queue_email, user_id, email.recipient, email.subject, email.body, email.email_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"message": "Email sent successfully"}
+    return {"message": "Email queued for delivery", "outbox_id": outbox_id, "status": "queued"}
+
+@api_router.get("/emails/outbox/{outbox_id}")
+async def get_outbox_entry(outbox_id: int, user_id: int = Depends(get_current_user)):
+    entry = await adb.call(email_service.get_outbox_entry, outbox_id, user_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Outbox entry not found")
+    return entry
 
 @api_router.post("/emails/draft")
-async def draft_email(email: EmailDraft, user_id: int = Depends(get_current_user)):
-    draft = openai_service.draft_email(user_id, email.recipient, email.context, email.email_type)
+async def draft_email(email: EmailDraft, request: Request, user_id: int = Depends(get_current_user)):
+    draft = await cancel_on_disconnect(
+        request, async_openai_service.draft_email(user_id, email.recipient, email.context, email.email_type)
+    )
     
     if "error" in draft:
         raise HTTPException(status_code=500, detail=draft["error"])
@@ -466,17 +634,11 @@ async def draft_email(email: EmailDraft, user_id: int = Depends(get_current_user
 
 @api_router.get("/emails", response_model=List[Email])
 async def get_emails(user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
+    emails = await adb.fetchall("""
         SELECT id, recipient, subject, body, sent_at, email_type
         FROM emails WHERE user_id = ? ORDER BY sent_at DESC LIMIT 20
     """, (user_id,))
     
-    emails = cursor.fetchall()
-    conn.close()
-    
     return [
         Email(
             id=e[0], recipient=e[1], subject=e[2], body=e[3], 
@@ -488,38 +650,14 @@ async def get_emails(user_id: int = Depends(get_current_user)):
 @api_router.get("/system/status", response_model=SystemStatus)
 async def get_system_status(user_id: int = Depends(get_current_user)):
     # Get user configuration
-    config = db.get_user_config(user_id)
-    
-    openai_connected = False
-    smtp_connected = False
-    openai_error = None
-    smtp_error = None
+    config = await adb.call(db.get_user_config, user_id)
     
-    # Test OpenAI connection if API key exists
-    if config and config.get('openai_key'):
-        try:
-            from openai import OpenAI
-            test_client = OpenAI(api_key=config['openai_key'])
-            response = test_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=5
-            )
-            openai_connected = True
-        except Exception as e:
-            openai_error = str(e)
-    
-    # Test SMTP connection if configuration exists
-    if config and all([config.get('smtp_host'), config.get('smtp_user'), config.get('smtp_pass')]):
-        try:
-            import smtplib
-            server = smtplib.SMTP(config['smtp_host'], config['smtp_port'])
-            server.starttls()
-            server.login(config['smtp_user'], config['smtp_pass'])
-            server.quit()
-            smtp_connected = True
-        except Exception as e:
-            smtp_error = str(e)
+    # Cached probe results; stale ones are refreshed in the background
+    health = await health_prober.status(user_id, config)
+    openai_connected = health["openai"]["connected"]
+    openai_error = health["openai"]["error"]
+    smtp_connected = health["smtp"]["connected"]
+    smtp_error = health["smtp"]["error"]
     
     # Database is always connected if we reach here
     database_connected = True
@@ -554,69 +692,72 @@ async def get_system_status(user_id: int = Depends(get_current_user)):
         message=status_message
     )
 
-# Dashboard Route
-@api_router.get("/dashboard", response_model=DashboardData)
-async def get_dashboard(user_id: int = Depends(get_current_user)):
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Get recent meetings
-    cursor.execute("""
-        SELECT id, title, attendees, notes, mom, status, created_at, ended_at
-        FROM meetings WHERE user_id = ? ORDER BY created_at DESC LIMIT 5
-    """, (user_id,))
-    meetings = cursor.fetchall()
-    
-    # Get active tasks
-    cursor.execute("""
-        SELECT id, title, description, assignee, assignee_email, priority, status, created_at, due_date, last_followup
-        FROM tasks WHERE user_id = ? AND status != 'completed' ORDER BY created_at DESC
-    """, (user_id,))
-    tasks = cursor.fetchall()
-    
-    # Get pending todos
-    cursor.execute("""
-        SELECT id, title, description, status, created_at, completed_at
-        FROM todos WHERE user_id = ? AND status != 'completed' ORDER BY created_at DESC
-    """, (user_id,))
-    todos = cursor.fetchall()
-    
-    # Get recent emails
-    cursor.execute("""
-        SELECT id, recipient, subject, body, sent_at, email_type
-        FROM emails WHERE user_id = ? ORDER BY sent_at DESC LIMIT 5
-    """, (user_id,))
-    emails = cursor.fetchall()
-    
-    conn.close()
+@api_router.get("/system/stats")
+async def get_system_stats(user_id: int = Depends(get_current_user)):
+    return {
+        "db_pool": db.pool_stats(),
+        "config_cache": db.config_cache.stats(),
+        "auth_user_cache": user_cache.stats(),
+        "auth_token_cache": token_cache.stats(),
+        "openai_clients": openai_service.clients.stats(),
+        "llm_cache": llm_cache.stats(),
+        "smtp_sessions": email_service.sessions.stats(),
+        "health_probes": health_prober.stats(),
+        "followups": followup_scheduler.stats()
+    }
+
+# Search Route
+@api_router.get("/search", response_model=SearchPage)
+async def search_everything(
+    q: str = Query(..., min_length=1, max_length=200),
+    kinds: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user_id: int = Depends(get_current_user)
+):
+    try:
+        kind_filter = parse_kinds(kinds)
+        offset = decode_search_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    items, next_cursor = await adb.run(search, user_id, q, kind_filter, offset, limit)
+    return SearchPage(items=[SearchHit(**hit) for hit in items], next_cursor=next_cursor)
+
+# Dashboard Route
+@api_router.get("/dashboard", response_model=DashboardData, response_model_exclude_unset=True)
+async def get_dashboard(request: Request, response: Response, user_id: int = Depends(get_current_user)):
+    # One primary-key lookup decides whether the client, or our cached snapshot, is current
+    version = await adb.call(dashboard.version, user_id)
+    etag = dashboard.etag(user_id, version)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    snapshot = dashboard.cached(user_id, version)
+    if snapshot is None:
+        snapshot = await adb.call(dashboard.snapshot, user_id)
+    version, data = snapshot
+    
+    response.headers["ETag"] = dashboard.etag(user_id, version)
+    response.headers["Cache-Control"] = "private, no-cache"
     return DashboardData(
-        recent_meetings=[
-            Meeting(
-                id=m[0], title=m[1], attendees=m[2], notes=m[3], mom=m[4],
-                status=m[5], created_at=m[6], ended_at=m[7]
-            ) for m in meetings
-        ],
-        active_tasks=[
-            Task(
-                id=t[0], title=t[1], description=t[2], assignee=t[3], assignee_email=t[4],
-                priority=t[5], status=t[6], created_at=t[7], due_date=t[8], last_followup=t[9]
-            ) for t in tasks
-        ],
-        pending_todos=[
-            Todo(
-                id=t[0], title=t[1], description=t[2], status=t[3], 
-                created_at=t[4], completed_at=t[5]
-            ) for t in todos
-        ],
-        recent_emails=[
-            Email(
-                id=e[0], recipient=e[1], subject=e[2], body=e[3], 
-                sent_at=e[4], email_type=e[5]
-            ) for e in emails
-        ]
+        counts=DashboardCounts(**data["counts"]),
+        recent_meetings=[Meeting(**m) for m in data["recent_meetings"]],
+        active_tasks=[Task(**t) for t in data["active_tasks"]],
+        pending_todos=[Todo(**t) for t in data["pending_todos"]],
+        recent_emails=[Email(**e) for e in data["recent_emails"]]
     )
 
+# Prometheus scrape endpoint, outside /api. Off unless METRICS_TOKEN is set;
+# the scraper sends it as a bearer token (Prometheus' `authorization` option)
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not scrape_authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -628,6 +769,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -635,6 +779,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+    email_service.start()
+    # Loads the heap of open tasks before its thread starts
+    await adb.call(followup_scheduler.start)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    followup_scheduler.stop()
+    job_queue.stop()
+    email_service.stop()
+    health_prober.shutdown()
+    mom_summarizer.shutdown()
+    logger.info(f"Closing database connection pool: {db.pool_stats()}")
+    adb.shutdown()
+    db.close_all()
+    openai_service.clients.close_all()
+    await async_openai_service.close()
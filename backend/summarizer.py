@@ -0,0 +1,229 @@
+"""Map-reduce summarization of meeting notes that are too long for one prompt.
+
+Notes are packed line by line into chunks that fit a token budget. Each
+chunk is summarized on its own (the map step, run with bounded
+parallelism), and the partial summaries are then folded into the final
+Minutes of Meeting (the reduce step). Chunks are packed greedily in note
+order, so appending notes only changes the last chunk: every earlier chunk
+produces the same request as before and is answered from the LLM response
+cache.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Rough OpenAI tokenizer ratio for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_oversized(line: str, budget: int) -> List[str]:
+    """Split a single line that is larger than the budget on whitespace"""
+    if estimate_tokens(line) <= budget:
+        return [line]
+
+    max_chars = budget * CHARS_PER_TOKEN
+    pieces = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(line[:cut])
+        line = line[cut:].lstrip()
+    if line:
+        pieces.append(line)
+    return pieces
+
+
+def chunk_notes(notes: str, budget: int) -> List[str]:
+    """Pack note lines, in order, into chunks of at most `budget` tokens"""
+    chunks, current, used = [], [], 0
+    for line in notes.splitlines():
+        if not line.strip():
+            continue
+        for piece in split_oversized(line, budget):
+            cost = estimate_tokens(piece)
+            if current and used + cost > budget:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def build_chunk_summary_prompt(meeting_title: str, chunk: str) -> str:
+    """Build the map-step prompt for one part of a meeting's notes.
+
+    The chunk's position is deliberately left out so the prompt (and its
+    cache key) does not change as the meeting grows.
+    """
+    return f"""Summarize this part of the notes from the meeting "{meeting_title}".
+    List the key points, decisions and action items (with owners and dates where given)
+    as concise bullet points. Do not add anything that is not in the notes.
+
+    Notes:
+    {chunk}
+    """
+
+
+def build_combine_prompt(meeting_title: str, summaries: str) -> str:
+    """Build the prompt that condenses several partial summaries into one"""
+    return f"""Combine these summaries of consecutive parts of the meeting "{meeting_title}"
+    into one concise bullet-point summary. Keep every decision and action item
+    (with owners and dates); merge duplicates.
+
+    Summaries:
+    {summaries}
+    """
+
+
+def build_rolling_summary_prompt(meeting_title: str, summary: str, notes: str) -> str:
+    """Build the prompt that folds new notes into a meeting's running summary"""
+    return f"""You maintain the running summary of the ongoing meeting "{meeting_title}".
+    Update the summary with the new notes below. Keep it as concise bullet points under
+    "Key points", "Decisions" and "Action items" (with owners and dates where given),
+    merging duplicates and keeping everything still relevant from the current summary.
+
+    Current summary:
+    {summary or "(none yet)"}
+
+    New notes:
+    {notes}
+    """
+
+
+def build_conversation_summary_prompt(summary: str, transcript: str) -> str:
+    """Build the prompt that folds older chat turns into a conversation's running summary"""
+    return f"""You maintain the running summary of a conversation between a user and
+    their assistant Jarvis. Update the summary with the turns below. Keep it as concise
+    bullet points: facts the user shared, requests made, answers given and anything
+    still open. Keep everything still relevant from the current summary.
+
+    Current summary:
+    {summary or "(none yet)"}
+
+    Turns:
+    {transcript}
+    """
+
+
+class MeetingSummarizer:
+    """Produces Minutes of Meeting from notes of any length.
+
+    `complete` is a callable taking chat-completion keyword arguments and
+    returning the reply text.
+    Notes that fit in `single_pass_tokens` are sent as one request, exactly
+    as before; longer notes go through map-reduce.
+    """
+    def __init__(self, build_mom_prompt: Callable, model: str = "gpt-3.5-turbo",
+                 chunk_tokens: int = 3000, single_pass_tokens: int = 6000,
+                 summary_tokens: int = 300, mom_tokens: int = 800, rolling_tokens: int = 600,
+                 max_concurrency: int = 4):
+        self.build_mom_prompt = build_mom_prompt
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.single_pass_tokens = single_pass_tokens
+        self.summary_tokens = summary_tokens
+        self.mom_tokens = mom_tokens
+        self.rolling_tokens = rolling_tokens
+        self.max_concurrency = max_concurrency
+        # One long-lived pool shared by every summary; its threads start on first use
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="jarvis-mom")
+
+    def mom_request(self, meeting_title: str, attendees: str, notes: str) -> dict:
+        return dict(
+            model=self.model,
+            messages=[{"role": "user", "content": self.build_mom_prompt(meeting_title, attendees, notes)}],
+            max_tokens=self.mom_tokens,
+            temperature=0.3
+        )
+
+    def _summary_request(self, prompt: str) -> dict:
+        # temperature 0 keeps partial summaries deterministic, and so cacheable
+        return dict(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=self.summary_tokens,
+            temperature=0
+        )
+
+    def map_requests(self, meeting_title: str, notes: str) -> List[dict]:
+        """Requests summarizing each chunk of the notes"""
+        return [
+            self._summary_request(build_chunk_summary_prompt(meeting_title, chunk))
+            for chunk in chunk_notes(notes, self.chunk_tokens)
+        ]
+
+    def combine_requests(self, meeting_title: str, summaries: List[str]) -> List[dict]:
+        """Requests condensing groups of summaries that together exceed the budget"""
+        joined = "\n".join(summaries)
+        return [
+            self._summary_request(build_combine_prompt(meeting_title, group))
+            for group in chunk_notes(joined, self.chunk_tokens)
+        ]
+
+    def fold_request(self, meeting_title: str, summary: str, notes: str) -> dict:
+        return dict(
+            model=self.model,
+            messages=[{"role": "user", "content": build_rolling_summary_prompt(meeting_title, summary, notes)}],
+            max_tokens=self.rolling_tokens,
+            temperature=0
+        )
+
+    def fits(self, text: str) -> bool:
+        return estimate_tokens(text) <= self.single_pass_tokens
+
+    def _reduce_input(self, summaries: List[str]) -> str:
+        return "Summaries of consecutive parts of the meeting:\n" + "\n".join(summaries)
+
+    def summarize(self, complete: Callable, meeting_title: str, attendees: str, notes: str) -> str:
+        """Generate the MoM, calling a blocking `complete` from the bounded thread pool"""
+        if self.fits(notes):
+            return complete(**self.mom_request(meeting_title, attendees, notes))
+
+        requests = self.map_requests(meeting_title, notes)
+        logger.info(f"Summarizing '{meeting_title}' in {len(requests)} chunks")
+        summaries = list(self._executor.map(lambda request: complete(**request), requests))
+
+        while not self.fits(self._reduce_input(summaries)) and len(summaries) > 1:
+            requests = self.combine_requests(meeting_title, summaries)
+            summaries = list(self._executor.map(lambda request: complete(**request), requests))
+
+        return complete(**self.mom_request(meeting_title, attendees, self._reduce_input(summaries)))
+
+    def fold(self, complete: Callable, meeting_title: str, summary: str, notes: str) -> str:
+        """Fold new notes into a running summary and return the updated summary.
+
+        A backlog of notes too large for one prompt is folded chunk by chunk.
+        """
+        for chunk in chunk_notes(notes, self.chunk_tokens):
+            summary = complete(**self.fold_request(meeting_title, summary, chunk))
+        return summary
+
+    def summarize_incremental(self, complete: Callable, meeting_title: str, attendees: str,
+                              summary: str, new_notes: str) -> str:
+        """Generate the MoM from a running summary plus the notes it has not seen yet"""
+        if new_notes.strip():
+            summary = self.fold(complete, meeting_title, summary, new_notes)
+        return complete(**self.mom_request(meeting_title, attendees, "Summary of the meeting:\n" + summary))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def create_meeting_summarizer(build_mom_prompt: Callable) -> MeetingSummarizer:
+    return MeetingSummarizer(
+        build_mom_prompt,
+        chunk_tokens=int(os.environ.get("MOM_CHUNK_TOKENS", "3000")),
+        single_pass_tokens=int(os.environ.get("MOM_SINGLE_PASS_TOKENS", "6000")),
+        max_concurrency=int(os.environ.get("MOM_MAP_CONCURRENCY", "4"))
+    )
@@ -0,0 +1,32 @@
+"""Shared fixtures. The module-level db singleton is pointed at a scratch
+database before any backend module is imported, so tests never touch
+backend/jarvis.db."""
+import atexit
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="jarvis-tests-")
+atexit.register(shutil.rmtree, SCRATCH_DIR, True)
+os.environ["JARVIS_DB_PATH"] = str(Path(SCRATCH_DIR) / "jarvis.db")
+os.environ["RAG_INDEX_DIR"] = str(Path(SCRATCH_DIR) / "retrieval_index")
+
+from database import Database, db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh, fully migrated database"""
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close_all()
+
+
+@pytest.fixture
+def user_id():
+    """A new user in the shared database"""
+    return db.create_user("Test User", f"{uuid.uuid4().hex}@example.com", "secret")
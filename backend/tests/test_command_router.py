@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from command_router import CommandMatch, command_router, respond
+from database import db
+
+
+@pytest.mark.parametrize("message, command, argument", [
+    ("show tasks", "show_tasks", None),
+    ("Show all my tasks", "show_tasks", None),
+    ("jarvis, show todos please", "show_todos", None),
+    ("start meeting", "start_meeting", None),
+    ("complete task 5", "complete_task", "5"),
+    ("Please complete task 12", "complete_task", "12"),
+    ("send email to jane doe", "send_email", "jane doe"),
+    ("system check", "system_check", None),
+])
+def test_exact_commands(message, command, argument):
+    match = command_router.classify(message)
+    assert (match.command, match.argument, match.confidence) == (command, argument, 1.0)
+
+
+@pytest.mark.parametrize("message", [
+    "Please do not complete task 5 yet",
+    "don't complete task 5",
+    "complete task 5? no, never mind",
+    "never start meeting without me",
+    "start meeting not now",
+])
+def test_negations_fall_through(message):
+    assert command_router.classify(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "show tasks?",
+    "how do I complete task 5",
+    "can you show tasks",
+    "what does system check do",
+    "should I start meeting",
+])
+def test_questions_fall_through(message):
+    assert command_router.classify(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "I want to know how to complete task 5 correctly",
+    "yesterday we had to start meeting early",
+    "remind me to show tasks to the team",
+    "complete task five",
+    "show tasks for the marketing project",
+    "start meeting with the whole design team and then send the notes to everyone",
+])
+def test_embedded_phrases_fall_through(message):
+    assert command_router.classify(message) is None
+
+
+def test_typos_match_fuzzily():
+    match = command_router.classify("show taks")
+    assert match.command == "show_tasks" and match.confidence < 1.0
+    assert command_router.classify("strat meeting").command == "start_meeting"
+
+
+def test_fuzzy_complete_task_asks_for_confirmation(user_id):
+    with db.connection() as conn:
+        task_id = conn.execute(
+            "INSERT INTO tasks (user_id, title, status) VALUES (?, 'Ship it', 'pending')", (user_id,)
+        ).lastrowid
+
+    match = command_router.classify(f"complete tsak {task_id}")
+    assert match.command == "complete_task" and match.confidence < 1.0
+    reply = asyncio.run(respond(match, user_id))
+    assert "Did you mean" in reply
+    with db.connection() as conn:
+        assert conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()[0] == "pending"
+
+    reply = asyncio.run(respond(command_router.classify(f"complete task {task_id}"), user_id))
+    assert reply == f"> Task #{task_id} marked as completed."
+    with db.connection() as conn:
+        assert conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()[0] == "completed"
+
+
+def test_complete_task_is_scoped_to_the_user(user_id):
+    reply = asyncio.run(respond(CommandMatch("complete_task", None, 1.0, "999999"), user_id))
+    assert reply == "> Task #999999 not found."
+
+
+@pytest.mark.parametrize("message, command, action", [
+    ("create task: write report - d - b@x.com", "create_task", "collect_task_details"),
+    ("Could you create todo for groceries?", "create_todo", "collect_todo_details"),
+    ("I want to send email to the whole team about the offsite", "send_email", "collect_email_details"),
+    ("how do I start meeting notes", "start_meeting", "collect_meeting_details"),
+])
+def test_llm_replies_still_get_a_command_hint(message, command, action):
+    assert command_router.classify(message) is None
+    hint = command_router.hint(message)
+    assert (hint.command, hint.action) == (command, action)
+
+
+def test_hint_is_none_for_plain_conversation():
+    assert command_router.hint("What did we decide about the launch date?") is None
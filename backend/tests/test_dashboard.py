@@ -0,0 +1,70 @@
+from dashboard import DashboardReadModel
+from database import Database
+
+
+def add_task(database, user_id, title="Write report"):
+    with database.connection() as conn:
+        return conn.execute(
+            "INSERT INTO tasks (user_id, title, status) VALUES (?, ?, 'pending')", (user_id, title)
+        ).lastrowid
+
+
+def test_snapshot_reflects_writes(database):
+    dashboard = DashboardReadModel(database)
+    user_id = database.create_user("Dash", "dash@example.com", "pw")
+    version, data = dashboard.snapshot(user_id)
+    assert data["counts"]["active_tasks"] == 0
+
+    add_task(database, user_id)
+    assert dashboard.version(user_id) > version
+    assert dashboard.cached(user_id, dashboard.version(user_id)) is None
+    new_version, data = dashboard.snapshot(user_id)
+    assert new_version == dashboard.version(user_id)
+    assert data["counts"]["active_tasks"] == 1
+    assert data["active_tasks"][0]["title"] == "Write report"
+
+
+def test_writes_from_another_process_invalidate_the_etag(database, tmp_path):
+    # Two Database objects on one file stand in for two server workers
+    other = Database(str(tmp_path / "test.db"))
+    try:
+        dashboard = DashboardReadModel(database)
+        user_id = database.create_user("Dash", "dash@example.com", "pw")
+        version, _ = dashboard.snapshot(user_id)
+        etag = dashboard.etag(user_id, version)
+
+        add_task(other, user_id)
+
+        current = dashboard.version(user_id)
+        assert dashboard.etag(user_id, current) != etag
+        assert dashboard.cached(user_id, current) is None
+        assert dashboard.snapshot(user_id, current)[1]["counts"]["active_tasks"] == 1
+    finally:
+        other.close_all()
+
+
+def test_follow_up_bumps_and_unrelated_columns_do_not(database):
+    dashboard = DashboardReadModel(database)
+    user_id = database.create_user("Dash", "dash@example.com", "pw")
+    task_id = add_task(database, user_id)
+    with database.connection() as conn:
+        meeting_id = conn.execute("INSERT INTO meetings (user_id, title) VALUES (?, 'Sync')", (user_id,)).lastrowid
+    version = dashboard.version(user_id)
+
+    # Not shown on the dashboard
+    with database.connection() as conn:
+        conn.execute("UPDATE meetings SET mom = 'Minutes' WHERE id = ?", (meeting_id,))
+    assert dashboard.version(user_id) == version
+
+    with database.connection() as conn:
+        conn.execute("UPDATE tasks SET last_followup = CURRENT_TIMESTAMP WHERE id = ?", (task_id,))
+    assert dashboard.version(user_id) == version + 1
+
+
+def test_versions_are_per_user(database):
+    dashboard = DashboardReadModel(database)
+    alice = database.create_user("Alice", "alice@example.com", "pw")
+    bob = database.create_user("Bob", "bob@example.com", "pw")
+    add_task(database, alice)
+    assert dashboard.version(alice) == 1
+    assert dashboard.version(bob) == 0
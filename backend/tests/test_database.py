@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database import Database
+
+
+def test_short_lived_threads_reuse_pooled_connections(database):
+    def query():
+        with database.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    for _ in range(50):
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    stats = database.pool_stats()
+    assert stats["open_connections"] <= 4
+    assert stats["in_use"] == 0
+    assert stats["hits"] + stats["misses"] == 201  # 200 queries + migration
+    assert stats["hit_rate"] > 0.9
+
+
+def test_nested_blocks_share_one_connection_and_transaction(database):
+    with database.connection() as outer:
+        outer.execute("INSERT INTO users (name, email, password_hash) VALUES ('A', 'a@example.com', 'x')")
+        with database.connection() as inner:
+            assert inner is outer
+        assert database.pool_stats()["in_use"] == 1
+    assert database.pool_stats()["in_use"] == 0
+
+    with pytest.raises(RuntimeError):
+        with database.connection() as conn:
+            conn.execute("INSERT INTO users (name, email, password_hash) VALUES ('B', 'b@example.com', 'x')")
+            raise RuntimeError("boom")
+    with database.connection() as conn:
+        emails = [row[0] for row in conn.execute("SELECT email FROM users ORDER BY email")]
+    assert emails == ["a@example.com"]
+
+
+def test_pool_never_opens_more_than_pool_size(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "0.1")
+    database = Database(str(tmp_path / "small.db"))
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with database.connection():
+            held.set()
+            release.wait(5)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in holders:
+        held.clear()
+        thread.start()
+        held.wait(5)
+
+    errors = []
+
+    def borrow():
+        try:
+            with database.connection():
+                pass
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    borrower = threading.Thread(target=borrow)
+    borrower.start()
+    borrower.join()
+    assert len(errors) == 1 and "pool size 2" in str(errors[0])
+    assert database.pool_stats()["waits"] == 1
+
+    release.set()
+    for thread in holders:
+        thread.join()
+    stats = database.pool_stats()
+    assert stats["open_connections"] == 2
+    assert stats["in_use"] == 0
+    database.close_all()
+
+
+def test_waiting_thread_gets_the_returned_connection(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "1")
+    database = Database(str(tmp_path / "single.db"))
+    held = threading.Event()
+    release = threading.Event()
+    borrowed = []
+
+    def hold():
+        with database.connection() as conn:
+            borrowed.append(conn)
+            held.set()
+            release.wait(5)
+
+    def borrow():
+        with database.connection() as conn:
+            borrowed.append(conn)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait(5)
+    borrower = threading.Thread(target=borrow)
+    borrower.start()
+    release.set()
+    holder.join()
+    borrower.join()
+
+    assert borrowed[0] is borrowed[1]
+    assert database.pool_stats()["open_connections"] == 1
+    database.close_all()
+
+
+def test_close_all_leaves_checked_out_connections_usable(database):
+    held = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def hold():
+        with database.connection() as conn:
+            held.set()
+            release.wait(5)
+            results.append(conn.execute("SELECT 1").fetchone()[0])
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait(5)
+    database.close_all()
+    release.set()
+    holder.join()
+
+    assert results == [1]
+    stats = database.pool_stats()
+    assert stats["open_connections"] == 0
+    assert stats["idle_connections"] == 0
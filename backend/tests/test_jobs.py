@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue(database):
+    return JobQueue(database, workers=0, poll_interval=0.01)
+
+
+def set_ready(database, job_id):
+    with database.connection() as conn:
+        conn.execute("UPDATE jobs SET run_after = 0 WHERE id = ?", (job_id,))
+
+
+def test_claim_runs_handler_and_stores_result(queue):
+    queue.register("echo", lambda job: {"echo": job["payload"]["value"]})
+    job_id = queue.enqueue(1, "echo", {"value": 42})
+
+    assert queue.run_once() is True
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 1
+    assert job["result"] == {"echo": 42}
+    assert queue.run_once() is False
+
+
+def test_failed_job_is_retried_then_fails(queue, database):
+    calls = []
+
+    def flaky(job):
+        calls.append(job["attempts"])
+        raise RuntimeError("boom")
+
+    queue.register("flaky", flaky)
+    job_id = queue.enqueue(1, "flaky", {}, max_attempts=2)
+
+    assert queue.run_once()
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 1, "boom")
+    # Backed off into the future, so not claimable yet
+    assert queue.run_once() is False
+
+    set_ready(database, job_id)
+    finished = []
+    queue.subscribe(job_id, finished.append)
+    assert queue.run_once()
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert calls == [1, 2]
+    assert finished[0]["status"] == "failed"
+
+
+def test_retry_succeeds_after_failure(queue, database):
+    attempts = []
+
+    def second_time_lucky(job):
+        attempts.append(job["attempts"])
+        if job["attempts"] == 1:
+            raise RuntimeError("transient")
+        return "ok"
+
+    queue.register("retry", second_time_lucky)
+    job_id = queue.enqueue(1, "retry", {})
+    queue.run_once()
+    set_ready(database, job_id)
+    queue.run_once()
+
+    job = queue.get(job_id)
+    assert (job["status"], job["result"], job["error"]) == ("succeeded", "ok", None)
+
+
+def test_unregistered_kinds_are_left_queued(queue, database):
+    job_id = queue.enqueue(1, "not_deployed_yet", {}, max_attempts=1)
+
+    for _ in range(3):
+        assert queue.run_once() is False
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("queued", 0)
+
+    # A worker that knows the kind still gets every attempt
+    queue.register("not_deployed_yet", lambda job: "done")
+    assert queue.run_once()
+    assert queue.get(job_id)["status"] == "succeeded"
+
+
+def test_unknown_kind_does_not_block_known_ones(queue):
+    queue.enqueue(1, "unknown", {})
+    job_id = queue.enqueue(1, "known", {})
+    queue.register("known", lambda job: None)
+
+    assert queue.run_once()
+    assert queue.get(job_id)["status"] == "succeeded"
+
+
+def test_dedupe_key_returns_queued_job(queue):
+    first = queue.enqueue(1, "echo", {}, delay=60, dedupe_key="echo:1")
+    second = queue.enqueue(1, "echo", {}, delay=60, dedupe_key="echo:1")
+    assert first == second
+
+
+def test_requeue_stale_running_jobs(queue, database):
+    queue.register("echo", lambda job: None)
+    job_id = queue.enqueue(1, "echo", {})
+    assert queue._claim()["id"] == job_id
+    with database.connection() as conn:
+        conn.execute("UPDATE jobs SET locked_at = ? WHERE id = ?", (time.time() - queue.stale_after - 1, job_id))
+
+    assert queue.requeue_stale() == 1
+    assert queue.get(job_id)["status"] == "queued"
+
+
+def test_get_is_scoped_to_owner(queue):
+    job_id = queue.enqueue(7, "echo", {}, delay=60)
+    assert queue.get(job_id, user_id=8) is None
+    assert queue.get(job_id, user_id=7)["user_id"] == 7
+
+
+def test_housekeeping_runs_once_per_interval(database):
+    queue = JobQueue(database, workers=0, housekeeping_interval=60.0)
+    runs = []
+    queue.add_housekeeping("things", lambda: runs.append(1) or 3)
+
+    queue.housekeep(force=True)
+    queue.housekeep()
+    assert len(runs) == 1
+
+    queue._next_housekeeping = time.monotonic() - 1
+    queue.housekeep()
+    assert len(runs) == 2
+
+
+def test_failing_housekeeping_task_does_not_stop_the_others(database):
+    queue = JobQueue(database, workers=0)
+    runs = []
+    queue.add_housekeeping("broken", lambda: 1 / 0)
+    queue.add_housekeeping("things", lambda: runs.append(1) or 0)
+    queue.housekeep(force=True)
+    assert runs == [1]
@@ -0,0 +1,39 @@
+import time
+
+from openai_service import LLMResponseCache
+
+
+def cache_keys(database):
+    with database.connection() as conn:
+        return {row[0] for row in conn.execute("SELECT cache_key FROM llm_cache")}
+
+
+def test_purge_removes_expired_rows(database):
+    cache = LLMResponseCache(database)
+    cache.set("fresh", "gpt-4", "still good")
+    cache.set("stale", "gpt-4", "too old")
+    with database.connection() as conn:
+        conn.execute("UPDATE llm_cache SET expires_at = ? WHERE cache_key = 'stale'", (time.time() - 1,))
+
+    assert cache.purge_expired() == 1
+    assert cache_keys(database) == {"fresh"}
+    assert cache.purge_expired() == 0
+
+
+def test_purge_caps_the_table_at_max_rows(database):
+    cache = LLMResponseCache(database, max_rows=3)
+    for i in range(5):
+        cache.set(f"key{i}", "gpt-4", f"response {i}")
+        with database.connection() as conn:
+            # Later rows expire later
+            conn.execute("UPDATE llm_cache SET expires_at = ? WHERE cache_key = ?", (time.time() + 100 + i, f"key{i}"))
+
+    assert cache.purge_expired() == 2
+    assert cache_keys(database) == {"key2", "key3", "key4"}
+
+
+def test_purge_is_registered_with_job_queue_housekeeping():
+    from jobs import job_queue
+    from openai_service import llm_cache
+
+    assert ("expired LLM cache row(s)", llm_cache.purge_expired) in job_queue._housekeeping
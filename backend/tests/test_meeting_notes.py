@@ -0,0 +1,78 @@
+import threading
+
+from pagination import MEETINGS, fetch_page
+
+
+def start_meeting(database, user_id, title="Sync"):
+    with database.connection() as conn:
+        return conn.execute(
+            "INSERT INTO meetings (user_id, title) VALUES (?, ?)", (user_id, title)
+        ).lastrowid
+
+
+def test_notes_are_appended_in_sequence(database):
+    user_id = database.create_user("Notes", "notes@example.com", "pw")
+    meeting_id = start_meeting(database, user_id)
+
+    assert [database.add_meeting_note(user_id, meeting_id, note) for note in ("one", "two", "three")] == [1, 2, 3]
+    assert database.get_meeting_notes(meeting_id) == "one\ntwo\nthree"
+    assert database.get_meeting_notes(meeting_id, after_seq=2) == "three"
+    assert [row[:2] for row in database.get_meeting_notes_batch(meeting_id, 1, limit=1)] == [(2, "two")]
+
+
+def test_notes_are_never_rewritten(database):
+    user_id = database.create_user("Notes", "notes@example.com", "pw")
+    meeting_id = start_meeting(database, user_id)
+    database.add_meeting_note(user_id, meeting_id, "first")
+    with database.connection() as conn:
+        first_id = conn.execute("SELECT id FROM meeting_notes WHERE meeting_id = ?", (meeting_id,)).fetchone()[0]
+
+    database.add_meeting_note(user_id, meeting_id, "second")
+    with database.connection() as conn:
+        assert conn.execute("SELECT note FROM meeting_notes WHERE id = ?", (first_id,)).fetchone()[0] == "first"
+        assert conn.execute("SELECT notes FROM meetings WHERE id = ?", (meeting_id,)).fetchone()[0] is None
+
+
+def test_notes_only_go_to_the_owners_meeting(database):
+    owner = database.create_user("Owner", "owner@example.com", "pw")
+    other = database.create_user("Other", "other@example.com", "pw")
+    meeting_id = start_meeting(database, owner)
+
+    assert database.add_meeting_note(other, meeting_id, "sneaky") is None
+    assert database.add_meeting_note(owner, meeting_id + 1, "missing") is None
+    assert database.get_meeting_notes(meeting_id) == ""
+
+
+def test_concurrent_writers_get_distinct_seqs(database):
+    user_id = database.create_user("Notes", "notes@example.com", "pw")
+    meeting_id = start_meeting(database, user_id)
+    seqs, errors = [], []
+
+    def writer(n):
+        try:
+            for i in range(20):
+                seqs.append(database.add_meeting_note(user_id, meeting_id, f"writer {n} note {i}"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(seqs) == list(range(1, 81))
+    assert len(database.get_meeting_notes(meeting_id).split("\n")) == 80
+
+
+def test_listing_assembles_notes_on_demand(database):
+    user_id = database.create_user("Notes", "notes@example.com", "pw")
+    meeting_id = start_meeting(database, user_id)
+    database.add_meeting_note(user_id, meeting_id, "first")
+    database.add_meeting_note(user_id, meeting_id, "second")
+
+    with database.connection() as conn:
+        (meeting,), _ = fetch_page(conn, MEETINGS, user_id, MEETINGS.columns("notes"), None, 10)
+    assert meeting["notes"] == "first\nsecond"
+    assert "mom" not in meeting
@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+
+from metrics import (
+    HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_SECONDS, InstrumentedConnection, MetricsMiddleware,
+    current_request, render_metrics, scrape_authorized
+)
+
+
+class Route:
+    path = "/api/items/{item_id}"
+
+
+def run_app(middleware, path="/api/items/1"):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": path}, receive, send))
+    return sent
+
+
+def make_app(queries=0, route=Route):
+    async def app(scope, receive, send):
+        if route:
+            scope["route"] = route
+        conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+        for _ in range(queries):
+            conn.execute("SELECT 1").fetchone()
+        conn.close()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return app
+
+
+def series_count(histogram, labels):
+    return histogram._series.get(labels, [None, 0.0, 0])[2]
+
+
+def test_scrape_requires_the_configured_token():
+    assert scrape_authorized("Bearer s3cret", token="s3cret")
+    assert not scrape_authorized("Bearer wrong", token="s3cret")
+    assert not scrape_authorized(None, token="s3cret")
+    assert not scrape_authorized("Bearer ünicode", token="s3cret")
+    # No token configured: never served
+    assert not scrape_authorized("Bearer ", token="")
+
+
+def test_requests_are_labelled_by_route_template():
+    before = series_count(HTTP_REQUEST_SECONDS, ("GET", Route.path, "200"))
+    run_app(MetricsMiddleware(make_app(queries=3)))
+    run_app(MetricsMiddleware(make_app(queries=3)), path="/api/items/2")
+    assert series_count(HTTP_REQUEST_SECONDS, ("GET", Route.path, "200")) == before + 2
+    assert HTTP_REQUEST_DB_QUERIES._series[(Route.path,)][1] >= 6
+    assert 'route="/api/items/{item_id}"' in render_metrics()
+
+
+def test_unmatched_paths_share_one_label():
+    before = series_count(HTTP_REQUEST_SECONDS, ("GET", "unmatched", "200"))
+    run_app(MetricsMiddleware(make_app(route=None)), path="/random/123")
+    run_app(MetricsMiddleware(make_app(route=None)), path="/random/456")
+    assert series_count(HTTP_REQUEST_SECONDS, ("GET", "unmatched", "200")) == before + 2
+
+
+def test_server_timing_header_counts_queries():
+    sent = run_app(MetricsMiddleware(make_app(queries=2), server_timing=True))
+    headers = dict(sent[0]["headers"])
+    assert b'desc="2 queries"' in headers[b"server-timing"]
+
+    sent = run_app(MetricsMiddleware(make_app(queries=2)))
+    assert sent[0]["headers"] == []
+
+
+def test_queries_outside_a_request_are_not_attributed():
+    assert current_request.get() is None
+    conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    assert conn.execute("SELECT 41 + 1").fetchone() == (42,)
+    conn.close()
@@ -0,0 +1,126 @@
+import sqlite3
+
+import pytest
+
+import migrations
+from migrations import LATEST_VERSION, current_version, migrate
+from search import search
+
+# The schema created by init_database before versioned migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL, security_question TEXT, security_answer TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE meetings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, title TEXT, attendees TEXT,
+    notes TEXT, mom TEXT, status TEXT DEFAULT 'active', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ended_at TIMESTAMP, FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, title TEXT NOT NULL, description TEXT,
+    assignee TEXT, assignee_email TEXT, priority TEXT DEFAULT 'medium', status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, due_date TIMESTAMP, last_followup TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, title TEXT NOT NULL, description TEXT,
+    status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, completed_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE emails (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, recipient TEXT NOT NULL,
+    subject TEXT NOT NULL, body TEXT NOT NULL, sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    email_type TEXT DEFAULT 'general', related_id INTEGER, FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE system_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, openai_key TEXT, smtp_host TEXT,
+    smtp_port INTEGER, smtp_user TEXT, smtp_pass TEXT, user_email TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+INSERT INTO users (name, email, password_hash) VALUES ('Ada', 'ada@example.com', 'x');
+INSERT INTO system_config (user_id, user_email) VALUES (1, 'ada@example.com');
+INSERT INTO meetings (user_id, title, notes, mom, status)
+VALUES (1, 'Kickoff', char(10) || 'Agreed on the roadmap' || char(10) || 'Ada owns hiring', 'Roadmap agreed', 'completed');
+INSERT INTO meetings (user_id, title, notes) VALUES (1, 'Empty', NULL);
+INSERT INTO tasks (user_id, title, description, assignee_email, due_date)
+VALUES (1, 'Draft the hiring plan', 'For the kickoff follow-up', 'ada@example.com', '2026-01-01 09:00:00');
+INSERT INTO todos (user_id, title) VALUES (1, 'Book a room');
+INSERT INTO emails (user_id, recipient, subject, body) VALUES (1, 'bob@example.com', 'Roadmap', 'See attached');
+"""
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    conn = sqlite3.connect(tmp_path / "baseline.db")
+    conn.executescript(BASELINE_SCHEMA)
+    yield conn
+    conn.close()
+
+
+def schema(conn):
+    return sorted(conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' AND name NOT LIKE 'search_index_%'"
+    ).fetchall())
+
+
+def test_baseline_database_migrates_to_latest(baseline):
+    assert current_version(baseline) == 0
+    assert migrate(baseline) == LATEST_VERSION
+    assert current_version(baseline) == LATEST_VERSION
+
+    # 4: notes moved to append-only rows, without the leading newline
+    assert baseline.execute("SELECT meeting_id, seq, note FROM meeting_notes").fetchall() == [
+        (1, 1, "Agreed on the roadmap\nAda owns hiring")
+    ]
+    assert baseline.execute("SELECT COUNT(*) FROM meetings WHERE notes IS NOT NULL").fetchone()[0] == 0
+    # 5, 7: new columns with their defaults
+    assert baseline.execute("SELECT llm_cache_enabled FROM system_config").fetchone()[0] == 1
+    assert baseline.execute("SELECT summary_seq FROM meetings WHERE id = 1").fetchone()[0] == 0
+    # 9, 11: existing rows are backfilled into the search and retrieval tables
+    kinds = {hit["kind"] for hit in search(baseline, 1, "roadmap", None, 0, 10)[0]}
+    assert kinds == {"meeting", "note", "email"}
+    assert baseline.execute("SELECT COUNT(*) FROM retrieval_chunks WHERE user_id = 1").fetchone()[0] == 5
+
+
+def test_migrated_baseline_matches_a_fresh_database(baseline, tmp_path):
+    migrate(baseline)
+    fresh = sqlite3.connect(tmp_path / "fresh.db")
+    try:
+        migrate(fresh)
+        assert schema(fresh) == schema(baseline)
+    finally:
+        fresh.close()
+
+
+def test_current_database_is_left_alone(baseline):
+    migrate(baseline)
+    before = schema(baseline)
+    assert migrate(baseline) == LATEST_VERSION
+    assert schema(baseline) == before
+
+
+def test_triggers_keep_derived_tables_current(baseline):
+    migrate(baseline)
+    baseline.execute("INSERT INTO tasks (user_id, title) VALUES (1, 'Review the budget')")
+    baseline.commit()
+
+    assert [hit["kind"] for hit in search(baseline, 1, "budget", None, 0, 10)[0]] == ["task"]
+    assert baseline.execute("SELECT version FROM dashboard_versions WHERE user_id = 1").fetchone()[0] == 1
+
+
+def test_failed_migration_rolls_back(baseline, monkeypatch):
+    broken = (LATEST_VERSION + 1, "broken", [
+        "CREATE TABLE half_done (id INTEGER)",
+        "INSERT INTO no_such_table VALUES (1)",
+    ])
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [broken])
+    monkeypatch.setattr(migrations, "LATEST_VERSION", LATEST_VERSION + 1)
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(baseline)
+    # Every earlier migration committed on its own; the broken one left nothing behind
+    assert current_version(baseline) == LATEST_VERSION
+    assert baseline.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'").fetchone()[0] == 0
@@ -0,0 +1,176 @@
+import smtplib
+
+import pytest
+
+import email_service as email_module
+from email_service import EmailService
+
+SMTP_CONFIG = {"smtp_host": "smtp.example.com", "smtp_port": 587, "smtp_user": "me@example.com", "smtp_pass": "pw"}
+
+
+class FakeSMTP:
+    """Records sent mail; `failures` maps a recipient to the exception its send raises"""
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.sent = []
+        self.resets = 0
+
+    def sendmail(self, sender, recipient, message):
+        error = self.failures.get(recipient)
+        if error:
+            raise error
+        self.sent.append(recipient)
+
+    def rset(self):
+        self.resets += 1
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = FakeSMTP()
+    monkeypatch.setattr(email_module, "connect_smtp", lambda config, timeout: server)
+    return server
+
+
+@pytest.fixture
+def service(database):
+    user_id = database.create_user("Sender", "sender@example.com", "pw")
+    database.update_user_config(user_id, SMTP_CONFIG)
+    service = EmailService(database, max_attempts=2)
+    service.user_id = user_id
+    return service
+
+
+def status(service, outbox_id):
+    return service.get_outbox_entry(outbox_id, service.user_id)
+
+
+def make_ready(service):
+    with service.db.connection() as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE status = 'queued'")
+
+
+def test_queue_requires_smtp(database):
+    user_id = database.create_user("No SMTP", "nosmtp@example.com", "pw")
+    with pytest.raises(ValueError):
+        EmailService(database).queue_email(user_id, "a@example.com", "Hi", "Body")
+
+
+def test_queued_message_is_sent_and_logged(service, smtp):
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body", "task_assignment", 7)
+    assert status(service, outbox_id)["status"] == "queued"
+
+    assert service.run_once() == 1
+    entry = status(service, outbox_id)
+    assert (entry["status"], entry["attempts"], entry["error"]) == ("sent", 1, None)
+    assert smtp.sent == ["a@example.com"]
+    with service.db.connection() as conn:
+        row = conn.execute(
+            "SELECT recipient, email_type, related_id FROM emails WHERE id = ?", (entry["email_id"],)
+        ).fetchone()
+    assert tuple(row) == ("a@example.com", "task_assignment", 7)
+    assert service.run_once() == 0
+
+
+def test_transient_failure_retries_then_fails(service, smtp):
+    smtp.failures["a@example.com"] = smtplib.SMTPDataError(451, b"try later")
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+
+    service.run_once()
+    entry = status(service, outbox_id)
+    assert (entry["status"], entry["attempts"]) == ("queued", 1)
+    assert service.run_once() == 0  # backing off
+
+    make_ready(service)
+    service.run_once()
+    entry = status(service, outbox_id)
+    assert (entry["status"], entry["attempts"]) == ("failed", 2)
+
+
+def test_permanent_rejection_fails_immediately(service, smtp):
+    smtp.failures["bad@example.com"] = smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"no such user")})
+    bad = service.queue_email(service.user_id, "bad@example.com", "Hi", "Body")
+    good = service.queue_email(service.user_id, "good@example.com", "Hi", "Body")
+
+    assert service.run_once() == 2
+    assert status(service, bad)["status"] == "failed"
+    assert status(service, good)["status"] == "sent"
+
+
+def test_unexpected_error_does_not_strand_the_batch(service, smtp):
+    smtp.failures["a@example.com"] = UnicodeEncodeError("ascii", "é", 0, 1, "ordinal not in range")
+    broken = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+    other = service.queue_email(service.user_id, "b@example.com", "Hi", "Body")
+
+    assert service.run_once() == 2
+    entry = status(service, broken)
+    assert entry["status"] == "queued" and "UnicodeEncodeError" in entry["error"]
+    assert status(service, other)["status"] == "sent"
+    assert smtp.resets == 1
+
+
+def test_failure_outside_a_message_releases_the_batch(service, smtp, monkeypatch):
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+
+    def broken_config(user_id):
+        raise RuntimeError("config store down")
+
+    monkeypatch.setattr(service.db, "get_user_config", broken_config)
+    with pytest.raises(RuntimeError):
+        service.run_once()
+    assert status(service, outbox_id)["status"] == "queued"
+
+
+def test_released_batch_keeps_its_attempts(service, smtp, monkeypatch):
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+    real_config = service.db.get_user_config
+
+    def broken_config(user_id):
+        raise RuntimeError("config store down")
+
+    # More interruptions than max_attempts (2) must not fail an unsent message
+    monkeypatch.setattr(service.db, "get_user_config", broken_config)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            service.run_once()
+    assert (status(service, outbox_id)["status"], status(service, outbox_id)["attempts"]) == ("queued", 0)
+
+    monkeypatch.setattr(service.db, "get_user_config", real_config)
+    service.run_once()
+    assert (status(service, outbox_id)["status"], status(service, outbox_id)["attempts"]) == ("sent", 1)
+    assert smtp.sent == ["a@example.com"]
+
+
+def test_sent_but_unrecorded_is_not_resent(service, smtp, monkeypatch):
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+
+    def broken_record(row):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(service, "_record_sent", broken_record)
+    service.run_once()
+    assert status(service, outbox_id)["status"] == "failed"
+    assert smtp.sent == ["a@example.com"]
+
+
+def test_requeue_stale(service, smtp):
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+    with service.db.connection() as conn:
+        conn.execute("UPDATE outbox SET status = 'sending', locked_at = 0 WHERE id = ?", (outbox_id,))
+
+    assert service.requeue_stale() == 1
+    assert status(service, outbox_id)["status"] == "queued"
+
+
+def test_outbox_entries_are_scoped_to_owner(service):
+    outbox_id = service.queue_email(service.user_id, "a@example.com", "Hi", "Body")
+    assert service.get_outbox_entry(outbox_id, service.user_id + 1) is None
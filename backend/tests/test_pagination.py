@@ -0,0 +1,84 @@
+import pytest
+
+from pagination import TASKS, decode_cursor, encode_cursor, fetch_page
+
+
+def add_tasks(database, user_id, count, created_at="2026-01-01 10:00:00"):
+    # Many rows share a timestamp, as happens with bulk inserts; id breaks the tie
+    with database.connection() as conn:
+        conn.executemany(
+            "INSERT INTO tasks (user_id, title, created_at) VALUES (?, ?, ?)",
+            [(user_id, f"Task {i}", created_at) for i in range(count)]
+        )
+
+
+def all_pages(database, user_id, limit):
+    columns = TASKS.columns()
+    pages, cursor = [], None
+    while True:
+        with database.connection() as conn:
+            items, cursor = fetch_page(conn, TASKS, user_id, columns, decode_cursor(cursor), limit)
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026-01-01 10:00:00", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-01-01 10:00:00", 42)
+    assert decode_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor("x", 1)[:-2], "WzEsMl0"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_row_once_newest_first(database):
+    user_id = database.create_user("Pager", "pager@example.com", "pw")
+    add_tasks(database, user_id, 7, "2026-01-01 09:00:00")
+    add_tasks(database, user_id, 10, "2026-01-02 09:00:00")
+
+    pages = all_pages(database, user_id, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 5, 2]
+    rows = [item for page in pages for item in page]
+    keys = [(item["created_at"], item["id"]) for item in rows]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == 17
+
+
+def test_page_boundaries_are_stable_under_inserts(database):
+    user_id = database.create_user("Pager", "pager@example.com", "pw")
+    add_tasks(database, user_id, 10)
+
+    with database.connection() as conn:
+        first, cursor = fetch_page(conn, TASKS, user_id, TASKS.columns(), None, 4)
+    # Newer rows arriving between requests must not shift later pages
+    add_tasks(database, user_id, 3, "2026-02-01 10:00:00")
+    with database.connection() as conn:
+        second, _ = fetch_page(conn, TASKS, user_id, TASKS.columns(), decode_cursor(cursor), 4)
+
+    assert second[0]["id"] == first[-1]["id"] - 1
+    assert {item["id"] for item in first}.isdisjoint(item["id"] for item in second)
+
+
+def test_last_full_page_has_no_cursor(database):
+    user_id = database.create_user("Pager", "pager@example.com", "pw")
+    add_tasks(database, user_id, 4)
+    assert [len(page) for page in all_pages(database, user_id, limit=4)] == [4]
+
+
+def test_pages_are_scoped_to_the_user(database):
+    alice = database.create_user("Alice", "alice@example.com", "pw")
+    bob = database.create_user("Bob", "bob@example.com", "pw")
+    add_tasks(database, alice, 3)
+    assert all_pages(database, bob, limit=10) == [[]]
+
+
+def test_field_projection():
+    assert TASKS.columns("description") == list(TASKS.required) + ["description"]
+    assert "description" not in TASKS.columns("")[:len(TASKS.required)]
+    with pytest.raises(ValueError):
+        TASKS.columns("password_hash")
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from database import db
+from retrieval import REFRESH_JOB, RetrievalIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    return RetrievalIndex(db, str(tmp_path / "index"), dim=256, request_refresh_limit=10, job_batch=25)
+
+
+def add_tasks(user_id, titles):
+    with db.connection() as conn:
+        conn.executemany(
+            "INSERT INTO tasks (user_id, title, description, status) VALUES (?, ?, '', 'pending')",
+            [(user_id, title) for title in titles]
+        )
+
+
+def dirty_count(user_id):
+    with db.connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM retrieval_chunks WHERE user_id = ? AND dirty > 0", (user_id,)
+        ).fetchone()[0]
+
+
+def queued_refresh_jobs(user_id):
+    with db.connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND kind = ? AND status = 'queued'", (user_id, REFRESH_JOB)
+        ).fetchone()[0]
+
+
+def test_finds_the_users_own_chunks(index, user_id):
+    add_tasks(user_id, ["Renew the office lease", "Order printer toner", "Plan the quarterly budget review"])
+    hits = index.search(user_id, "when is the budget review?")
+    assert hits and hits[0]["kind"] == "task"
+    assert "budget review" in hits[0]["text"]
+
+
+def test_search_is_scoped_to_the_user(index, user_id):
+    other = db.create_user("Other", "other-retrieval@example.com", "pw")
+    add_tasks(other, ["Plan the quarterly budget review"])
+    assert index.search(user_id, "budget review") == []
+
+
+def test_large_backlog_is_left_to_the_job_queue(index, user_id):
+    add_tasks(user_id, [f"Imported task number {i} about invoices" for i in range(60)])
+
+    index.search(user_id, "invoices")
+    # Only request_refresh_limit chunks were embedded inline
+    assert dirty_count(user_id) == 50
+    assert queued_refresh_jobs(user_id) == 1
+    index.search(user_id, "invoices")
+    assert queued_refresh_jobs(user_id) == 1
+
+    assert index.refresh_job({"user_id": user_id, "payload": {}}) == {"refreshed": 40}
+    assert dirty_count(user_id) == 0
+    assert len(index.search(user_id, "invoices", k=4)) == 4
+
+
+def test_small_changes_are_embedded_inline(index, user_id):
+    add_tasks(user_id, ["Call the plumber"])
+    assert index.search(user_id, "plumber")
+    assert dirty_count(user_id) == 0
+    assert queued_refresh_jobs(user_id) == 0
+
+
+def slots(user_id):
+    with db.connection() as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT slot FROM retrieval_chunks WHERE user_id = ? AND slot IS NOT NULL", (user_id,)
+        )]
+
+
+def test_two_indexes_sharing_a_directory_never_reuse_a_slot(tmp_path, user_id):
+    # Two server processes share the database and RAG_INDEX_DIR
+    first, second = (RetrievalIndex(db, str(tmp_path / "shared"), dim=256) for _ in range(2))
+    add_tasks(user_id, ["Draft the hiring plan for the design team"])
+    assert first.search(user_id, "hiring plan")
+    add_tasks(user_id, ["Renegotiate the vendor contract"])
+    assert second.search(user_id, "vendor contract")
+    add_tasks(user_id, ["Book the offsite venue"])
+    assert first.search(user_id, "offsite venue")
+
+    assert sorted(slots(user_id)) == [0, 1, 2]
+    for index in (first, second):
+        assert "hiring plan" in index.search(user_id, "hiring")[0]["text"]
+        assert "vendor contract" in index.search(user_id, "vendor")[0]["text"]
+        assert "offsite venue" in index.search(user_id, "venue")[0]["text"]
+
+
+def test_concurrent_refreshes_from_two_indexes(tmp_path, user_id):
+    indexes = [RetrievalIndex(db, str(tmp_path / "shared"), dim=256) for _ in range(2)]
+
+    def writer(number):
+        for i in range(20):
+            add_tasks(user_id, [f"Writer{number} item{i} quarterly report"])
+            indexes[number].refresh(user_id)
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    taken = slots(user_id)
+    assert len(taken) == len(set(taken)) == 40
+    vectors = indexes[0]._vectors(user_id)
+    with vectors.locked():
+        # Every embedded chunk was counted once in the shared document counts
+        assert vectors.df[-1] == 40
+    assert indexes[1].search(user_id, "writer0 item7")[0]["text"].startswith("Writer0 item7 quarterly report")
@@ -0,0 +1,59 @@
+import threading
+
+from summarizer import MeetingSummarizer, chunk_notes, estimate_tokens
+
+
+def build_mom_prompt(title, attendees, notes):
+    return f"MoM for {title} ({attendees}):\n{notes}"
+
+
+def make_summarizer():
+    return MeetingSummarizer(build_mom_prompt, chunk_tokens=50, single_pass_tokens=120, max_concurrency=3)
+
+
+def long_notes(lines=200):
+    return "\n".join(f"Note {i}: discussed item {i} at some length" for i in range(lines))
+
+
+def test_chunks_fit_budget_and_keep_every_line():
+    notes = long_notes()
+    chunks = chunk_notes(notes, 50)
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == notes.split("\n")
+
+
+def test_appending_notes_only_changes_the_last_chunk():
+    notes = long_notes()
+    before = chunk_notes(notes, 50)
+    after = chunk_notes(notes + "\nNote 200: one more", 50)
+    assert after[:len(before) - 1] == before[:-1]
+
+
+def test_short_notes_are_a_single_request():
+    calls = []
+    summarizer = make_summarizer()
+    summarizer.summarize(lambda **request: calls.append(request) or "mom", "Standup", "A, B", "short notes")
+    assert len(calls) == 1
+
+
+def test_map_reduce_reuses_one_pool_and_db_connections(database):
+    summarizer = make_summarizer()
+    threads = set()
+
+    def complete(**request):
+        threads.add(threading.current_thread())
+        # Like the response cache lookup every real completion does
+        with database.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+        return "summary"
+
+    for _ in range(5):
+        assert summarizer.summarize(complete, "Planning", "A, B", long_notes()) == "summary"
+    summarizer.shutdown()
+
+    # The same worker threads served the map steps of all five summaries
+    workers = [thread for thread in threads if thread.name.startswith("jarvis-mom")]
+    assert 0 < len(workers) <= 3
+    # Migrations used one connection; the map workers share at most one each
+    assert database.pool_stats()["open_connections"] <= 1 + 3
+    assert database.pool_stats()["in_use"] == 0
@@ -7,6 +7,7 @@ const Chat = ({ user, onLogout }) => {
   const [inputMessage, setInputMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [currentMeeting, setCurrentMeeting] = useState(null);
+  const [conversationId, setConversationId] = useState(null);
   const [systemLogs, setSystemLogs] = useState([]);
   const [systemReady, setSystemReady] = useState(false);
   const messagesEndRef = useRef(null);
@@ -88,10 +89,13 @@ const Chat = ({ user, onLogout }) => {
           addSystemLog('AI request blocked - API not configured');
         } else {
           // Send to AI for processing
+          // Earlier turns are kept server-side, so only the new message is sent
           const response = await axios.post('/chat', {
             message: userMessage,
-            context: currentMeeting ? `Current meeting: ${currentMeeting.id}` : ''
+            context: currentMeeting ? `Current meeting: ${currentMeeting.id}` : '',
+            conversation_id: conversationId
           });
+          setConversationId(response.data.conversation_id);
 
           addMessage('jarvis', response.data.response);
           addSystemLog(`AI response generated`);
@@ -131,6 +135,22 @@ const Chat = ({ user, onLogout }) => {
     }
   };
 
+  const pollMeetingMinutes = async (meetingId, timeoutMs = 120000) => {
+    const deadline = Date.now() + timeoutMs;
+    let delay = 1000;
+    let result = { status: 'queued' };
+    while (Date.now() < deadline) {
+      await new Promise(resolve => setTimeout(resolve, delay));
+      const response = await axios.get(`/meetings/${meetingId}/mom`);
+      result = response.data;
+      if (result.status === 'succeeded' || result.status === 'failed') {
+        break;
+      }
+      delay = Math.min(delay * 1.5, 5000);
+    }
+    return result;
+  };
+
   const handleEndMeeting = async () => {
     if (!currentMeeting) {
       addMessage('jarvis', '> No active meeting to end.');
@@ -145,12 +165,22 @@ const Chat = ({ user, onLogout }) => {
         return;
       }
 
-      const response = await axios.post(`/meetings/${currentMeeting.id}/end`);
-      addMessage('jarvis', `> Meeting ended. Minutes of Meeting generated:`);
-      addMessage('jarvis', response.data.mom);
-      
+      const meetingId = currentMeeting.id;
+      await axios.post(`/meetings/${meetingId}/end`);
       setCurrentMeeting(null);
-      addSystemLog(`Meeting ended with MoM: ${currentMeeting.id}`);
+      addMessage('jarvis', '> Meeting ended. Generating Minutes of Meeting...');
+      addSystemLog(`Meeting ended, MoM queued: ${meetingId}`);
+
+      const result = await pollMeetingMinutes(meetingId);
+      if (result.status === 'succeeded') {
+        addMessage('jarvis', `> Minutes of Meeting generated:`);
+        addMessage('jarvis', result.mom);
+        addSystemLog(`MoM generated: ${meetingId}`);
+      } else if (result.status === 'failed') {
+        addMessage('system', `> Failed to generate Minutes of Meeting: ${result.error}`);
+      } else {
+        addMessage('jarvis', '> Minutes of Meeting are still being generated. They will appear in the meeting history when ready.');
+      }
     } catch (error) {
       addMessage('system', `> Failed to end meeting: ${error.response?.data?.detail || error.message}`);
     }
@@ -111,7 +111,7 @@ const Dashboard = ({ user, onLogout }) => {
                 <div className="panel-title">
                   Active Tasks
                   <span className="status-badge pending">
-                    {dashboardData.active_tasks.length}
+                    {dashboardData.counts?.active_tasks ?? dashboardData.active_tasks.length}
                   </span>
                 </div>
                 <div className="panel-content">
@@ -145,7 +145,7 @@ const Dashboard = ({ user, onLogout }) => {
                 <div className="panel-title">
                   Pending To-Dos
                   <span className="status-badge pending">
-                    {dashboardData.pending_todos.length}
+                    {dashboardData.counts?.pending_todos ?? dashboardData.pending_todos.length}
                   </span>
                 </div>
                 <div className="panel-content">
@@ -223,13 +223,13 @@ const Dashboard = ({ user, onLogout }) => {
               [{formatTime(new Date())}] User authenticated: {user.name}
             </div>
             <div className="log-entry">
-              [{formatTime(new Date())}] Meetings: {dashboardData.recent_meetings.length}
+              [{formatTime(new Date())}] Meetings: {dashboardData.counts?.meetings ?? dashboardData.recent_meetings.length}
             </div>
             <div className="log-entry">
-              [{formatTime(new Date())}] Active tasks: {dashboardData.active_tasks.length}
+              [{formatTime(new Date())}] Active tasks: {dashboardData.counts?.active_tasks ?? dashboardData.active_tasks.length}
             </div>
             <div className="log-entry">
-              [{formatTime(new Date())}] Pending todos: {dashboardData.pending_todos.length}
+              [{formatTime(new Date())}] Pending todos: {dashboardData.counts?.pending_todos ?? dashboardData.pending_todos.length}
             </div>
             <div className="log-entry">
               [{formatTime(new Date())}] Recent emails: {dashboardData.recent_emails.length}